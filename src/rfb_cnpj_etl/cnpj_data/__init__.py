@@ -2,3 +2,5 @@
 
 from .cnpj_downloader import CNPJDownloadTask, CNPJDownloadManager
 from .cnpj_public_data import CNPJDataScraper
+from .download_store import DownloadStore
+from .mirror_server import MirrorServer
@@ -4,20 +4,22 @@
 Módulo para baixar os arquivos de dados de CNPJ disponíveis no site da Receita Federal.
 """
 
+import hashlib
 import os
 import random
 import requests
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from queue import PriorityQueue
 from tqdm import tqdm
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from .cnpj_public_data import CNPJDataScraper
+from .download_monitor import DownloadHealthMonitor, DownloadStalledError, backoff_delay
+from .download_store import DownloadStore, remote_version_key
 from ..utils.logger import print_log, get_timestamp
 from ..config import (
-    CNPJ_DATA_URL,
     DOWNLOAD_DIR, DOWNLOAD_MAX_CONCURRENTS, BROWSER_AGENTS,
-    DOWNLOAD_CHUNK_SIZE, DOWNLOAD_CHUNK_TIMEOUT, DOWNLOAD_MAX_RETRIES
+    DOWNLOAD_CHUNK_SIZE, DOWNLOAD_CHUNK_TIMEOUT, DOWNLOAD_MAX_RETRIES, DOWNLOAD_RETRY_STATUS
 )
 
 
@@ -31,6 +33,8 @@ class CNPJDownloadTask:
         session: sessão HTTP persistente.
         header: cabeçalho HTTP a ser enviado na requisição.
         clean: Se True, remove arquivos baixados anteriormente. Se None, continua o download.
+        monitor: monitor de saúde compartilhado pelos downloads (taxa, conexões travadas e concorrência).
+        file_size: tamanho do arquivo no servidor (bytes), usado como prioridade pelo monitor.
     """
 
     # define os tamanhos das colunas da informação de download
@@ -51,16 +55,28 @@ class CNPJDownloadTask:
             headers: Dict[str, str],
             *,
             clean: bool = False,
+            monitor: Optional[DownloadHealthMonitor] = None,
+            file_size: int = 0,
     ):
         self.download_url = download_url  # url do arquivo a ser baixado
         self.file_path = file_path  # caminho do arquivo a ser salvo
         self.session = session  # sessão HTTP persistente
         self.headers = headers  # cabeçalho HTTP a ser enviado na requisição
         self.clean = clean  # se True, remove arquivos baixados anteriormente
+        self.monitor = monitor  # monitor de saúde dos downloads (None = sem detecção de conexões travadas)
+        self.file_size = file_size  # tamanho do arquivo no servidor (bytes; 0 se não informado)
         self.filename = os.path.basename(self.file_path)  # nome do arquivo
         self.chunk_size = DOWNLOAD_CHUNK_SIZE  # tamanho do chunk para download
         self.chunk_timeout = DOWNLOAD_CHUNK_TIMEOUT  # tempo limite para download de um chunk
         self.max_retries = DOWNLOAD_MAX_RETRIES  # número máximo de tentativas de download
+        self.sha256 = None  # SHA-256 do arquivo, calculado durante o download (None se o arquivo já existia)
+        # bytes do arquivo já gravados em disco (o arquivo já baixado conta por inteiro), para a previsão de término
+        self.downloaded = file_size if not clean and os.path.exists(file_path) else 0
+
+    @property
+    def remaining_bytes(self) -> int:
+        """Bytes que faltam baixar (0 se o tamanho do arquivo não foi informado pelo servidor)."""
+        return max(0, self.file_size - self.downloaded)
 
     def start_download_task(self, bar_position: int = 1):
         # caminho temporário para salvar o arquivo parcialmente baixado
@@ -77,6 +93,9 @@ class CNPJDownloadTask:
         if self.clean and os.path.exists(self.file_path):
             os.remove(self.file_path)
 
+        failures = 0  # falhas consecutivas (sem receber dados), para o backoff exponencial
+        conn_id = id(self)  # identificador da conexão no monitor de saúde
+
         # tenta baixar o arquivo
         for download_attempt in range(1, self.max_retries + 1):
 
@@ -85,6 +104,7 @@ class CNPJDownloadTask:
 
             # se o arquivo já existe, retorna o caminho existente
             if os.path.exists(self.file_path):
+                self.downloaded = self.file_size
                 time.sleep(0.5)
                 return self.file_path
 
@@ -95,6 +115,13 @@ class CNPJDownloadTask:
             if temp_file_size:
                 request_headers["Range"] = f"bytes={temp_file_size}-"
 
+            # aguarda uma vaga dentre os downloads simultâneos permitidos pelo monitor
+            # (os arquivos com mais bytes restantes, no caminho crítico, são atendidos primeiro)
+            if self.monitor is not None:
+                self.monitor.acquire(priority=max(0, self.file_size - temp_file_size))
+
+            resp = None
+            retry_after = None  # espera indicada pelo servidor (Retry-After), se houver
             try:
                 resp = self.session.get(
                     self.download_url,
@@ -104,6 +131,11 @@ class CNPJDownloadTask:
                 )
                 resp.raise_for_status()  # verifica se a requisição foi bem-sucedida
 
+                # se o servidor ignorou o Range (resposta 200), baixa novamente desde o início
+                if temp_file_size and resp.status_code != 206:
+                    temp_file_size = 0
+                self.downloaded = temp_file_size
+
                 # se a resposta da requisição for parcial (content-range), usa o valor do cabeçalho
                 content_range = resp.headers.get("Content-Range")
                 if content_range:
@@ -114,6 +146,7 @@ class CNPJDownloadTask:
                 # se o arquivo já foi baixado por completo, retorna o caminho do arquivo
                 if temp_file_size >= total:
                     os.replace(temp_path, self.file_path)
+                    self.downloaded = self.file_size
                     time.sleep(0.5)
                     return self.file_path
 
@@ -121,6 +154,13 @@ class CNPJDownloadTask:
                 # ab = append (continuar), wb = write (novo)
                 mode = "ab" if temp_file_size else "wb"
 
+                # SHA-256 calculado durante o download (ao continuar, inclui o trecho já baixado)
+                hasher = hashlib.sha256()
+                if temp_file_size:
+                    with open(temp_path, "rb") as part:
+                        for chunk in iter(lambda: part.read(self.chunk_size), b""):
+                            hasher.update(chunk)
+
                 # define o formato de exibição do tempo estimado na barra de progresso
                 tqdm.format_interval = lambda secs: time.strftime('%H:%M:%S', time.gmtime(secs))
 
@@ -147,6 +187,9 @@ class CNPJDownloadTask:
                 )
 
                 # executa o download com barra de progresso visível
+                if self.monitor is not None:
+                    self.monitor.start(conn_id)  # inicia a medição da taxa da conexão
+                next_check = time.monotonic() + 1  # próxima verificação de conexão travada
                 with open(temp_path, mode) as f, tqdm(
                         position=bar_position,  # posição da barra de progresso na lista
                         leave=False,  # não deixa a barra de progresso visível após o término
@@ -163,28 +206,63 @@ class CNPJDownloadTask:
                     # itera sobre os chunks do arquivo
                     for chunk in resp.iter_content(chunk_size=self.chunk_size):
                         f.write(chunk)  # escreve o chunk no arquivo
+                        hasher.update(chunk)  # atualiza o SHA-256
                         pbar.update(len(chunk))  # atualiza a barra de progresso
+                        self.downloaded += len(chunk)
+                        failures = 0  # a conexão está recebendo dados
+
+                        # encerra a conexão se ela estiver travada (retomada na próxima tentativa)
+                        if self.monitor is not None:
+                            self.monitor.update(conn_id, len(chunk))
+                            if time.monotonic() >= next_check:
+                                next_check = time.monotonic() + 1
+                                if self.monitor.is_stalled(conn_id):
+                                    raise DownloadStalledError(self.filename)
 
                 # se o arquivo foi baixado por completo, renomeia o arquivo temporário para o arquivo final
                 os.replace(temp_path, self.file_path)
+                self.downloaded = self.file_size
+                self.sha256 = hasher.hexdigest()
+                if self.monitor is not None:
+                    self.monitor.succeeded()
 
                 return self.file_path
 
+            except DownloadStalledError:
+                continue  # reconecta imediatamente, continuando do trecho já baixado
+
             except requests.HTTPError as e:
-                # se a resposta da requisição for 416 (Range Not Satisfiable)
-                if e.response.status_code == 416:
-                    if os.path.exists(self.file_path):
+                status = e.response.status_code
+
+                # se a resposta da requisição for 416 (Range Not Satisfiable), baixa desde o início
+                if status == 416:
+                    if os.path.exists(temp_path):
                         os.remove(temp_path)  # remove o arquivo temporário
                     continue  # tenta novamente
 
-                # se ainda há tentativas
-                if download_attempt < self.max_retries:
-                    continue  # tenta novamente
+                # erros definitivos (ex.: 404) não são repetidos
+                if status not in DOWNLOAD_RETRY_STATUS:
+                    raise
 
-            except Exception:
-                # se ainda há tentativas
-                if download_attempt < self.max_retries:
-                    continue  # tenta novamente
+                # servidor sobrecarregado (429/5xx): reduz os downloads simultâneos
+                if self.monitor is not None:
+                    self.monitor.throttled()
+                retry_after = e.response.headers.get("Retry-After")
+
+            except requests.RequestException:
+                pass  # falha de rede (conexão, timeout, stream interrompido): tenta novamente
+
+            finally:
+                if resp is not None:
+                    resp.close()
+                if self.monitor is not None:
+                    self.monitor.stop(conn_id)
+                    self.monitor.release()
+
+            # aguarda antes da próxima tentativa (backoff exponencial com jitter)
+            failures += 1
+            if download_attempt < self.max_retries:
+                time.sleep(backoff_delay(failures, retry_after))
 
         # lança um erro após esgotar o número máximo de tentativas
         raise RuntimeError(f"❌ {self.filename.upper()} DOWNLOAD INTERROMPIDO APÓS {self.max_retries} TENTATIVAS")
@@ -199,6 +277,9 @@ class CNPJDownloadManager:
         download_dir: Diretório para salvar os arquivos baixados. Se None, usa DOWNLOAD_DIR.
         concurrents: Número máximo de downloads concorrentes. Se None, usa DOWNLOAD_MAX_CONCURRENTS.
         clean: Se True, remove arquivos baixados anteriormente. Se None, continua o download.
+        store: Se True, reaproveita os arquivos inalterados de meses anteriores (hardlinks do DownloadStore).
+        store_dir: Diretório do repositório de arquivos. Se None, usa DOWNLOAD_STORE_DIR.
+        base_url: URL base do site (ex.: mirror local). Se None, usa CNPJ_DATA_URL.
     """
 
     def __init__(
@@ -207,9 +288,12 @@ class CNPJDownloadManager:
             download_dir: Optional[str] = None,
             concurrents: Optional[int] = None,
             clean: Optional[bool] = False,
+            store: Optional[bool] = False,
+            store_dir: Optional[str] = None,
+            base_url: Optional[str] = None,
     ):
         print_log(f"INICIANDO DOWNLOAD...", level="start")
-        self.source = CNPJDataScraper()  # objeto para obter dados do período
+        self.source = CNPJDataScraper(base_url)  # objeto para obter dados do período
         if not month_year:
             month_year = self.source.get_latest()  # se não fornecido, obtém o mês mais recente
         if not download_dir:
@@ -217,7 +301,7 @@ class CNPJDownloadManager:
         if not concurrents:
             concurrents = DOWNLOAD_MAX_CONCURRENTS  # se não fornecido, usa DOWNLOAD_MAX_CONCURRENTS
 
-        self.cnpj_data_url = CNPJ_DATA_URL  # url base para acesso aos dados
+        self.cnpj_data_url = self.source.cnpj_data_url  # url base para acesso aos dados
         self.agents = BROWSER_AGENTS  # lista de agentes de navegador
         self.session = requests.Session()  # cria uma sessão HTTP persistente
         self.month_year = month_year  # mês/ano para baixar
@@ -225,8 +309,11 @@ class CNPJDownloadManager:
                                             or DOWNLOAD_DIR)
         self.concurrents = concurrents  # número máximo de downloads concorrentes
         self.clean = clean  # se True, remove arquivos baixados anteriormente
+        self.store = DownloadStore(store_dir) if store else None  # repositório de arquivos (None = desativado)
         self.file_paths = []  # lista de caminhos para os arquivos baixados
         self.file_urls = []  # lista de URLs para os arquivos
+        self.file_keys = []  # lista de chaves da versão de cada arquivo no servidor (ETag, tamanho e data)
+        self.file_sizes = []  # lista de tamanhos dos arquivos no servidor (bytes; 0 se não informado)
         self._collect()  # coleta os dados do período informado
         self.max_desc = max(len(os.path.basename(p))  # largura máxima dentre os nomes dos arquivos
                             for p in self.file_paths)
@@ -236,14 +323,58 @@ class CNPJDownloadManager:
         for rel, info in self.source.get_metadata(self.month_year).items():  # itera sobre os dados do período
             self.file_paths.append(os.path.join(self.download_dir, rel))  # adiciona o caminho do arquivo
             self.file_urls.append(info["file_url"])  # adiciona o URL do arquivo
+            self.file_keys.append(remote_version_key(  # adiciona a chave da versão do arquivo
+                info["filename"], info.get("etag"), info.get("file_size"), info.get("last_modified")))
+            self.file_sizes.append(info.get("file_size") or 0)  # adiciona o tamanho do arquivo
+
+    # criar, a partir do repositório, os arquivos cuja versão no servidor não mudou
+    def _link_from_store(self, jobs: List[Tuple[str, str, Optional[str], int]]):
+        linked, linked_bytes = 0, 0
+        pending = []
+        for url, file_path, key, size in jobs:
+            entry = None if self.clean else self.store.lookup(key)  # com --clean, baixa todos os arquivos
+            if entry is None:
+                pending.append((url, file_path, key, size))
+                continue
+            obj = self.store.object_path(entry["sha256"])
+            if not (os.path.exists(file_path) and os.path.samefile(file_path, obj)):  # se ainda não é o objeto
+                self.store.link(entry["sha256"], file_path)
+            linked += 1
+            linked_bytes += entry["size"]
+
+        if linked:
+            print_log(f"{linked} ARQUIVOS INALTERADOS REAPROVEITADOS DO REPOSITÓRIO "
+                      f"({linked_bytes / 1024 ** 3:.2f} GB NÃO BAIXADOS)".replace(".", ","), level="success")
+        return pending
+
+    # descrição da barra principal: arquivos restantes e previsão de término pela taxa agregada dos downloads
+    @staticmethod
+    def _queue_desc(remaining: int, remaining_bytes: int, rate: float) -> str:
+        now, elapsed = get_timestamp()  # obtém hora atual e tempo decorrido
+        remaining_msg = "ARQUIVOS RESTANTES" if remaining != 1 else "ARQUIVO RESTANTE"
+        eta = time.strftime('%H:%M:%S', time.gmtime(remaining_bytes / rate)) if rate > 0 else "--:--:--"
+        return (f"🕑 {now} "
+                f"|⏱️ {elapsed} "
+                f"|ℹ️ {remaining} {remaining_msg} "
+                f"|⏳ {eta} PARA O TÉRMINO. BAIXANDO")
 
     # iniciar os downloads
     def start_download_queue(self):
         CNPJDownloadTask.set_bar_width(self.max_desc)  # define a largura da barra de progresso
 
-        queue_size = len(self.file_urls)  # total de downloads a serem realizados
+        print_log(f"{len(self.file_urls)} ARQUIVOS DISPONÍVEIS NO SITE DA RECEITA FEDERAL ({self.month_year})",
+                  level="web")
+
+        # arquivos a baixar (sem os inalterados, criados a partir do repositório)
+        jobs = list(zip(self.file_urls, self.file_paths, self.file_keys, self.file_sizes))
+        if self.store is not None:
+            jobs = self._link_from_store(jobs)
+
+        # maiores arquivos primeiro (LPT): os ZIPs de Estabelecimentos e Socios não ficam para o final
+        jobs.sort(key=lambda job: job[3], reverse=True)
+
+        queue_size = len(jobs)  # total de downloads a serem realizados
         now, elapsed = get_timestamp()  # obtém a hora atual e o tempo decorrido
-        print_log(f"{queue_size} ARQUIVOS DISPONÍVEIS NO SITE DA RECEITA FEDERAL ({self.month_year})", level="web")
         desc = (f"🕑 {now} "
                 f"|⏱️ {elapsed} "
                 f"|📋 {queue_size} ARQUIVOS RESTANTES. BAIXANDO")
@@ -269,37 +400,43 @@ class CNPJDownloadManager:
 
         future_task: Dict = {}  # dicionário para armazenar as tarefas em execução
 
+        # monitor de saúde: conexões travadas e downloads simultâneos ajustados ao servidor
+        monitor = DownloadHealthMonitor(self.concurrents)
+
         # cria um executor de thread
         with ThreadPoolExecutor(max_workers=self.concurrents) as executor:
-            # itera sobre as URLs e caminhos dos arquivos
-            for url, file_path in zip(self.file_urls, self.file_paths):
+            # itera sobre as URLs e caminhos dos arquivos (já ordenados pelo tamanho)
+            for url, file_path, key, size in jobs:
                 # seleciona um agente aleatório
                 headers = {"User-Agent": random.choice(self.agents)}
                 # cria uma tarefa de download
-                task = CNPJDownloadTask(url, file_path, self.session, headers, clean=self.clean)
+                task = CNPJDownloadTask(url, file_path, self.session, headers, clean=self.clean, monitor=monitor,
+                                        file_size=size)
                 # adiciona a tarefa ao dicionário
-                future_task[executor.submit(create_download_task, task)] = task
-
-            # aguarda todas as tarefas serem concluídas
-            for future in as_completed(future_task):
-                task = future_task[future]  # obtém a tarefa associada ao future
-                try:
-                    future.result()  # aguarda o término da tarefa
-                    remaining_bar.update(1)  # avança a barra de progresso
-                    now, elapsed = get_timestamp()  # obtém hora atual e tempo decorrido
-                    remaining = remaining_bar.total - remaining_bar.n  # arquivos restantes após update
-
-                    # atualiza a descrição da barra de progresso principal
-                    remaining_msg = "ARQUIVOS RESTANTES" if remaining > 1 else "ARQUIVO RESTANTE"
-                    desc = (f"🕑 {now} "
-                            f"|⏱️ {elapsed} "
-                            f"|ℹ️ {remaining} {remaining_msg}. BAIXANDO")
-                    remaining_bar.set_description(f"{desc}")
-
-                    remaining_bar.refresh()  # força atualização visual da barra
-
-                except Exception as e:
-                    print_log(f"ERRO AO BAIXAR {task.filename}: {e}", level="error")
+                future_task[executor.submit(create_download_task, task)] = (task, key)
+
+            # aguarda todas as tarefas serem concluídas, atualizando a previsão de término a cada segundo
+            started = time.monotonic()
+            pending = set(future_task)
+            while pending:
+                done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task, key = future_task[future]  # obtém a tarefa associada ao future
+                    try:
+                        future.result()  # aguarda o término da tarefa
+                        if self.store is not None and key is not None:  # guarda o arquivo no repositório
+                            self.store.add(key, task.file_path, task.sha256)
+                        remaining_bar.update(1)  # avança a barra de progresso
+                    except Exception as e:
+                        print_log(f"ERRO AO BAIXAR {task.filename}: {e}", level="error")
+
+                # atualiza a descrição da barra de progresso principal: bytes que faltam em cada download pendente
+                # (sem os arquivos já existentes e recomeçando do zero os downloads reiniciados pelo servidor)
+                rate = monitor.received_bytes / max(time.monotonic() - started, 1e-6)  # taxa agregada (bytes/s)
+                remaining = remaining_bar.total - remaining_bar.n  # arquivos restantes
+                remaining_bytes = sum(future_task[future][0].remaining_bytes for future in pending)
+                remaining_bar.set_description(self._queue_desc(remaining, remaining_bytes, rate))
+                remaining_bar.refresh()  # força atualização visual da barra
 
         remaining_bar.clear()
         remaining_bar.close()
@@ -17,12 +17,11 @@ class CNPJDataScraper:
     Classe para acessar os dados de CNPJ disponíveis no site da Receita Federal.
 
     :params:
-        cnpj_data_url: URL base para acesso aos dados.
-        _session: sessão HTTP persistente.
+        base_url: URL base para acesso aos dados (ex.: mirror local). Se None, usa CNPJ_DATA_URL.
     """
 
-    def __init__(self):
-        self.cnpj_data_url = CNPJ_DATA_URL  # url base para acesso aos dados
+    def __init__(self, base_url: Optional[str] = None):
+        self.cnpj_data_url = (base_url or CNPJ_DATA_URL).rstrip("/") + "/"  # url base para acesso aos dados
         self._session = requests.Session()  # cria uma sessão HTTP persistente
 
     @staticmethod
@@ -163,7 +162,9 @@ class CNPJDataScraper:
                 "month_year": month_year,  # período (AAAA-MM)
                 "filename": filename,  # nome do arquivo
                 "file_url": file_url,  # url do arquivo
-                "file_size": file_size  # tamanho do arquito (bytes)
+                "file_size": file_size,  # tamanho do arquito (bytes)
+                "etag": resp.headers.get("ETag"),  # versão do arquivo no servidor (se informada)
+                "last_modified": resp.headers.get("Last-Modified"),  # data de modificação (se informada)
             }
 
         # ordena os arquivos por nome
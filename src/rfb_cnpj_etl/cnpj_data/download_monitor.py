@@ -0,0 +1,191 @@
+# cnpj_data/download_monitor.py
+
+"""
+Monitor de saúde dos downloads.
+
+O site da Receita Federal limita as conexões sob carga: algumas respondem 429/5xx e outras continuam abertas, mas
+transferindo poucos kB/s. O monitor mede a taxa de cada conexão em uma janela deslizante e indica as conexões
+travadas (bem abaixo da sua própria taxa anterior ou da mediana das demais), que são encerradas e retomadas com
+`Range`. A quantidade de downloads simultâneos é ajustada ao comportamento do servidor (AIMD): cai pela metade a cada
+429/5xx e volta a subir, uma conexão por vez, a cada arquivo concluído ou a cada janela sem novas reduções.
+"""
+
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from ..config import (
+    DOWNLOAD_BACKOFF_BASE, DOWNLOAD_BACKOFF_MAX,
+    DOWNLOAD_STALL_WINDOW, DOWNLOAD_STALL_RATIO, DOWNLOAD_STALL_MIN_RATE
+)
+from ..utils.logger import print_log
+
+SAMPLE_INTERVAL = 0.5  # intervalo mínimo (em segundos) entre as amostras de uma conexão
+HISTORY_SIZE = 20  # quantidade de conexões encerradas cujas taxas são usadas como referência
+
+
+class DownloadStalledError(Exception):
+    """A conexão ficou muito abaixo da taxa das demais (ou sem transferir) durante a janela de medição."""
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """
+    Espera (em segundos) antes da próxima tentativa: backoff exponencial com jitter ("full jitter"), ou o
+    `Retry-After` informado pelo servidor, se maior.
+
+    :param attempt: número da tentativa que falhou (1, 2, ...)
+    :param retry_after: valor do cabeçalho Retry-After (segundos), se houver
+    """
+    delay = random.uniform(0, min(DOWNLOAD_BACKOFF_MAX, DOWNLOAD_BACKOFF_BASE * 2 ** (attempt - 1)))
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, min(float(retry_after), DOWNLOAD_BACKOFF_MAX))
+    return delay
+
+
+class DownloadHealthMonitor:
+    """
+    Mede a taxa de cada conexão e controla a quantidade de downloads simultâneos (pode ser usado por várias threads).
+
+    Cada download chama `acquire` antes de conectar e `release` ao terminar; durante o streaming, `update` registra
+    os bytes recebidos e `is_stalled` indica se a conexão deve ser encerrada e retomada.
+
+    :params:
+        max_concurrents: quantidade máxima de downloads simultâneos (e a inicial).
+    """
+
+    def __init__(self, max_concurrents: int):
+        self.max_concurrents = max_concurrents
+        self.limit = max_concurrents  # downloads simultâneos permitidos no momento
+        self._active = 0
+        self._waiting: List[int] = []  # prioridades dos downloads aguardando uma vaga
+        self.received_bytes = 0  # bytes recebidos por todas as conexões (para a previsão de término)
+        self._last_decrease = 0.0
+        self._last_change = time.monotonic()  # última alteração do limite (redução ou aumento)
+        self._samples: Dict[int, Deque[Tuple[float, int]]] = {}
+        self._started: Dict[int, float] = {}
+        self._received: Dict[int, int] = {}
+        self._peak: Dict[int, float] = {}  # maior taxa média da conexão desde o início (referência da própria conexão)
+        self._stalled: Set[int] = set()
+        self._history: Deque[float] = deque(maxlen=HISTORY_SIZE)  # taxas das conexões encerradas (sem travar)
+        self._lock = threading.Lock()
+        self._slot = threading.Condition(self._lock)
+
+    # --- concorrência (AIMD) --------------------------------------------------------------------------------
+
+    def acquire(self, priority: int = 0) -> None:
+        """
+        Aguarda uma vaga dentre os downloads simultâneos permitidos. As vagas são liberadas primeiro para os downloads
+        de maior prioridade (mais bytes restantes). Enquanto houver espera, o limite volta a subir a cada janela sem
+        reduções (ex.: com uma única conexão lenta, que não conclui o arquivo).
+        """
+        with self._slot:
+            self._waiting.append(priority)
+            while self._active >= self.limit or priority < max(self._waiting):
+                self._slot.wait(timeout=DOWNLOAD_STALL_WINDOW)
+                self._recover(time.monotonic())
+            self._waiting.remove(priority)
+            self._active += 1
+            self._slot.notify_all()  # o próximo da fila pode ocupar outra vaga livre
+
+    def release(self) -> None:
+        with self._slot:
+            self._active -= 1
+            self._slot.notify_all()
+
+    def throttled(self) -> None:
+        """O servidor respondeu 429/5xx: reduz os downloads simultâneos pela metade (uma vez por janela)."""
+        with self._slot:
+            now = time.monotonic()
+            if now - self._last_decrease < DOWNLOAD_STALL_WINDOW or self.limit == 1:
+                return
+            self._last_decrease = self._last_change = now
+            self.limit = max(1, self.limit // 2)
+            limit = self.limit
+        print_log(f"SERVIDOR SOBRECARREGADO: DOWNLOADS SIMULTÂNEOS REDUZIDOS PARA {limit}", level="warning")
+
+    def succeeded(self) -> None:
+        """Um arquivo foi concluído: permite mais um download simultâneo (até `max_concurrents`)."""
+        with self._slot:
+            if self.limit < self.max_concurrents:
+                self.limit += 1
+                self._last_change = time.monotonic()
+                self._slot.notify_all()
+
+    def _recover(self, now: float) -> None:
+        """Aumenta o limite em uma conexão se ele não mudou durante uma janela inteira (chamada com o lock)."""
+        if self.limit < self.max_concurrents and now - self._last_change >= DOWNLOAD_STALL_WINDOW:
+            self.limit += 1
+            self._last_change = now
+            self._slot.notify_all()
+
+    # --- taxa por conexão -----------------------------------------------------------------------------------
+
+    def start(self, conn_id: int) -> None:
+        """Inicia a medição de uma conexão."""
+        now = time.monotonic()
+        with self._lock:
+            self._started[conn_id] = now
+            self._received[conn_id] = 0
+            self._peak[conn_id] = 0.0
+            self._samples[conn_id] = deque([(now, 0)])
+
+    def stop(self, conn_id: int) -> None:
+        """
+        Encerra a medição de uma conexão, guardando a sua taxa média como referência (se não travou), inclusive a dos
+        downloads curtos (arquivos pequenos).
+        """
+        now = time.monotonic()
+        with self._lock:
+            started = self._started.pop(conn_id, None)
+            received = self._received.pop(conn_id, 0)
+            self._samples.pop(conn_id, None)
+            self._peak.pop(conn_id, None)
+            if conn_id in self._stalled:
+                self._stalled.discard(conn_id)
+            elif started is not None and received and now > started:
+                self._history.append(received / (now - started))
+
+    def update(self, conn_id: int, nbytes: int) -> None:
+        """Registra os bytes recebidos pela conexão."""
+        with self._lock:
+            self._received[conn_id] += nbytes
+            self.received_bytes += nbytes
+            samples = self._samples[conn_id]
+            now = time.monotonic()
+            if now - samples[-1][0] >= SAMPLE_INTERVAL:
+                samples.append((now, self._received[conn_id]))
+                average = self._received[conn_id] / (now - self._started[conn_id])
+                self._peak[conn_id] = max(self._peak[conn_id], average)
+                while len(samples) > 2 and now - samples[1][0] >= DOWNLOAD_STALL_WINDOW:
+                    samples.popleft()
+
+    def _rate(self, conn_id: int, now: float) -> Optional[float]:
+        """Taxa (bytes/s) da conexão na janela, ou None se ela ainda não foi medida por uma janela inteira."""
+        if now - self._started[conn_id] < DOWNLOAD_STALL_WINDOW:
+            return None
+        first_time, first_bytes = self._samples[conn_id][0]
+        return (self._received[conn_id] - first_bytes) / max(now - first_time, SAMPLE_INTERVAL)
+
+    def is_stalled(self, conn_id: int) -> bool:
+        """
+        Se a conexão está travada: abaixo de DOWNLOAD_STALL_MIN_RATE, abaixo de DOWNLOAD_STALL_RATIO da sua própria
+        taxa média anterior (a maior desde o início), ou abaixo de DOWNLOAD_STALL_RATIO da mediana das demais conexões
+        (ou, com menos de duas medidas, das últimas conexões encerradas, como no fim da fila).
+        """
+        now = time.monotonic()
+        with self._lock:
+            rate = self._rate(conn_id, now)
+            if rate is None:
+                return False
+            reference = [r for other in self._started if other != conn_id
+                         for r in [self._rate(other, now)] if r is not None]
+            if len(reference) < 2:
+                reference = list(self._history)
+            stalled = (rate < DOWNLOAD_STALL_MIN_RATE
+                       or rate < DOWNLOAD_STALL_RATIO * self._peak[conn_id]
+                       or (len(reference) >= 2 and rate < DOWNLOAD_STALL_RATIO * statistics.median(reference)))
+            if stalled:
+                self._stalled.add(conn_id)
+        return stalled
@@ -0,0 +1,129 @@
+# cnpj_data/download_store.py
+
+"""
+Repositório local dos ZIPs baixados, endereçado pelo conteúdo (SHA-256).
+
+Os ZIPs das tabelas de domínio (Cnaes, Motivos, Municipios, Naturezas, Paises, Qualificacoes) e, muitas vezes, o
+Simples não mudam de um mês para o outro. Cada arquivo baixado é guardado uma única vez em `objects/`, com o nome
+igual ao seu SHA-256 (calculado durante o download), e o `manifest.json` associa a versão publicada no site
+(nome do arquivo + ETag, Content-Length e Last-Modified do HEAD) a esse conteúdo. No mês seguinte, os arquivos com a
+mesma versão são criados na pasta do mês como hardlinks para o objeto, sem baixar nem ocupar espaço em disco de novo
+(em outro sistema de arquivos, o objeto é copiado).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from ..config import DOWNLOAD_STORE_DIR, DOWNLOAD_STORE_HASH_CHUNK_SIZE
+
+
+def file_sha256(file_path: str) -> str:
+    """SHA-256 (hexadecimal) do conteúdo do arquivo."""
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_STORE_HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def remote_version_key(filename: str, etag: Optional[str], size: Optional[int],
+                       last_modified: Optional[str]) -> Optional[str]:
+    """
+    Chave da versão publicada do arquivo, pelos cabeçalhos do HEAD.
+
+    :returns: a chave, ou None se o servidor não informar ETag nem Last-Modified (a versão não pode ser identificada)
+    """
+    if not etag and not last_modified:
+        return None
+    return "|".join([filename, etag or "", str(size or 0), last_modified or ""])
+
+
+class DownloadStore:
+    """
+    Repositório dos ZIPs baixados, compartilhado entre os meses (pode ser usado por várias threads).
+
+    :params:
+        store_dir: diretório do repositório (objetos e manifest). Se None, usa DOWNLOAD_STORE_DIR.
+    """
+
+    def __init__(self, store_dir: Optional[str] = None):
+        self.store_dir = Path(store_dir or DOWNLOAD_STORE_DIR).resolve()
+        self.objects_dir = self.store_dir / "objects"
+        self.manifest_path = self.store_dir / "manifest.json"
+        self._lock = threading.Lock()
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self._manifest: Dict[str, Dict] = {}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self._manifest = json.load(f)
+
+    def object_path(self, sha256: str) -> Path:
+        """Caminho do objeto com o conteúdo de SHA-256 `sha256`."""
+        return self.objects_dir / sha256[:2] / f"{sha256}.zip"
+
+    def lookup(self, key: Optional[str]) -> Optional[Dict]:
+        """
+        Entrada do manifest da versão `key`, se o objeto correspondente ainda existir com o tamanho esperado.
+        """
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._manifest.get(key)
+        if entry is None:
+            return None
+        obj = self.object_path(entry["sha256"])
+        if not obj.exists() or obj.stat().st_size != entry["size"]:
+            return None
+        return entry
+
+    def link(self, sha256: str, file_path: str) -> None:
+        """Cria `file_path` como hardlink para o objeto (ou cópia, se o hardlink não for possível)."""
+        obj = self.object_path(sha256)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = file_path + ".link"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        try:
+            os.link(obj, temp_path)
+        except OSError:
+            shutil.copyfile(obj, temp_path)
+        os.replace(temp_path, file_path)
+
+    def add(self, key: Optional[str], file_path: str, sha256: Optional[str] = None) -> str:
+        """
+        Guarda o arquivo baixado como objeto (hardlink ou cópia) e registra a versão `key` no manifest.
+
+        :param sha256: SHA-256 calculado durante o download. Se None, é calculado a partir do arquivo.
+        :returns: o SHA-256 do arquivo
+        """
+        sha256 = sha256 or file_sha256(file_path)
+        obj = self.object_path(sha256)
+        if not obj.exists():
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            temp_obj = obj.with_name(f"{obj.name}.{threading.get_ident()}.part")
+            try:
+                os.link(file_path, temp_obj)
+            except OSError:
+                shutil.copyfile(file_path, temp_obj)
+            os.replace(temp_obj, obj)
+
+        if key is not None:
+            with self._lock:
+                self._manifest[key] = {
+                    "sha256": sha256,
+                    "size": obj.stat().st_size,
+                    "filename": os.path.basename(file_path),
+                }
+                self._save()
+        return sha256
+
+    def _save(self) -> None:
+        """Grava o manifest (chamada com o lock)."""
+        temp_path = self.manifest_path.with_suffix(".json.part")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
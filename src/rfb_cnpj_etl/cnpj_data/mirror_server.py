@@ -0,0 +1,214 @@
+# cnpj_data/mirror_server.py
+
+"""
+Servidor HTTP local que imita o site de dados abertos do CNPJ, para testar e medir os downloads sem acessar a Receita
+Federal.
+
+Serve as pastas `AAAA-MM` de um diretório local (ex.: `data/downloads`) com a mesma listagem do site e os ZIPs com
+HEAD, `Range`, ETag e Last-Modified. Para reproduzir o comportamento do site sob carga, cada conexão pode ter a banda
+limitada e, com as probabilidades configuradas, responder 503 (com Retry-After) ou "travar" no meio do arquivo,
+continuando a poucos kB/s. Com `seed`, as falhas são sorteadas sempre na mesma sequência.
+
+Uso: `python cnpj.py mirror` e, em outro terminal, `python cnpj.py download --base-url http://127.0.0.1:8000/`.
+"""
+
+import email.utils
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Tuple
+from ..config import (
+    DEBUG_LOG, DOWNLOAD_DIR,
+    MIRROR_HOST, MIRROR_PORT, MIRROR_CHUNK_SIZE, MIRROR_STALL_BANDWIDTH, MIRROR_RETRY_AFTER
+)
+from ..utils.logger import print_log
+
+
+class MirrorRequestHandler(BaseHTTPRequestHandler):
+    """
+    Responde à listagem dos meses (`/`), à listagem dos arquivos do mês (`/AAAA-MM/`) e aos arquivos
+    (`/AAAA-MM/<arquivo>.zip`).
+    """
+
+    server: "MirrorServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt: str, *args) -> None:
+        if DEBUG_LOG:
+            print_log(f"MIRROR {self.address_string()} {fmt % args}", level="debug")
+
+    def do_HEAD(self) -> None:
+        self._respond(head=True)
+
+    def do_GET(self) -> None:
+        self._respond(head=False)
+
+    def _respond(self, head: bool) -> None:
+        path = self.server.resolve(self.path)
+        if path is None:
+            self._send_empty(404)
+        elif path.is_dir():
+            self._send_listing(path, head)
+        elif not head and self.server.draw(self.server.fault_rate):
+            self._send_empty(503, {"Retry-After": str(MIRROR_RETRY_AFTER)})
+        else:
+            self._send_file(path, head)
+
+    def _send_empty(self, status: int, headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _send_listing(self, path: Path, head: bool) -> None:
+        """Listagem no formato do site: links `AAAA-MM/` na raiz e links dos ZIPs nas pastas dos meses."""
+        if path == self.server.root_dir:
+            names = [f"{p.name}/" for p in sorted(path.iterdir())
+                     if p.is_dir() and re.match(r"^\d{4}-\d{2}$", p.name)]
+        else:
+            names = [p.name for p in sorted(path.iterdir()) if p.is_file() and p.suffix.lower() == ".zip"]
+        body = "".join(f'<a href="{name}">{name}</a><br>\n' for name in names)
+        body = f"<html><body>\n{body}</body></html>\n".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _byte_range(self, size: int) -> Optional[Tuple[int, int]]:
+        """Intervalo (início, fim inclusivo) pedido no `Range`, ou None se não houver (ou não for suportado)."""
+        match = re.match(r"^bytes=(\d*)-(\d*)$", self.headers.get("Range", "").strip())
+        if not match or not any(match.groups()):
+            return None
+        start, end = match.groups()
+        if not start:  # sufixo: os últimos N bytes
+            return max(0, size - int(end)), size - 1
+        return int(start), min(int(end), size - 1) if end else size - 1
+
+    def _send_file(self, path: Path, head: bool) -> None:
+        stat = path.stat()
+        size = stat.st_size
+        byte_range = None if head else self._byte_range(size)
+        if byte_range is not None and byte_range[0] >= size:
+            self._send_empty(416, {"Content-Range": f"bytes */{size}"})
+            return
+
+        start, end = byte_range or (0, size - 1)
+        self.send_response(206 if byte_range else 200)
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", f'"{size:x}-{stat.st_mtime_ns // 1000:x}"')
+        self.send_header("Last-Modified", email.utils.formatdate(stat.st_mtime, usegmt=True))
+        self.end_headers()
+        if head:
+            return
+
+        # conexão "travada": a partir de um ponto sorteado, continua a MIRROR_STALL_BANDWIDTH
+        stall_at = self.server.stall_offset(start, end)
+        bandwidth = self.server.bandwidth
+        sent, clock = 0, time.monotonic()
+        try:
+            with open(path, "rb") as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = f.read(min(MIRROR_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    view = memoryview(chunk)
+                    while view:
+                        if stall_at is not None and start + sent >= stall_at:
+                            bandwidth, sent, clock, stall_at = MIRROR_STALL_BANDWIDTH, 0, time.monotonic(), None
+                        # com a banda limitada, envia ~1/10 s de dados por vez (sem rajadas seguidas de pausas longas)
+                        size = max(1, bandwidth // 10) if bandwidth else len(view)
+                        self.wfile.write(view[:size])
+                        sent += len(view[:size])
+                        view = view[size:]
+                        if bandwidth:  # limita a banda da conexão
+                            delay = sent / bandwidth - (time.monotonic() - clock)
+                            if delay > 0:
+                                time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # o cliente encerrou a conexão (ex.: conexão travada abandonada)
+
+
+class MirrorServer(ThreadingHTTPServer):
+    """
+    Servidor local com os arquivos de `root_dir` (pastas `AAAA-MM` com os ZIPs), uma thread por conexão.
+
+    :params:
+        root_dir: diretório com as pastas dos meses. Se None, usa DOWNLOAD_DIR.
+        host: endereço do servidor.
+        port: porta do servidor (0 escolhe uma porta livre).
+        bandwidth: banda máxima de cada conexão (bytes/s). None não limita.
+        stall_rate: probabilidade de cada download travar no meio do arquivo (0 a 1).
+        fault_rate: probabilidade de cada download ser respondido com 503 (0 a 1).
+        seed: semente do sorteio das falhas (None: aleatória).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, root_dir: Optional[str] = None, host: str = MIRROR_HOST, port: int = MIRROR_PORT,
+                 bandwidth: Optional[int] = None, stall_rate: float = 0.0, fault_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        for name, rate in (("stall_rate", stall_rate), ("fault_rate", fault_rate)):
+            if not 0 <= rate <= 1:
+                raise ValueError(f"PROBABILIDADE INVÁLIDA ({name}): {rate} (ENTRE 0 E 1)")
+        self.root_dir = Path(root_dir or DOWNLOAD_DIR).resolve()
+        if not self.root_dir.is_dir():
+            raise ValueError(f"DIRETÓRIO NÃO ENCONTRADO: {self.root_dir}")
+        self.bandwidth = bandwidth
+        self.stall_rate = stall_rate
+        self.fault_rate = fault_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        super().__init__((host, port), MirrorRequestHandler)
+
+    @property
+    def url(self) -> str:
+        """URL base do servidor (para `--base-url`)."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def resolve(self, url_path: str) -> Optional[Path]:
+        """Caminho local da URL, ou None se não existir ou estiver fora de `root_dir`."""
+        relative = url_path.split("?", 1)[0].lstrip("/")
+        path = (self.root_dir / relative).resolve()
+        if path != self.root_dir and self.root_dir not in path.parents:
+            return None
+        return path if path.exists() else None
+
+    def draw(self, rate: float) -> bool:
+        """Sorteia um evento com probabilidade `rate`."""
+        with self._random_lock:
+            return rate > 0 and self._random.random() < rate
+
+    def stall_offset(self, start: int, end: int) -> Optional[int]:
+        """Byte a partir do qual o download trava (sorteado), ou None se o download não travar."""
+        if not self.draw(self.stall_rate):
+            return None
+        with self._random_lock:
+            return self._random.randint(start, end)
+
+    def start(self) -> "MirrorServer":
+        """Inicia o servidor em segundo plano (para testes e benchmarks); encerre com `stop`."""
+        self._thread = threading.Thread(target=self.serve_forever, name="MIRROR", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
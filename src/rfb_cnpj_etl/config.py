@@ -22,18 +22,43 @@ CNPJ_DATA_URL = "https://arquivos.receitafederal.gov.br/dados/cnpj/dados_abertos
 # ---------------------------------------------------------------------------
 # BANCO DE DADOS
 # ---------------------------------------------------------------------------
-ENGINE_OPTIONS = ["sqlite", "postgres"]  # opções de engines de banco de dados (já implementadas)
+ENGINE_OPTIONS = ["sqlite", "postgres", "parquet", "duckdb"]  # opções de engines de banco de dados (já implementadas)
 DEFAULT_ENGINE = "sqlite"  # engine padrão de banco de dados (por enquanto apenas SQLite)
 DEFAULT_PARALLEL = True  # paralelismo de inserção no banco de dados
-DEFAULT_LOW_MEMORY = False  # habilita o uso de memória limitada para inserção no banco
+DEFAULT_LOW_MEMORY = False  # habilita o uso de memória limitada para inserção no banco (LOW_MEMORY_LIMIT)
+LOW_MEMORY_LIMIT = "2G"  # limite de memória usado por --low-memory (equivale a --memory-limit 2G)
 AVG_COMPRESSED_LINE_SIZE_BYTES = 35  # 35 bytes/linha para estimar o total de linhas e calcular o progresso da carga de dados
 
 BATCH_SIZE = 250_000  # número de registros por batch ao inserir no banco (menor para o sqlite ~50_000)
 BATCH_RATIO = {  # proporção para utilizar em tabelas específicas
     "estabelecimento": 0.4  # Ex.: 50_000 * 0.4 = 20_000 para a tabela estabelecimento
 }
+DEFAULT_ADAPTIVE_BATCH = False  # ajusta o tamanho dos lotes em tempo de execução (--adaptive-batch)
+DEFAULT_CNAE_SEC_SQL = False  # gera estabelecimento_cnae_sec no banco, após a carga (--cnae-sec-sql)
+DEFAULT_CNPJ_KEY = False  # CNPJ de 14 dígitos (BIGINT) como chave de estabelecimento (--cnpj-key)
+DEFAULT_COMPACT = False  # códigos e datas como inteiros, com views no formato original (--compact)
+INDEX_PROFILES = ["none", "lookup", "analytics", "tuned", "full"]  # perfis de índices (`profiles` dos índices no SCHEMA)
+DEFAULT_INDEX_PROFILE = "full"  # perfil dos índices criados em db load/index (--index-profile)
+DEFAULT_FULLTEXT = False  # cria os índices de busca textual dos nomes, após os índices (--fulltext)
+FULLTEXT_COLUMNS = {  # colunas com busca textual (SQLite: FTS5 | Postgres: pg_trgm + unaccent)
+    "empresa": "razao_social",
+    "estabelecimento": "nome_fantasia",
+    "socio": "nome_socio",
+}
+ADAPTIVE_BATCH_TARGET_SECONDS = 2.0  # tempo alvo (em segundos) de cada insert/COPY no modo adaptativo
+ADAPTIVE_BATCH_MIN_SIZE = 10_000  # menor tamanho de lote no modo adaptativo
+ADAPTIVE_BATCH_MAX_SIZE = 1_000_000  # maior tamanho de lote no modo adaptativo
+ADAPTIVE_BATCH_MEMORY_FRACTION = 0.5  # fração da memória total usada como limite no modo adaptativo
 WORKER_THREADS = max(1, multiprocessing.cpu_count() - 1)  # quantidade de threads de worker para pipeline de inserção
-QUEUE_SIZE = max(2, WORKER_THREADS * 2) - 5  # tamanho da fila (back‑pressure) no pipeline inserção
+QUEUE_SIZE = max(2, WORKER_THREADS * 2 - 5)  # tamanho da fila (back‑pressure) no pipeline inserção
+
+# orçamento de memória (--memory-limit / --low-memory)
+MEMORY_RESERVED_FRACTION = 0.25  # fração do limite reservada para o interpretador, conexões e buffers
+MEMORY_BYTES_PER_ROW = 800  # memória estimada por linha em um lote (tupla compacta do estabelecimento)
+MEMORY_PER_PRODUCER_BYTES = 512 * 1024 ** 2  # memória mínima por thread produtora
+MEMORY_PER_CONSUMER_BYTES = 256 * 1024 ** 2  # memória mínima por thread consumidora (Postgres)
+MEMORY_MIN_BATCH_SIZE = 5_000  # menor lote permitido pelo orçamento de memória
+COMPACT_POOL_MAX_SIZE = 200_000  # valores distintos compartilhados por pool (códigos e datas) nos lotes
 
 # ---------------------------------------------------------------------------
 # CONEXÃO POSTGRESQL
@@ -45,11 +70,59 @@ POSTGRES = {
     "password": "sua_senha_aqui",
     "database": "dados_cnpj"
 }
+POSTGRES_MAX_WORKERS_PER_TABLE = 4  # conexões fazendo COPY na mesma tabela ao mesmo tempo (carga paralela)
+DEFAULT_STAGING_TABLES = False  # COPY em tabelas de staging por worker, unidas às tabelas finais (--staging-tables)
+DEFAULT_PARTITIONED = False  # partições HASH nas tabelas com `partition_by` no SCHEMA (--partitioned)
+POSTGRES_PARTITIONS = 8  # quantidade de partições de cada tabela particionada
+POSTGRES_DDL_THREADS = max(2, WORKER_THREADS)  # conexões criando PKs, índices e FKs das partições em paralelo
+DEFAULT_TASK_GRAPH = False  # correções, PK e índices de cada tabela assim que a sua carga termina (--task-graph)
+POSTGRES_TABLE_TASK_THREADS = 2  # tabelas preparadas (correções, PK e índices) ao mesmo tempo, durante a carga
+DEFAULT_COPY_FREEZE = False  # COPY ... WITH (FREEZE) por tabela e VACUUM (ANALYZE) ao final da carga (--freeze)
+POSTGRES_VACUUM_PARALLEL = 2  # workers do VACUUM (PARALLEL n) na limpeza dos índices de cada tabela
+POSTGRES_ENCODINGS = {  # --encoding: (encoding do banco, client_encoding das conexões, codec do CSV enviado no COPY)
+    "win1252": ("WIN1252", "WIN1252", "windows-1252"),
+    "utf8": ("UTF8", "LATIN1", "latin-1"),  # os textos lidos em latin1 são convertidos pelo servidor
+}
+DEFAULT_POSTGRES_ENCODING = "win1252"  # encoding do banco Postgres (--encoding)
+PUBLISH_OPTIONS = ["logged", "swap"]  # modos de publicação das tabelas UNLOGGED após a carga (--publish)
+POSTGRES_SCHEMA = "public"  # schema das tabelas publicadas
+POSTGRES_SHADOW_SCHEMA = "cnpj_carga"  # schema da carga com --publish swap (trocado com POSTGRES_SCHEMA ao final)
+POSTGRES_PREVIOUS_SCHEMA = "cnpj_anterior"  # schema temporário das tabelas substituídas na troca
+POSTGRES_PUBLISH_MAINTENANCE_WORK_MEM = "1GB"  # memória para recriar os índices no SET LOGGED (por conexão)
 
 # ---------------------------------------------------------------------------
 # SQLITE
 # ---------------------------------------------------------------------------
 SQLITE_DB_PATH = DATA_DIR / "dados_cnpj.db"  # local do banco de dados
+SQLITE_CACHE_SIZE_KIB = 128_000  # cache de páginas da conexão de carga (em KiB)
+SQLITE_BUILD_SUFFIX = ".novo"  # sufixo do arquivo construído ao lado do banco com --publish swap
+SQLITE_BUILD_JOURNAL_MODE = "OFF"  # journal do arquivo em construção (não afeta o banco publicado)
+SQLITE_PAGE_SIZE = 16_384  # tamanho da página (bytes), definido na criação do banco (maiores: scans mais rápidos)
+SQLITE_AUTO_VACUUM = "NONE"  # auto_vacuum do banco (NONE: sem páginas de controle; banco reconstruído a cada carga)
+SQLITE_ANALYSIS_LIMIT = 1_000  # linhas amostradas por índice no ANALYZE (0 analisa tudo)
+SQLITE_MMAP_SIZE = 1024 ** 3  # bytes mapeados em memória nas conexões do builder (leitura de índices e ANALYZE)
+DEFAULT_SQLITE_VACUUM = False  # compacta o banco com VACUUM INTO ao final da carga (--vacuum)
+SQLITE_READ_MMAP_SIZE = 8 * 1024 ** 3  # bytes mapeados nas conexões de consulta (limitado pelo SQLITE_MAX_MMAP_SIZE)
+SQLITE_FTS_TOKENIZE = "unicode61 remove_diacritics 2"  # tokenizador FTS5 (ignora acentos: JOAO encontra JOÃO)
+SQLITE_READ_CACHED_STATEMENTS = 256  # statements preparados mantidos por conexão de consulta
+
+# ---------------------------------------------------------------------------
+# DUCKDB (requer duckdb)
+# ---------------------------------------------------------------------------
+DUCKDB_DB_PATH = DATA_DIR / "dados_cnpj.duckdb"  # local do banco de dados
+DUCKDB_THREADS = multiprocessing.cpu_count()  # threads usadas pelo DuckDB (leitura dos CSVs, índices)
+DUCKDB_TEMP_DIR = DATA_DIR / "tmp"  # CSVs extraídos dos ZIPs durante a carga e spill do DuckDB
+
+# ---------------------------------------------------------------------------
+# PARQUET (requer pyarrow)
+# ---------------------------------------------------------------------------
+PARQUET_DIR = DATA_DIR / "parquet"  # diretório do dataset (uma pasta por tabela)
+PARQUET_COMPRESSION = "zstd"  # compressão das colunas
+PARQUET_COMPRESSION_LEVEL = 3  # nível de compressão (zstd: 1 a 22)
+PARQUET_ROW_GROUP_SIZE = 128_000  # linhas por row group (granularidade das estatísticas usadas nos filtros)
+PARQUET_PARTITION_BY = {  # tabelas particionadas (pastas coluna=valor, no padrão hive)
+    "estabelecimento": "uf",
+}
 
 # ---------------------------------------------------------------------------
 # DOWNLOADS
@@ -58,12 +131,42 @@ DOWNLOAD_CHUNK_SIZE = 8_194  # tamanho (em bytes) de cada chunk ao fazer downloa
 DOWNLOAD_CHUNK_TIMEOUT = 60  # timeout (em segundos) para cada requisição de chunk
 DOWNLOAD_MAX_RETRIES = 100  # número máximo de tentativas de download antes de falhar definitivamente
 DOWNLOAD_MAX_CONCURRENTS = 10  # número de downloads simultâneos padrão
+DOWNLOAD_RETRY_STATUS = (408, 429, 500, 502, 503, 504)  # respostas HTTP repetidas (as demais interrompem o arquivo)
+DOWNLOAD_BACKOFF_BASE = 1.0  # espera (em segundos) antes da 1ª nova tentativa, dobrada a cada falha (com jitter)
+DOWNLOAD_BACKOFF_MAX = 120  # espera máxima (em segundos) entre tentativas
+DOWNLOAD_STALL_WINDOW = 30  # janela (em segundos) da medição da taxa de cada conexão
+DOWNLOAD_STALL_RATIO = 0.2  # conexão travada: abaixo desta fração da sua taxa anterior ou da mediana das demais
+DOWNLOAD_STALL_MIN_RATE = 1024  # conexão travada: abaixo desta taxa (bytes/s), mesmo sem outras conexões
+DEFAULT_DOWNLOAD_STORE = False  # reaproveita os ZIPs inalterados de meses anteriores (--store)
+DOWNLOAD_STORE_DIR = DATA_DIR / "store"  # repositório dos ZIPs por SHA-256 (no disco dos downloads, p/ hardlinks)
+DOWNLOAD_STORE_HASH_CHUNK_SIZE = 8 * 1024 ** 2  # bytes lidos por vez ao calcular o SHA-256 de arquivos já baixados
 BROWSER_AGENTS = [  # lista de user‑agents rotativos para as requisições HTTP
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/91.0.4472.124 Safari/537.36",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 Version/15.1 Safari/605.1.15",
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/103.0.0.0 Safari/537.36",
 ]
 
+# ---------------------------------------------------------------------------
+# MIRROR LOCAL DO SITE DA RFB (mirror / --base-url)
+# ---------------------------------------------------------------------------
+MIRROR_HOST = "127.0.0.1"  # endereço do servidor local
+MIRROR_PORT = 8000  # porta do servidor local
+MIRROR_CHUNK_SIZE = 64 * 1024  # bytes enviados por vez em cada conexão
+MIRROR_STALL_BANDWIDTH = 2 * 1024  # banda (bytes/s) de uma conexão "travada" (--stall-rate)
+MIRROR_RETRY_AFTER = 1  # Retry-After (em segundos) das respostas 503 (--fault-rate)
+
+# ---------------------------------------------------------------------------
+# MÉTRICAS DA CARGA (--metrics)
+# ---------------------------------------------------------------------------
+METRICS_DIR = DATA_DIR / "metrics"  # diretório dos arquivos de métricas (JSON lines e Prometheus)
+METRICS_INTERVAL = 15  # intervalo (em segundos) entre as exportações periódicas das métricas
+
+# ---------------------------------------------------------------------------
+# PROFILE DA CARGA (--profile)
+# ---------------------------------------------------------------------------
+PROFILE_DIR = DATA_DIR / "profiles"  # diretório dos arquivos de profile (.pstats ou .collapsed)
+PROFILE_SAMPLE_INTERVAL = 0.005  # intervalo (em segundos) entre as amostras de pilha no modo "sample"
+
 # ---------------------------------------------------------------------------
 # PRINT_LOG
 # ---------------------------------------------------------------------------
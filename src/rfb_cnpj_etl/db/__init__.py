@@ -2,6 +2,13 @@
 
 from .sqlite_builder import SQLiteBuilder
 from .sqlite_loader import run_sqlite_loader
+from .sqlite_reader import SQLiteReader
 
 from .postgres_builder import PostgresBuilder
 from .postgres_loader import run_postgres_loader
+
+from .parquet_builder import ParquetBuilder
+from .parquet_loader import run_parquet_loader
+
+from .duckdb_builder import DuckDBBuilder
+from .duckdb_loader import run_duckdb_loader
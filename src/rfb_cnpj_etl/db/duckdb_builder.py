@@ -0,0 +1,214 @@
+# db/duckdb_builder.py
+
+"""
+Módulo para construção do banco de dados DuckDB (requer duckdb).
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Any, Optional
+from ..config import DUCKDB_DB_PATH, DUCKDB_THREADS, DUCKDB_TEMP_DIR
+from ..db.schema import SCHEMA
+from ..utils.db_patch import apply_static_fixes
+from ..utils.logger import print_log
+
+
+def require_duckdb():
+    """
+    Importa o duckdb sob demanda (dependência opcional, usada apenas pelo engine duckdb).
+
+    :returns: módulo duckdb
+    :raises ValueError: se o duckdb não estiver instalado
+    """
+    try:
+        import duckdb
+    except ImportError:
+        raise ValueError("O ENGINE DUCKDB REQUER O DUCKDB. INSTALE COM: pip install duckdb")
+    return duckdb
+
+
+class DuckDBBuilder:
+    """
+    Classe para construção do banco de dados DuckDB.
+
+    Como no Postgres, as PKs das tabelas de domínio são criadas com as tabelas e as das tabelas grandes somente após
+    a carga e as correções. O DuckDB não permite adicionar chaves estrangeiras a tabelas existentes, portanto as FKs
+    do SCHEMA não são criadas.
+
+    :params:
+        db_path: caminho para o banco de dados DuckDB.
+    """
+
+    def __init__(self, db_path: Optional[str] = DUCKDB_DB_PATH):
+        self.db_path = Path(db_path or DUCKDB_DB_PATH)
+        self.schema: Dict[str, Any] = SCHEMA
+        self.conn = None
+
+    def connect(self, memory_limit: Optional[int] = None):
+        """
+        Abre a conexão com o DuckDB, configurada para carga em massa.
+
+        :params:
+            memory_limit: limite de memória do DuckDB, em bytes (None usa o padrão do DuckDB).
+        :returns: conexão DuckDB pronta para uso
+        """
+        duckdb = require_duckdb()
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            Path(DUCKDB_TEMP_DIR).mkdir(parents=True, exist_ok=True)
+            conn = duckdb.connect(str(self.db_path))
+            conn.execute(f"SET threads = {DUCKDB_THREADS};")
+            conn.execute("SET preserve_insertion_order = false;")
+            conn.execute(f"SET temp_directory = '{Path(DUCKDB_TEMP_DIR).as_posix()}';")
+            if memory_limit:
+                conn.execute(f"SET memory_limit = '{memory_limit // 1024 ** 2}MB';")
+            return conn
+        except duckdb.Error as e:
+            print_log(f"ERRO AO CONECTAR NO BANCO: {e}", level="error")
+            raise
+
+    def _close_connection(self):
+        if self.conn:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+    def drop_database(self) -> None:
+        """
+        Fecha conexão pendente e exclui o arquivo do banco (e o WAL), se existir.
+        """
+        try:
+            self._close_connection()
+            for path in (self.db_path, Path(f"{self.db_path}.wal")):
+                if path.exists():
+                    os.remove(path)
+        except OSError as e:
+            print_log(f"ERRO AO RECRIAR O BANCO: {e}", level="error")
+            raise
+
+    def create_tables(self) -> None:
+        """
+        Cria todas as tabelas definidas no SCHEMA.
+
+        As PKs inline (tabelas de domínio) são criadas aqui; as PKs das tabelas grandes ficam para `patch_data`.
+        NOT NULL não é aplicado: uma única linha inválida faria o DuckDB rejeitar o arquivo CSV inteiro.
+        """
+        if self.conn is None: self.conn = self.connect()
+        duckdb = require_duckdb()
+        try:
+            print_log("CRIANDO TABELAS...", level="task")
+            for table_name, spec in self.schema.items():
+                columns_defs = [f'"{col[0]}" {col[1].replace("NOT NULL", "").strip()}' for col in spec['columns']]
+                self.conn.execute(f'DROP TABLE IF EXISTS "{table_name}";')
+                self.conn.execute(f'CREATE TABLE "{table_name}" ({", ".join(columns_defs)});')
+            print_log("TABELAS CRIADAS", level="success")
+        except duckdb.Error as e:
+            print_log(f"ERRO AO CRIAR TABELAS: {e}", level="error")
+            raise
+        finally:
+            self._close_connection()
+
+    def build_cnae_sec(self) -> None:
+        """
+        Preenche `estabelecimento_cnae_sec` a partir da coluna `cod_cnae_secundario` de `estabelecimento`.
+        """
+        if self.conn is None: self.conn = self.connect()
+        duckdb = require_duckdb()
+        try:
+            print_log("GERANDO CNAES SECUNDÁRIOS...", level="task")
+            cols = [col[0] for col in self.schema['estabelecimento_cnae_sec']['columns']]
+            key_cols = ", ".join(f'"{col}"' for col in cols[:-1])
+            self.conn.execute(f"""
+                INSERT INTO estabelecimento_cnae_sec ({", ".join(f'"{col}"' for col in cols)})
+                SELECT {key_cols}, cnae
+                FROM (SELECT {key_cols}, trim(unnest(string_split(cod_cnae_secundario, ','))) AS cnae
+                      FROM estabelecimento
+                      WHERE cod_cnae_secundario IS NOT NULL)
+                WHERE cnae <> '';
+            """)
+            print_log("CNAES SECUNDÁRIOS GERADOS", level="success")
+        except duckdb.Error as e:
+            print_log(f"ERRO AO GERAR CNAES SECUNDÁRIOS: {e}", level="error")
+            raise
+        finally:
+            self._close_connection()
+
+    def _add_primary_keys(self) -> None:
+        """
+        Adiciona as chaves primárias das tabelas que as definem separadamente no SCHEMA.
+        """
+        duckdb = require_duckdb()
+        print_log("ADICIONANDO CHAVES PRIMÁRIAS (TABELAS GRANDES)...", level="task")
+        for table_name, definition in self.schema.items():
+            pk_cols = definition.get('primary_key')
+            if not pk_cols:
+                continue
+            pk_cols_str = ', '.join(f'"{col}"' for col in pk_cols)
+            try:
+                print_log(f"  -> Adicionando PK em '{table_name}'...", level="docs")
+                self.conn.execute(f'ALTER TABLE "{table_name}" ADD PRIMARY KEY ({pk_cols_str});')
+            except duckdb.Error as e:
+                print_log(f"ERRO AO ADICIONAR PK em '{table_name}': {e}", level="error")
+                raise
+        print_log("CHAVES PRIMÁRIAS (TABELAS GRANDES) ADICIONADAS", level="success")
+
+    def patch_data(self) -> None:
+        """
+        Aplica as correções estáticas nos dados e, em seguida, adiciona as chaves primárias das tabelas grandes.
+        """
+        if self.conn is None: self.conn = self.connect()
+        try:
+            apply_static_fixes(self.conn, engine="duckdb")
+            self._add_primary_keys()
+        finally:
+            self._close_connection()
+
+    def enable_foreign_keys(self) -> None:
+        """
+        O DuckDB não permite adicionar chaves estrangeiras a tabelas existentes.
+        """
+        print_log("DUCKDB NÃO SUPORTA ADICIONAR CHAVES ESTRANGEIRAS APÓS A CARGA (FKs NÃO CRIADAS)", level="docs")
+
+    def create_indexes(self) -> None:
+        """
+        Cria os índices definidos no SCHEMA.
+
+        O DuckDB não tem INCLUDE nem índices parciais: as colunas de cobertura (`include`) entram no final da chave, e
+        os índices parciais (`where`) não são criados.
+        """
+        if self.conn is None: self.conn = self.connect()
+        duckdb = require_duckdb()
+        try:
+            print_log("CRIANDO ÍNDICES...", level="task")
+            all_indexes = []
+            for table_name, spec in self.schema.items():
+                for index in spec.get('indexes', []):
+                    if index.get('where'):
+                        print_log(f"ÍNDICE PARCIAL NÃO SUPORTADO NO DUCKDB (NÃO CRIADO): {index['name']}",
+                                  level="warning")
+                        continue
+                    all_indexes.append((table_name, index))
+            total = len(all_indexes)
+            width = len(str(total))
+            for i, (table_name, index) in enumerate(all_indexes, start=1):
+                index_cols = ', '.join(f'"{col}"' for col in index['columns'] + index.get('include', []))
+                self.conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{index["name"]}" ON "{table_name}" ({index_cols});')
+                print_log(f"[{i:0{width}}/{total}] ÍNDICE CRIADO: {index['name']}", level="docs")
+            print_log("ÍNDICES CRIADOS", level="success")
+        except duckdb.Error as e:
+            print_log(f"ERRO AO CRIAR ÍNDICES: {e}", level="error")
+            raise
+        finally:
+            self._close_connection()
+
+    def initialize_schema(self) -> None:
+        """
+        Fluxo de inicialização do banco:
+          1) drop_database
+          2) create_tables
+        """
+        self.drop_database()
+        self.create_tables()
@@ -0,0 +1,148 @@
+# db/duckdb_loader.py
+
+"""
+Módulo para carregamento de dados no banco de dados DuckDB (requer duckdb).
+
+Os membros dos ZIPs são extraídos para `DUCKDB_TEMP_DIR` e lidos pelo `read_csv` do DuckDB, que usa todas as threads
+na leitura. As mesmas transformações do pipeline Python (sanitização, datas, números) são feitas em SQL, no próprio
+INSERT ... SELECT.
+"""
+
+import os
+import shutil
+import time
+import zipfile
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from typing import List, Optional, Tuple
+from ..config import DEBUG_LOG, DUCKDB_TEMP_DIR, MEMORY_RESERVED_FRACTION
+from ..db.duckdb_builder import DuckDBBuilder, require_duckdb
+from ..db.schema import SCHEMA
+from ..utils.db_batch_producer import get_targets_from_zip_name
+from ..utils.logger import print_log
+from ..utils.memory import MemoryBudget
+from ..utils.metrics import LoadMetrics
+from ..utils.progress import pbar
+
+EXTRACT_CHUNK_SIZE = 16 * 1024 ** 2  # bytes copiados por leitura ao extrair os membros dos ZIPs
+
+
+def select_expression(column: str, sql_type: str) -> str:
+    """
+    Expressão SQL que converte a coluna lida do CSV (VARCHAR) para o tipo do SCHEMA.
+
+    - remove o byte nulo e apara espaços; vazio vira NULL (como no COPY do Postgres)
+    - DATE: 'YYYYMMDD' → DATE ('00000000', '0' e datas inválidas viram NULL)
+    - NUMERIC: formato brasileiro (1.234,56 → 1234.56)
+    """
+    clean = f"""NULLIF(trim(replace("{column}", chr(0), '')), '')"""
+    base_type = sql_type.upper().replace("NOT NULL", "").replace("PRIMARY KEY", "").strip()
+    if base_type.startswith("DATE"):
+        return (f"CASE WHEN {clean} IN ('00000000', '0') THEN NULL "
+                f"ELSE CAST(try_strptime({clean}, '%Y%m%d') AS DATE) END")
+    if base_type.startswith(("NUMERIC", "DECIMAL")):
+        return (f"TRY_CAST(CASE WHEN contains({clean}, ',') "
+                f"THEN replace(replace({clean}, '.', ''), ',', '.') ELSE {clean} END AS {base_type})")
+    return clean
+
+
+def build_insert_sql(table_name: str) -> str:
+    """
+    INSERT ... SELECT da tabela a partir do `read_csv` de um arquivo (parâmetro ?).
+    """
+    columns = SCHEMA[table_name]['columns']
+    csv_columns = ", ".join(f"'{col}': 'VARCHAR'" for col, _ in columns)
+    col_names = ", ".join(f'"{col}"' for col, _ in columns)
+    select_exprs = ", ".join(select_expression(col, sql_type) for col, sql_type in columns)
+    return (f'INSERT INTO "{table_name}" ({col_names}) '
+            f"SELECT {select_exprs} "
+            f"FROM read_csv(?, delim=';', quote='\"', escape='\"', header=false, encoding='latin-1', "
+            f"auto_detect=false, columns={{{csv_columns}}}, null_padding=true, strict_mode=false)")
+
+
+def _extract_members(jobs: List[Tuple[Path, str, str]], extracted: Queue, temp_dir: Path):
+    """
+    Extrai os membros dos ZIPs, um à frente da carga (o DuckDB lê um arquivo enquanto o próximo é extraído).
+    """
+    try:
+        for i, (zip_file, member, table_name) in enumerate(jobs):
+            start = time.perf_counter()
+            csv_path = temp_dir / f"{i:03d}_{zip_file.stem}.csv"
+            try:
+                with zipfile.ZipFile(zip_file, 'r') as zip_ref, zip_ref.open(member) as src, \
+                        open(csv_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, EXTRACT_CHUNK_SIZE)
+            except (OSError, zipfile.BadZipFile) as e:
+                print_log(f"Erro ao extrair {member} de {zip_file.name}: {e}", level="error")
+                csv_path.unlink(missing_ok=True)
+                continue
+            extracted.put((zip_file, table_name, csv_path, time.perf_counter() - start))
+    finally:
+        extracted.put(None)
+
+
+def run_duckdb_loader(files_dir: str, builder: DuckDBBuilder, total_records: int,
+                      memory_budget: Optional[MemoryBudget] = None,
+                      metrics: Optional[LoadMetrics] = None):
+    """
+    Inicia o processo de carga de dados para o DuckDB.
+    """
+    require_duckdb()
+    print_log(f"REALIZANDO CARGA NO BANCO DE DADOS DUCKDB...", level="task")
+
+    # arquivos e membros a carregar (a tabela estabelecimento_cnae_sec é gerada após a carga, em `build_cnae_sec`)
+    jobs: List[Tuple[Path, str, str]] = []
+    for zip_file in sorted(Path(files_dir).glob("*.zip")):
+        try:
+            table_name = next(t['name'] for t in get_targets_from_zip_name(zip_file.name)
+                              if t['name'] != 'estabelecimento_cnae_sec')
+            with zipfile.ZipFile(zip_file, 'r') as zip_ref:
+                jobs.extend((zip_file, info.filename, table_name) for info in zip_ref.infolist())
+        except (ValueError, zipfile.BadZipFile) as e:
+            print_log(f"Erro ao abrir {zip_file.name}: {e}", level="error")
+
+    temp_dir = Path(DUCKDB_TEMP_DIR)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    extracted: Queue = Queue(maxsize=1)
+    extractor = Thread(target=_extract_members, args=(jobs, extracted, temp_dir), name="EXTRACTOR", daemon=True)
+
+    memory_limit = int(memory_budget.limit * (1 - MEMORY_RESERVED_FRACTION)) if memory_budget else None
+    conn = builder.connect(memory_limit=memory_limit)
+    progress = pbar(total=total_records) if not DEBUG_LOG else None
+    inserted_total = 0
+
+    try:
+        extractor.start()
+        while True:
+            job = extracted.get()
+            if job is None:
+                break
+            zip_file, table_name, csv_path, unzip_secs = job
+            try:
+                write_start = time.perf_counter()
+                rows = conn.execute(build_insert_sql(table_name), [csv_path.as_posix()]).fetchone()[0]
+                write_secs = time.perf_counter() - write_start
+
+                inserted_total += rows
+                if metrics:
+                    metrics.add("unzip", table_name, str(zip_file), unzip_secs, worker="EXTRACTOR")
+                    metrics.add("write", table_name, str(zip_file), write_secs,
+                                rows=rows, nbytes=csv_path.stat().st_size)
+                if progress:
+                    progress.update(rows)
+                else:
+                    print_log(f"{inserted_total:>13,} | {zip_file.name.upper():<24} | {write_secs:.1f}s"
+                              .replace(",", "."), level="debug")
+            except Exception as insert_err:
+                print_log(f"ERRO AO INSERIR NO DUCKDB (tabela {table_name}, arquivo {zip_file.name}): {insert_err}",
+                          level="error")
+            finally:
+                os.remove(csv_path)
+
+    finally:
+        conn.close()
+        if progress:
+            progress.close()
+
+    print_log(f"CARGA DE DADOS CONCLUÍDA", level="success")
@@ -0,0 +1,195 @@
+# db/parquet_builder.py
+
+"""
+Módulo para construção do dataset Parquet (requer pyarrow).
+"""
+
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, Any, Optional
+from ..config import (
+    PARQUET_DIR, PARQUET_PARTITION_BY, PARQUET_COMPRESSION, PARQUET_COMPRESSION_LEVEL, PARQUET_ROW_GROUP_SIZE
+)
+from ..db.schema import SCHEMA
+from ..utils.db_patch import DOMAIN_COLUMNS, MISSING_DOMAIN_ROWS
+from ..utils.logger import print_log
+
+
+def require_pyarrow():
+    """
+    Importa o pyarrow sob demanda (dependência opcional, usada apenas pelo engine parquet).
+
+    :returns: módulos (pyarrow, pyarrow.parquet)
+    :raises ValueError: se o pyarrow não estiver instalado
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("O ENGINE PARQUET REQUER O PYARROW. INSTALE COM: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+def arrow_type(sql_type: str):
+    """
+    Converte o tipo da coluna no SCHEMA para o tipo do Arrow.
+    VARCHAR/TEXT → string | DATE → date32 | NUMERIC(p,s) → decimal128(p,s) | INTEGER/BIGINT → int32/int64
+    """
+    pa, _ = require_pyarrow()
+    base = sql_type.upper()
+    if base.startswith("DATE"):
+        return pa.date32()
+    numeric = re.match(r"(NUMERIC|DECIMAL)\((\d+),\s*(\d+)\)", base)
+    if numeric:
+        return pa.decimal128(int(numeric.group(2)), int(numeric.group(3)))
+    if base.startswith("BIGINT"):
+        return pa.int64()
+    if base.startswith(("INTEGER", "SMALLINT")):
+        return pa.int32()
+    return pa.string()
+
+
+class ParquetBuilder:
+    """
+    Classe para construção do dataset Parquet, com uma pasta por tabela.
+
+    As tabelas de `PARQUET_PARTITION_BY` são gravadas em subpastas `coluna=valor` (padrão hive), lidas diretamente
+    por pyarrow.dataset, DuckDB, Spark e pandas.
+
+    :params:
+        output_dir: diretório do dataset.
+    """
+
+    def __init__(self, output_dir: Optional[str] = PARQUET_DIR):
+        self.output_dir = Path(output_dir or PARQUET_DIR)
+        self.schema: Dict[str, Any] = SCHEMA
+        self.partition_by: Dict[str, str] = PARQUET_PARTITION_BY
+
+    def table_dir(self, table_name: str) -> Path:
+        return self.output_dir / table_name
+
+    def arrow_schema(self, table_name: str):
+        """Schema do Arrow da tabela, com os tipos do SCHEMA (todas as colunas aceitam nulos)."""
+        pa, _ = require_pyarrow()
+        return pa.schema([(col[0], arrow_type(col[1])) for col in self.schema[table_name]["columns"]])
+
+    def write_options(self) -> dict:
+        """Opções de gravação dos arquivos Parquet."""
+        return {
+            "compression": PARQUET_COMPRESSION,
+            "compression_level": PARQUET_COMPRESSION_LEVEL,
+            "write_statistics": True,
+        }
+
+    def drop_dataset(self) -> None:
+        """
+        Exclui o dataset anterior, se existir.
+        """
+        try:
+            if self.output_dir.exists():
+                shutil.rmtree(self.output_dir)
+        except OSError as e:
+            print_log(f"ERRO AO RECRIAR O DATASET: {e}", level="error")
+            raise
+
+    def create_tables(self) -> None:
+        """
+        Cria a pasta de cada tabela definida no SCHEMA.
+        """
+        require_pyarrow()
+        print_log("CRIANDO TABELAS...", level="task")
+        for table_name in self.schema:
+            self.table_dir(table_name).mkdir(parents=True, exist_ok=True)
+
+    def build_cnae_sec(self) -> None:
+        """
+        Grava `estabelecimento_cnae_sec` a partir da coluna `cod_cnae_secundario` do dataset de `estabelecimento`,
+        lido em lotes (split da lista + flatten, sem montar uma lista Python por CNAE).
+        """
+        pa, pq = require_pyarrow()
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        table_name = "estabelecimento_cnae_sec"
+        key_cols = [col[0] for col in self.schema[table_name]["columns"]][:-1]
+        arrow_schema = self.arrow_schema(table_name)
+        writer = None
+        try:
+            print_log("GERANDO CNAES SECUNDÁRIOS...", level="task")
+            dataset = ds.dataset(self.table_dir("estabelecimento"), format="parquet", partitioning="hive")
+            scanner = dataset.scanner(columns=key_cols + ["cod_cnae_secundario"],
+                                      filter=ds.field("cod_cnae_secundario").is_valid(),
+                                      batch_size=PARQUET_ROW_GROUP_SIZE)
+            for batch in scanner.to_batches():
+                cnaes = pc.split_pattern(batch.column("cod_cnae_secundario"), ",")
+                parents = pc.list_parent_indices(cnaes)
+                cnae = pc.utf8_trim_whitespace(pc.list_flatten(cnaes))
+                table = pa.Table.from_arrays([*(pc.take(batch.column(col), parents) for col in key_cols), cnae],
+                                             schema=arrow_schema)
+                table = table.filter(pc.not_equal(cnae, ""))
+                if not table.num_rows:
+                    continue
+                if writer is None:
+                    self.table_dir(table_name).mkdir(parents=True, exist_ok=True)
+                    writer = pq.ParquetWriter(str(self.table_dir(table_name) / "part-0.parquet"), arrow_schema,
+                                              **self.write_options())
+                writer.write_table(table, row_group_size=PARQUET_ROW_GROUP_SIZE)
+            print_log("CNAES SECUNDÁRIOS GERADOS", level="success")
+        except (OSError, pa.ArrowException) as e:
+            print_log(f"ERRO AO GERAR CNAES SECUNDÁRIOS: {e}", level="error")
+            raise
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def patch_data(self) -> None:
+        """
+        Acrescenta os códigos ausentes nas tabelas de domínio.
+
+        As demais correções de `apply_static_fixes` (cod_pais, cod_porte, simples sem empresa) são aplicadas durante
+        a carga, lote a lote. A remoção de empresas duplicadas não é feita no Parquet.
+        """
+        pa, pq = require_pyarrow()
+        try:
+            print_log("APLICANDO CORREÇÕES NA BASE DE DADOS...", level="task")
+            for table_name, rows in MISSING_DOMAIN_ROWS.items():
+                key_col, name_col = DOMAIN_COLUMNS[table_name]
+                table_dir = self.table_dir(table_name)
+                existing = set()
+                if any(table_dir.glob("*.parquet")):
+                    existing = set(pq.read_table(table_dir, columns=[key_col]).column(key_col).to_pylist())
+
+                missing = [(cod, nome) for cod, nome in rows if cod not in existing]
+                if not missing:
+                    continue
+
+                fixes = pa.table({key_col: [cod for cod, _ in missing], name_col: [nome for _, nome in missing]},
+                                 schema=self.arrow_schema(table_name))
+                pq.write_table(fixes, table_dir / "correcoes.parquet", **self.write_options())
+
+            print_log("CORREÇÕES APLICADAS", level="success")
+        except (OSError, pa.ArrowException) as e:
+            print_log(f"ERRO AO APLICAR CORREÇÕES: {e}", level="error")
+            raise
+
+    def create_indexes(self) -> None:
+        """
+        O Parquet não possui índices: os filtros usam as estatísticas (mín./máx.) de cada row group e as partições.
+        """
+        print_log("PARQUET NÃO UTILIZA ÍNDICES (FILTROS USAM AS ESTATÍSTICAS DOS ROW GROUPS)", level="docs")
+
+    def enable_foreign_keys(self) -> None:
+        """
+        O Parquet não possui chaves estrangeiras.
+        """
+        pass
+
+    def initialize_schema(self) -> None:
+        """
+        Fluxo de inicialização do dataset:
+          1) drop_dataset
+          2) create_tables
+        """
+        self.drop_dataset()
+        self.create_tables()
@@ -0,0 +1,271 @@
+# db/parquet_loader.py
+
+"""
+Módulo para gravação dos dados em um dataset Parquet (requer pyarrow).
+"""
+
+import time
+from collections import defaultdict
+from datetime import date
+from queue import Queue
+from threading import Thread
+from typing import Dict, List, Optional, Set
+from ..config import QUEUE_SIZE, DEBUG_LOG, PARQUET_ROW_GROUP_SIZE
+from ..db.parquet_builder import ParquetBuilder, require_pyarrow
+from ..utils.db_patch import INVALID_SIMPLES_CNPJ
+from ..utils.logger import print_log
+from ..utils.memory import MemoryBudget
+from ..utils.metrics import LoadMetrics
+from ..utils.profiler import LoadProfiler, profiled
+from ..utils.progress import pbar, update_progress
+from ..utils.db_batch_producer import produce_batches, BatchSizeController
+
+HIVE_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def rows_to_arrow(rows: List[tuple], arrow_schema):
+    """
+    Converte um lote de linhas em uma tabela do Arrow, com os tipos do schema.
+    Strings vazias viram nulos (como no COPY do Postgres).
+    """
+    pa, _ = require_pyarrow()
+    import pyarrow.compute as pc
+
+    arrays = []
+    for field, values in zip(arrow_schema, zip(*rows)):
+        if pa.types.is_date(field.type):
+            try:
+                arrays.append(pa.array(values, type=field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # datas que não puderam ser convertidas na transformação
+                arrays.append(pa.array([v if isinstance(v, date) else None for v in values], type=field.type))
+            continue
+
+        array = pa.array(values, type=pa.string())
+        array = pc.if_else(pc.equal(array, ""), pa.scalar(None, pa.string()), array)
+        if not pa.types.is_string(field.type):
+            array = array.cast(field.type)
+        arrays.append(array)
+
+    return pa.Table.from_arrays(arrays, schema=arrow_schema)
+
+
+def apply_table_fixes(table_name: str, table):
+    """
+    Aplica, no lote, as correções que nos bancos são feitas após a carga (ver `apply_static_fixes`).
+    """
+    pa, _ = require_pyarrow()
+    import pyarrow.compute as pc
+
+    if table_name == "estabelecimento":
+        idx = table.schema.get_field_index("cod_pais")
+        cod_pais = table.column(idx)
+        cod_pais = pc.if_else(pc.equal(cod_pais, "0"), pa.scalar(None, pa.string()), cod_pais)
+        cod_pais = pc.if_else(pc.equal(pc.utf8_length(cod_pais), 2), pc.utf8_lpad(cod_pais, 3, "0"), cod_pais)
+        table = table.set_column(idx, "cod_pais", cod_pais)
+
+    elif table_name == "empresa":
+        idx = table.schema.get_field_index("cod_porte")
+        table = table.set_column(idx, "cod_porte", pc.fill_null(table.column(idx), "00"))
+
+    elif table_name == "simples":
+        invalid = pa.array(INVALID_SIMPLES_CNPJ, type=pa.string())
+        table = table.filter(pc.invert(pc.is_in(table.column("cnpj_basico"), value_set=invalid)))
+
+    return table
+
+
+class ParquetTableWriter:
+    """
+    Grava os lotes de uma tabela em arquivos Parquet, agrupando as linhas em row groups de `row_group_size`.
+
+    Se a tabela for particionada, cada valor da coluna de partição tem a sua pasta (`coluna=valor`) e o seu
+    arquivo; a coluna de partição não é gravada nos arquivos (vem do nome da pasta).
+
+    :params:
+        builder: ParquetBuilder do dataset.
+        table_name: nome da tabela.
+        row_group_size: quantidade de linhas por row group.
+    """
+
+    def __init__(self, builder: ParquetBuilder, table_name: str, row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+        self.builder = builder
+        self.table_name = table_name
+        self.row_group_size = row_group_size
+        self.arrow_schema = builder.arrow_schema(table_name)
+        self.partition_col = builder.partition_by.get(table_name)
+        self.file_schema = self.arrow_schema
+        if self.partition_col:
+            self.file_schema = self.arrow_schema.remove(self.arrow_schema.get_field_index(self.partition_col))
+        self._writers: Dict[Optional[str], object] = {}
+        self._buffers: Dict[Optional[str], list] = defaultdict(list)
+        self._buffered: Dict[Optional[str], int] = defaultdict(int)
+
+    def write(self, rows: List[tuple]) -> None:
+        """Converte o lote e o acumula, gravando os row groups completos."""
+        pa, _ = require_pyarrow()
+        import pyarrow.compute as pc
+
+        table = apply_table_fixes(self.table_name, rows_to_arrow(rows, self.arrow_schema))
+        if not self.partition_col:
+            self._append(None, table)
+            return
+
+        idx = table.schema.get_field_index(self.partition_col)
+        partition = table.column(idx)
+        data = table.remove_column(idx)
+        for value in pc.unique(partition).to_pylist():
+            mask = pc.is_null(partition) if value is None else pc.equal(partition, value)
+            self._append(value, data.filter(mask))
+
+    def _append(self, key: Optional[str], table) -> None:
+        self._buffers[key].append(table)
+        self._buffered[key] += table.num_rows
+        if self._buffered[key] >= self.row_group_size:
+            self._flush(key)
+
+    def _flush(self, key: Optional[str], final: bool = False) -> None:
+        pa, pq = require_pyarrow()
+        table = pa.concat_tables(self._buffers.pop(key))
+        self._buffered.pop(key)
+
+        # somente row groups completos; o restante volta para o buffer (exceto no final)
+        complete_rows = table.num_rows if final else table.num_rows - table.num_rows % self.row_group_size
+        if complete_rows < table.num_rows:
+            rest = table.slice(complete_rows)
+            self._buffers[key].append(rest)
+            self._buffered[key] += rest.num_rows
+        if not complete_rows:
+            return
+
+        writer = self._writers.get(key)
+        if writer is None:
+            writer = pq.ParquetWriter(str(self._file_path(key)), self.file_schema, **self.builder.write_options())
+            self._writers[key] = writer
+        writer.write_table(table.slice(0, complete_rows), row_group_size=self.row_group_size)
+
+    def _file_path(self, key: Optional[str]):
+        table_dir = self.builder.table_dir(self.table_name)
+        if self.partition_col:
+            table_dir = table_dir / f"{self.partition_col}={HIVE_NULL_PARTITION if key is None else key}"
+        table_dir.mkdir(parents=True, exist_ok=True)
+        return table_dir / "part-0.parquet"
+
+    def close(self) -> None:
+        """Grava as linhas restantes e fecha os arquivos."""
+        for key in list(self._buffers):
+            self._flush(key, final=True)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+def consume_batches(insertion_queue, builder: ParquetBuilder, total_records: int,
+                    metrics: Optional[LoadMetrics] = None,
+                    batch_controller: Optional[BatchSizeController] = None):
+    """
+    Consome lotes da fila e os grava no dataset Parquet.
+    """
+    progress = None
+    if not DEBUG_LOG:
+        progress = pbar(total=total_records)
+
+    writers: Dict[str, ParquetTableWriter] = {}
+    inserted_total = 0
+
+    try:
+        while True:
+            wait_start = time.perf_counter()
+            item = insertion_queue.get()
+            wait_secs = time.perf_counter() - wait_start
+            if item is None:
+                insertion_queue.task_done()
+                break
+
+            rows = item["rows"]
+
+            if not rows:
+                insertion_queue.task_done()
+                continue
+
+            table = item["table"]
+
+            write_start = time.perf_counter()
+            try:
+                writer = writers.get(table)
+                if writer is None:
+                    writer = writers[table] = ParquetTableWriter(builder, table)
+                writer.write(rows)
+            except Exception as write_err:
+                print_log(f"ERRO AO GRAVAR O PARQUET (tabela {table}): {write_err}", level="error")
+
+            write_secs = time.perf_counter() - write_start
+            if batch_controller:
+                batch_controller.record(table, len(rows), write_secs)
+            if metrics:
+                metrics.add("queue_get", table, item["filename"], wait_secs)
+                metrics.add("write", table, item["filename"], write_secs,
+                            rows=len(rows), nbytes=item.get("nbytes", 0))
+
+            if table != 'estabelecimento_cnae_sec':
+                inserted_total += len(rows)
+
+                update_progress(
+                    rows_inserted=len(rows),
+                    accumulated_total=inserted_total,
+                    filename=item["filename"],
+                    insertion_queue=insertion_queue,
+                    queue_size_max=insertion_queue.maxsize,
+                    total=total_records,
+                    debug=DEBUG_LOG,
+                    bar=progress
+                )
+
+            insertion_queue.task_done()
+
+    except Exception as e:
+        print_log(f"ERRO FATAL NA CARGA PARQUET: {e}", level="error")
+
+    finally:
+        for writer in writers.values():
+            try:
+                writer.close()
+            except Exception as close_err:
+                print_log(f"ERRO AO FINALIZAR O PARQUET (tabela {writer.table_name}): {close_err}", level="error")
+        if progress:
+            progress.close()
+
+
+def run_parquet_loader(files_dir: str, builder: ParquetBuilder, total_records: int,
+                       parallel: Optional[bool] = False,
+                       memory_budget: Optional[MemoryBudget] = None,
+                       metrics: Optional[LoadMetrics] = None, profiler: Optional[LoadProfiler] = None,
+                       batch_controller: Optional[BatchSizeController] = None,
+                       skip_tables: Optional[Set[str]] = None):
+    """
+    Inicia o processo de gravação dos dados no dataset Parquet.
+    """
+    require_pyarrow()
+    print_log(f"GRAVANDO DATASET PARQUET EM: {builder.output_dir}", level="task")
+    insertion_queue = Queue(maxsize=memory_budget.queue_size if memory_budget else QUEUE_SIZE)
+
+    writer = Thread(target=profiled(consume_batches, profiler),
+                    args=(insertion_queue, builder, total_records, metrics, batch_controller),
+                    name="WRITER")
+    writer.start()
+
+    completed = False  # se o produtor terminou sem erros
+    try:
+        produce_batches(files_dir, insertion_queue, engine="parquet", parallel=parallel,
+                        memory_budget=memory_budget, metrics=metrics, profiler=profiler,
+                        batch_controller=batch_controller, skip_tables=skip_tables)
+        completed = True
+    finally:
+        insertion_queue.put(None)
+        writer.join()
+        if batch_controller:
+            batch_controller.log_summary()
+        if completed:
+            print_log(f"CARGA DE DADOS CONCLUÍDA", level="success")
+        else:
+            print_log("CARGA DE DADOS INTERROMPIDA", level="error")
@@ -4,19 +4,50 @@
 Módulo para construção do banco de dados PostgreSQL.
 """
 
+import time
 import psycopg2
-from ..db.schema import SCHEMA
-from ..utils.db_patch import apply_static_fixes
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from ..config import (
+    FULLTEXT_COLUMNS, POSTGRES_PARTITIONS, POSTGRES_DDL_THREADS, POSTGRES_SCHEMA, POSTGRES_SHADOW_SCHEMA,
+    POSTGRES_PREVIOUS_SCHEMA, POSTGRES_PUBLISH_MAINTENANCE_WORK_MEM, POSTGRES_VACUUM_PARALLEL, POSTGRES_ENCODINGS,
+    DEFAULT_POSTGRES_ENCODING
+)
+from ..db.schema import SCHEMA, UF_CODES, COMPACT_VIEW_PREFIX, is_compact, index_where
+from ..utils.db_patch import apply_static_fixes, apply_table_fixes
 from ..utils.logger import print_log
 
 
 class PostgresBuilder:
     """
     Classe para construção do banco de dados PostgreSQL.
+
+    Com `partitioned`, as tabelas com `partition_by` no SCHEMA são criadas com partições HASH (`POSTGRES_PARTITIONS`)
+    na coluna indicada. As PKs, os índices e as FKs dessas tabelas são criados em cada partição, em paralelo
+    (`POSTGRES_DDL_THREADS` conexões), e depois anexados à tabela principal.
+
+    As tabelas são criadas UNLOGGED (sem WAL durante a carga). Com `publish`, a carga termina com `publish()`:
+      - "logged": as tabelas passam a LOGGED (`SET LOGGED`), em paralelo, na ordem das FKs;
+      - "swap": a carga é feita no schema `POSTGRES_SHADOW_SCHEMA`, que após o `SET LOGGED` é trocado com o schema
+        publicado (`POSTGRES_SCHEMA`) em uma única transação, sem indisponibilidade para quem consulta.
+
+    :params:
+        config: configuração da conexão.
+        partitioned: se deve particionar as tabelas com `partition_by` no SCHEMA.
+        publish: modo de publicação ("logged" ou "swap"). None mantém as tabelas UNLOGGED.
+        encoding: encoding do banco (`POSTGRES_ENCODINGS`), usado na criação do banco e nas conexões.
     """
 
-    def __init__(self, config):
-        self.config = config
+    def __init__(self, config, partitioned: bool = False, publish: Optional[str] = None,
+                 encoding: str = DEFAULT_POSTGRES_ENCODING):
+        self.schema_name = POSTGRES_SHADOW_SCHEMA if publish == "swap" else POSTGRES_SCHEMA
+        # as conexões (inclusive as dos loaders, que usam `self.config`) enxergam somente o schema da carga
+        self.config = {**config, "options": f"-c search_path={self.schema_name}"}
+        self.partitioned = partitioned
+        self.partitions = POSTGRES_PARTITIONS
+        self.publish_mode = publish
+        self.encoding = encoding
+        self.db_encoding, self.client_encoding, _ = POSTGRES_ENCODINGS[encoding]
         self.conn = None
 
     def _connect(self):
@@ -28,13 +59,34 @@ class PostgresBuilder:
                 database=self.config["database"],
                 user=self.config["user"],
                 password=self.config["password"],
+                options=self.config["options"],
             )
-            conn.set_client_encoding('WIN1252')
+            conn.set_client_encoding(self.client_encoding)
             return conn
         except psycopg2.Error as e:
             print_log(f"ERRO AO CONECTAR NO BANCO: {e}", level="error")
             raise
 
+    def _partition_column(self, table_name: str) -> Optional[str]:
+        """Coluna de particionamento da tabela (None se a tabela não for particionada)."""
+        return SCHEMA[table_name].get('partition_by') if self.partitioned else None
+
+    def _partition_names(self, table_name: str) -> List[str]:
+        return [f"{table_name}_p{i}" for i in range(self.partitions)]
+
+    def _execute_parallel(self, statements: List[str]) -> None:
+        """Executa comandos independentes em paralelo, cada um na sua própria conexão."""
+        def execute(sql: str):
+            conn = self._connect()
+            try:
+                conn.autocommit = True
+                conn.cursor().execute(sql)
+            finally:
+                conn.close()
+
+        with ThreadPoolExecutor(max_workers=POSTGRES_DDL_THREADS) as executor:
+            list(executor.map(execute, statements))
+
     def _create_database(self):
         try:
             temp_config = self.config.copy()
@@ -43,12 +95,16 @@ class PostgresBuilder:
             conn.autocommit = True
             cur = conn.cursor()
             db_name = self.config['database']
-            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s;", (db_name,))
+            cur.execute("SELECT pg_encoding_to_char(encoding) FROM pg_database WHERE datname = %s;", (db_name,))
             exists = cur.fetchone()
             if not exists:
-                cur.execute(f"CREATE DATABASE {db_name} ENCODING 'WIN1252' TEMPLATE template0;")
-                print_log("BANCO CRIADO", level="success")
+                cur.execute(f"CREATE DATABASE {db_name} ENCODING '{self.db_encoding}' TEMPLATE template0;")
+                print_log(f"BANCO CRIADO ({self.db_encoding})", level="success")
             conn.close()
+            if exists and self.db_encoding == "UTF8" and exists[0] != "UTF8":
+                # os textos em LATIN1 nem sempre têm equivalente em outros encodings (ex.: WIN1252)
+                raise ValueError(f"O BANCO {db_name} USA O ENCODING {exists[0]} (--encoding {self.encoding} REQUER "
+                                 f"{self.db_encoding}). REMOVA O BANCO OU USE OUTRO --db-name")
         except psycopg2.Error as e:
             print_log(f"ERRO AO CRIAR BANCO: {e}", level="error")
             raise
@@ -58,9 +114,12 @@ class PostgresBuilder:
             conn = self._connect()
             conn.autocommit = True
             cur = conn.cursor()
-            cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = 'public';")
+            if self.schema_name != POSTGRES_SCHEMA:
+                cur.execute(f'DROP SCHEMA IF EXISTS "{self.schema_name}" CASCADE;')
+            cur.execute(f'CREATE SCHEMA IF NOT EXISTS "{self.schema_name}";')
+            cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = %s;", (self.schema_name,))
             for (table_name,) in cur.fetchall():
-                cur.execute(f'DROP TABLE IF EXISTS "{table_name}" CASCADE;')
+                cur.execute(f'DROP TABLE IF EXISTS {self.schema_name}."{table_name}" CASCADE;')
             conn.close()
             print_log("TABELAS ANTERIORES REMOVIDAS", level="docs")
         except psycopg2.Error as e:
@@ -73,6 +132,7 @@ class PostgresBuilder:
         (em tabelas menores) são criadas aqui. As PKs de tabelas maiores,
         definidas separadamente no SCHEMA, são adiadas.
         """
+        schema = self.schema_name
         try:
             print_log("CRIANDO TABELAS...", level="task")
             if self.conn is None: self.conn = self._connect()
@@ -86,13 +146,87 @@ class PostgresBuilder:
                 ]
                 columns_str = ", ".join(columns_sql)
 
-                cur.execute(f'CREATE UNLOGGED TABLE IF NOT EXISTS public."{table_name}" ({columns_str});')
+                partition_col = self._partition_column(table_name)
+                if partition_col:
+                    # a tabela principal não guarda dados (e é permanente, para poder ser referenciada por tabelas
+                    # LOGGED após a publicação); as partições é que são UNLOGGED
+                    cur.execute(f'CREATE TABLE IF NOT EXISTS {schema}."{table_name}" ({columns_str}) '
+                                f'PARTITION BY HASH ("{partition_col}");')
+                    for i, partition in enumerate(self._partition_names(table_name)):
+                        cur.execute(f'CREATE UNLOGGED TABLE IF NOT EXISTS {schema}."{partition}" '
+                                    f'PARTITION OF {schema}."{table_name}" '
+                                    f'FOR VALUES WITH (MODULUS {self.partitions}, REMAINDER {i});')
+                    continue
+
+                cur.execute(f'CREATE UNLOGGED TABLE IF NOT EXISTS {schema}."{table_name}" ({columns_str});')
 
             print_log("TABELAS CRIADAS", level="success")
         except psycopg2.Error as e:
             print_log(f"ERRO AO CRIAR TABELAS: {e}", level="error")
             raise
 
+    @staticmethod
+    def _view_expression(column: str, kind) -> str:
+        """Expressão da coluna do perfil --compact no formato original (`kind`: largura, 'uf' ou 'date')."""
+        if kind == 'uf':
+            cases = " ".join(f"WHEN {cod} THEN '{uf}'" for uf, cod in UF_CODES.items())
+            return f'CASE "{column}" {cases} END'
+        if kind == 'date':
+            return f"""to_date("{column}"::text, 'YYYYMMDD')"""
+        return f"""lpad("{column}"::text, {kind}, '0')"""
+
+    def create_views(self):
+        """
+        Perfil --compact: cria as views `v_<tabela>`, com os códigos como texto com zeros à esquerda e a UF em sigla
+        (como no schema padrão).
+        """
+        schema = self.schema_name
+        try:
+            print_log("CRIANDO VIEWS DO PERFIL COMPACTO...", level="task")
+            if self.conn is None: self.conn = self._connect()
+            self.conn.autocommit = True
+            cur = self.conn.cursor()
+            for table_name, definition in SCHEMA.items():
+                compact_columns = definition.get('compact_columns')
+                if not compact_columns:
+                    continue
+                select_cols = ", ".join(
+                    f'{self._view_expression(col, compact_columns[col])} AS "{col}"' if col in compact_columns
+                    else f'"{col}"'
+                    for col, _ in definition['columns']
+                )
+                cur.execute(f'CREATE OR REPLACE VIEW {schema}."{COMPACT_VIEW_PREFIX}{table_name}" AS '
+                            f'SELECT {select_cols} FROM {schema}."{table_name}";')
+            print_log("VIEWS CRIADAS", level="success")
+        except psycopg2.Error as e:
+            print_log(f"ERRO AO CRIAR VIEWS: {e}", level="error")
+            raise
+
+    def _add_primary_key(self, cur, table_name: str) -> None:
+        """Adiciona a PK da tabela, se definida separadamente no SCHEMA (`primary_key`)."""
+        pk_cols = SCHEMA[table_name].get('primary_key')
+        if not pk_cols:
+            return
+
+        schema = self.schema_name
+        pk_cols_str = ', '.join(f'"{col}"' for col in pk_cols)
+        sql_command = f'ALTER TABLE {schema}."{table_name}" ADD PRIMARY KEY ({pk_cols_str});'
+
+        try:
+            print_log(f"  -> Adicionando PK em '{table_name}'...", level="docs")
+            if self._partition_column(table_name):
+                # PK de cada partição em paralelo; a PK da tabela principal apenas as anexa
+                self._execute_parallel([f'ALTER TABLE {schema}."{partition}" ADD PRIMARY KEY ({pk_cols_str});'
+                                        for partition in self._partition_names(table_name)])
+            cur.execute(sql_command)
+        except psycopg2.Error as e:
+            # 42P16 = multiple_primary_keys, 42P07 = relation_already_exists
+            if e.pgcode in ('42P16', '42P07'):
+                print_log(f"     ℹ PK em '{table_name}' já existe, pulando.", level="docs")
+            else:
+                print_log(f"ERRO AO ADICIONAR PK em '{table_name}': {e}", level="error")
+                raise
+
     def _add_primary_keys(self):
         """
         Adiciona as chaves primárias APENAS para as tabelas que as definem
@@ -103,28 +237,39 @@ class PostgresBuilder:
         self.conn.autocommit = True
         cur = self.conn.cursor()
 
-        for table_name, definition in SCHEMA.items():
-            pk_cols = []
-            if 'primary_key' in definition:
-                pk_cols = definition['primary_key']
-
-            if pk_cols:
-                pk_cols_str = ', '.join(f'"{col}"' for col in pk_cols)
-                sql_command = f'ALTER TABLE public."{table_name}" ADD PRIMARY KEY ({pk_cols_str});'
-
-                try:
-                    print_log(f"  -> Adicionando PK em '{table_name}'...", level="docs")
-                    cur.execute(sql_command)
-                except psycopg2.Error as e:
-                    # 42P16 = multiple_primary_keys, 42P07 = relation_already_exists
-                    if e.pgcode in ('42P16', '42P07'):
-                        print_log(f"     ℹ PK em '{table_name}' já existe, pulando.", level="docs")
-                    else:
-                        print_log(f"ERRO AO ADICIONAR PK em '{table_name}': {e}", level="error")
-                        raise
+        for table_name in SCHEMA:
+            self._add_primary_key(cur, table_name)
 
         print_log("CHAVES PRIMÁRIAS (TABELAS GRANDES) ADICIONADAS", level="success")
 
+    def build_cnae_sec(self):
+        """
+        Preenche `estabelecimento_cnae_sec` a partir da coluna `cod_cnae_secundario` de `estabelecimento`, em um único
+        INSERT ... SELECT com `unnest(string_to_array(...))`.
+        """
+        schema = self.schema_name
+        key_cols = [col[0] for col in SCHEMA['estabelecimento_cnae_sec']['columns']][:-1]
+        cnae_type = SCHEMA['estabelecimento_cnae_sec']['columns'][-1][1].split()[0]  # INTEGER no perfil --compact
+        insert_cols = ", ".join(key_cols)
+        select_cols = ", ".join(f"e.{col}" for col in key_cols)
+        try:
+            print_log("GERANDO CNAES SECUNDÁRIOS...", level="task")
+            if self.conn is None: self.conn = self._connect()
+            self.conn.autocommit = True
+            cur = self.conn.cursor()
+            cur.execute(f"""
+                INSERT INTO {schema}.estabelecimento_cnae_sec ({insert_cols}, cod_cnae)
+                SELECT {select_cols}, CAST(trim(c.cnae) AS {cnae_type})
+                FROM {schema}.estabelecimento e
+                CROSS JOIN LATERAL unnest(string_to_array(e.cod_cnae_secundario, ',')) AS c(cnae)
+                WHERE e.cod_cnae_secundario IS NOT NULL
+                  AND trim(c.cnae) <> '';
+            """)
+            print_log("CNAES SECUNDÁRIOS GERADOS", level="success")
+        except psycopg2.Error as e:
+            print_log(f"ERRO AO GERAR CNAES SECUNDÁRIOS: {e}", level="error")
+            raise
+
     def patch_data(self):
         """
         Aplica correções estáticas nos dados e, em seguida, adiciona as
@@ -135,6 +280,49 @@ class PostgresBuilder:
         apply_static_fixes(self.conn, engine="postgres")
         self._add_primary_keys()
 
+    def prepare_table(self, table_name: str, indexes: bool = True) -> None:
+        """
+        Correções, PK e índices de uma única tabela, na sua própria conexão (task graph: executado assim que a
+        carga da tabela termina, enquanto as demais continuam sendo carregadas).
+
+        :params:
+            table_name: nome da tabela.
+            indexes: se deve criar os índices da tabela (False com --skip-index).
+        """
+        start = time.perf_counter()
+        conn = self._connect()
+        try:
+            apply_table_fixes(conn, table_name, engine="postgres")
+            conn.autocommit = True
+            cur = conn.cursor()
+            self._add_primary_key(cur, table_name)
+            if indexes:
+                for index in SCHEMA[table_name].get('indexes', []):
+                    try:
+                        self._create_index(cur, table_name, index['name'], self._index_definition(index))
+                        print_log(f"ÍNDICE CRIADO: {index['name']}", level="docs")
+                    except psycopg2.Error as e:
+                        print_log(f"Erro ao criar índice {index['name']}: {e}", level="error")
+        except psycopg2.Error as e:
+            print_log(f"ERRO AO PREPARAR A TABELA '{table_name}': {e}", level="error")
+            raise
+        finally:
+            conn.close()
+        print_log(f"TABELA PRONTA: {table_name} ({time.perf_counter() - start:.1f}s)", level="success")
+
+    def _foreign_key_sql(self, table_name: str, fk: dict, constraint_name: str) -> str:
+        """Comando que cria a FK do SCHEMA `fk` na tabela (ou partição) `table_name`."""
+        fk_columns = ', '.join(f'"{col}"' for col in fk['columns'])
+        ref_table_and_cols = fk['references']
+        ref_table = ref_table_and_cols.split('(')[0].strip()
+        ref_cols_str = ref_table_and_cols.split('(')[1].replace(')', '')
+        ref_cols = ', '.join(f'"{c.strip()}"' for c in ref_cols_str.split(','))
+
+        return (f'ALTER TABLE {self.schema_name}."{table_name}" '
+                f'ADD CONSTRAINT "{constraint_name}" '
+                f'FOREIGN KEY ({fk_columns}) '
+                f'REFERENCES {self.schema_name}."{ref_table}"({ref_cols});')
+
     def enable_foreign_keys(self):
         """Cria as chaves estrangeiras definidas no SCHEMA."""
         try:
@@ -156,18 +344,16 @@ class PostgresBuilder:
             for i, (table_name, fk, fk_index) in enumerate(all_fks, start=1):
                 constraint_name = f"fk_{table_name}_{fk_index}"
                 try:
-                    fk_columns = ', '.join(f'"{col}"' for col in fk['columns'])
-                    ref_table_and_cols = fk['references']
-                    ref_table = ref_table_and_cols.split('(')[0].strip()
-                    ref_cols_str = ref_table_and_cols.split('(')[1].replace(')', '')
-                    ref_cols = ', '.join(f'"{c.strip()}"' for c in ref_cols_str.split(','))
-
-                    fk_sql = (f'ALTER TABLE public."{table_name}" '
-                              f'ADD CONSTRAINT "{constraint_name}" '
-                              f'FOREIGN KEY ({fk_columns}) '
-                              f'REFERENCES public."{ref_table}"({ref_cols});')
-
-                    cur.execute(fk_sql)
+                    if self._partition_column(table_name):
+                        # FK (e validação) de cada partição em paralelo; a FK da tabela principal apenas as anexa
+                        self._execute_parallel([self._foreign_key_sql(partition, fk, constraint_name)
+                                                for partition in self._partition_names(table_name)])
+                        if not self._is_permanent(cur, fk['references'].split('(')[0].strip()):
+                            # tabela principal (permanente) não referencia UNLOGGED: anexada na publicação
+                            print_log(f"[{i:0{width}}/{total}] FK CRIADA NAS PARTIÇÕES: {constraint_name}",
+                                      level="docs")
+                            continue
+                    cur.execute(self._foreign_key_sql(table_name, fk, constraint_name))
                     print_log(f"[{i:0{width}}/{total}] FK CRIADA: {constraint_name} em '{table_name}'", level="docs")
 
                 except psycopg2.Error as e:
@@ -183,8 +369,37 @@ class PostgresBuilder:
             print_log(f"ERRO AO CRIAR FKs: {e}", level="error")
             raise
 
+    def _create_index(self, cur, table_name: str, index_name: str, definition: str) -> None:
+        """
+        Cria um índice (`definition`: colunas ou método e expressões). Nas tabelas particionadas, o índice de cada
+        partição é criado em paralelo e anexado ao índice (vazio) da tabela principal.
+        """
+        schema = self.schema_name
+        if not self._partition_column(table_name):
+            cur.execute(f'CREATE INDEX IF NOT EXISTS "{index_name}" ON {schema}."{table_name}" {definition};')
+            return
+        cur.execute(f'CREATE INDEX IF NOT EXISTS "{index_name}" ON ONLY {schema}."{table_name}" {definition};')
+        partition_indexes = [(f"{index_name}_p{p}", partition)
+                             for p, partition in enumerate(self._partition_names(table_name))]
+        self._execute_parallel([f'CREATE INDEX IF NOT EXISTS "{name}" ON {schema}."{partition}" {definition};'
+                                for name, partition in partition_indexes])
+        for name, _ in partition_indexes:
+            cur.execute(f'ALTER INDEX {schema}."{index_name}" ATTACH PARTITION {schema}."{name}";')
+
+    @staticmethod
+    def _index_definition(index: dict) -> str:
+        """Colunas do índice do SCHEMA, com INCLUDE e WHERE (índices de cobertura e parciais)."""
+        index_cols = ', '.join(f'"{col}"' for col in index['columns'])
+        definition = f"({index_cols})"
+        if index.get('include'):
+            definition += " INCLUDE ({})".format(', '.join(f'"{col}"' for col in index['include']))
+        where = index_where(index)
+        if where:
+            definition += f" WHERE {where}"
+        return definition
+
     def create_indexes(self):
-        """Cria os índices definidos no SCHEMA."""
+        """Cria os índices definidos no SCHEMA (os do perfil de `--index-profile`), inclusive parciais e INCLUDE."""
         try:
             print_log("CRIANDO ÍNDICES...", level="task")
             if self.conn is None: self.conn = self._connect()
@@ -203,9 +418,7 @@ class PostgresBuilder:
                 index_name = "desconhecido"
                 try:
                     index_name = index['name']
-                    index_cols = ', '.join(f'"{col}"' for col in index['columns'])
-                    stmt = f'CREATE INDEX IF NOT EXISTS "{index_name}" ON public."{table_name}" ({index_cols});'
-                    cur.execute(stmt)
+                    self._create_index(cur, table_name, index_name, self._index_definition(index))
                     print_log(f"[{i:0{width}}/{total}] ÍNDICE CRIADO: {index_name}", level="docs")
                 except (psycopg2.Error, KeyError) as e:
                     print_log(f"Erro ao criar índice {index_name}: {e}", level="error")
@@ -215,6 +428,247 @@ class PostgresBuilder:
             print_log(f"ERRO AO CRIAR ÍNDICES: {e}", level="error")
             raise
 
+    def create_fulltext(self):
+        """
+        Cria os índices de busca textual das colunas de FULLTEXT_COLUMNS: GIN com trigramas (pg_trgm) sobre o nome
+        sem acentos, usados em consultas `f_unaccent(coluna) ILIKE f_unaccent('%nome%')`.
+
+        As extensões e a função `f_unaccent` ficam em POSTGRES_SCHEMA (não são trocadas pelo --publish swap).
+        """
+        base = POSTGRES_SCHEMA
+        try:
+            print_log("CRIANDO ÍNDICES DE BUSCA TEXTUAL...", level="task")
+            if self.conn is None: self.conn = self._connect()
+            self.conn.autocommit = True
+            cur = self.conn.cursor()
+            cur.execute(f"CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA {base};")
+            cur.execute(f"CREATE EXTENSION IF NOT EXISTS unaccent WITH SCHEMA {base};")
+            # unaccent() não é IMMUTABLE (depende do search_path), o que impede o seu uso em índices
+            cur.execute(f"""
+                CREATE OR REPLACE FUNCTION {base}.f_unaccent(text) RETURNS text
+                LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+                AS $$ SELECT {base}.unaccent('{base}.unaccent'::regdictionary, $1) $$;
+            """)
+            for table_name, column in FULLTEXT_COLUMNS.items():
+                index_name = f"idx_{table_name}_{column}_trgm"
+                self._create_index(cur, table_name, index_name,
+                                   f'USING gin ({base}.f_unaccent("{column}") {base}.gin_trgm_ops)')
+                print_log(f"ÍNDICE CRIADO: {index_name}", level="docs")
+            print_log("ÍNDICES DE BUSCA TEXTUAL CRIADOS", level="success")
+        except psycopg2.Error as e:
+            print_log(f"ERRO AO CRIAR ÍNDICES DE BUSCA TEXTUAL: {e}", level="error")
+            raise
+
+    def vacuum_analyze(self, freeze: bool = False) -> None:
+        """
+        VACUUM (ANALYZE) de todas as tabelas, em paralelo (`POSTGRES_DDL_THREADS` conexões, das maiores para as
+        menores), com `PARALLEL POSTGRES_VACUUM_PARALLEL` na limpeza dos índices de cada tabela: grava o mapa de
+        visibilidade e as estatísticas do planner logo após a carga, em vez de esperar pelo autovacuum.
+
+        :params:
+            freeze: se deve congelar as linhas (após o SET LOGGED da publicação, que reescreve as tabelas).
+        """
+        schema = self.schema_name
+        options = f"ANALYZE, PARALLEL {POSTGRES_VACUUM_PARALLEL}"
+        if freeze:
+            options = "FREEZE, " + options
+        try:
+            print_log(f"EXECUTANDO VACUUM ({options}) NAS TABELAS...", level="task")
+            conn = self._connect()
+            try:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = %s AND c.relkind = 'r'
+                    ORDER BY pg_total_relation_size(c.oid) DESC;
+                """, (schema,))
+                tables = [name for (name,) in cur.fetchall()]
+            finally:
+                conn.close()
+            self._execute_parallel([f'VACUUM ({options}) {schema}."{table_name}";' for table_name in tables])
+            print_log("VACUUM CONCLUÍDO", level="success")
+        except psycopg2.Error as e:
+            print_log(f"ERRO NO VACUUM: {e}", level="error")
+            raise
+
+    def _is_permanent(self, cur, table_name: str) -> bool:
+        """Se a tabela é permanente (LOGGED)."""
+        cur.execute("SELECT relpersistence = 'p' FROM pg_class WHERE oid = %s::regclass;",
+                    (f'{self.schema_name}."{table_name}"',))
+        return cur.fetchone()[0]
+
+    @staticmethod
+    def _referenced_tables(table_name: str) -> set:
+        return {fk['references'].split('(')[0].strip() for fk in SCHEMA[table_name].get('foreign_keys', [])}
+
+    def _logged_levels(self) -> List[List[str]]:
+        """
+        Tabelas agrupadas em níveis para o SET LOGGED: uma tabela LOGGED não pode referenciar uma UNLOGGED, então
+        cada nível contém somente tabelas cujas referências estão nos níveis anteriores.
+        """
+        pending = {table_name: self._referenced_tables(table_name) - {table_name} for table_name in SCHEMA}
+        levels, done = [], set()
+        while pending:
+            level = [table_name for table_name, refs in pending.items() if refs <= done]
+            if not level:
+                raise ValueError(f"FKs CIRCULARES NO SCHEMA: {', '.join(pending)}")
+            levels.append(level)
+            done.update(level)
+            for table_name in level:
+                pending.pop(table_name)
+        return levels
+
+    def _set_logged_sql(self, table_name: str) -> List[str]:
+        """Comandos que tornam a tabela LOGGED (nas tabelas particionadas, cada partição é um comando)."""
+        schema = self.schema_name
+        prefix = f"SET maintenance_work_mem = '{POSTGRES_PUBLISH_MAINTENANCE_WORK_MEM}'; "
+        if self._partition_column(table_name):
+            return [prefix + f'ALTER TABLE {schema}."{partition}" SET LOGGED;'
+                    for partition in self._partition_names(table_name)]
+        return [prefix + f'ALTER TABLE {schema}."{table_name}" SET LOGGED;']
+
+    def _attach_partitioned_foreign_keys(self, cur, table_name: str) -> None:
+        """Cria as FKs da tabela principal particionada que ficaram somente nas partições (ver enable_foreign_keys)."""
+        cur.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f';",
+                    (f'{self.schema_name}."{table_name}"',))
+        existing = {name for (name,) in cur.fetchall()}
+        for i, fk in enumerate(SCHEMA[table_name].get('foreign_keys', []), start=1):
+            constraint_name = f"fk_{table_name}_{i}"
+            if constraint_name not in existing:
+                cur.execute(self._foreign_key_sql(table_name, fk, constraint_name))
+
+    @staticmethod
+    def _external_dependents(cur, schema: str, names: List[str]) -> List[str]:
+        """
+        Objetos que dependem das relações `names` de `schema`, exceto os das próprias relações (índices, PK, FKs e as
+        views `v_<tabela>` entre elas): views, materialized views e FKs criadas pelos usuários, que seguiriam as
+        tabelas anteriores (pelo OID) e seriam removidas junto com elas.
+        """
+        cur.execute("""
+            WITH replaced AS (
+                SELECT c.oid FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = %s AND c.relname = ANY(%s)
+            )
+            SELECT DISTINCT pg_describe_object(d.classid, d.objid, d.objsubid)
+            FROM pg_depend d
+            LEFT JOIN pg_rewrite r ON d.classid = 'pg_rewrite'::regclass AND r.oid = d.objid
+            LEFT JOIN pg_constraint k ON d.classid = 'pg_constraint'::regclass AND k.oid = d.objid
+            WHERE d.refclassid = 'pg_class'::regclass
+              AND d.refobjid IN (SELECT oid FROM replaced)
+              AND d.deptype = 'n'
+              AND COALESCE(r.ev_class, k.conrelid,
+                           CASE WHEN d.classid = 'pg_class'::regclass THEN d.objid END, 0::oid)
+                  NOT IN (SELECT oid FROM replaced)
+            ORDER BY 1;
+        """, (schema, names))
+        return [name for (name,) in cur.fetchall()]
+
+    @staticmethod
+    def _drop_previous_schema(cur) -> None:
+        """
+        Remove `POSTGRES_PREVIOUS_SCHEMA` com as tabelas e views substituídas, sem CASCADE: se algum outro objeto
+        ainda depender delas, a remoção falha (em vez de removê-lo junto).
+        """
+        for kind, catalog, name_col in (("VIEW", "pg_views", "viewname"), ("TABLE", "pg_tables", "tablename")):
+            cur.execute(f"SELECT {name_col} FROM {catalog} WHERE schemaname = %s;", (POSTGRES_PREVIOUS_SCHEMA,))
+            names = [f'"{POSTGRES_PREVIOUS_SCHEMA}"."{name}"' for (name,) in cur.fetchall()]
+            if names:
+                cur.execute(f"DROP {kind} {', '.join(names)};")
+        cur.execute(f'DROP SCHEMA IF EXISTS "{POSTGRES_PREVIOUS_SCHEMA}";')
+
+    def _swap_schema(self) -> None:
+        """
+        Troca as tabelas publicadas pelas da carga, em uma única transação: as tabelas (e views) de `POSTGRES_SCHEMA`
+        vão para `POSTGRES_PREVIOUS_SCHEMA` (removido em seguida) e as de `POSTGRES_SHADOW_SCHEMA` passam a
+        `POSTGRES_SCHEMA`.
+
+        Views, materialized views e FKs criadas sobre as tabelas publicadas dependem delas pelo OID e seriam removidas
+        junto com as tabelas anteriores: se existirem, a publicação é interrompida (sem alterar o schema publicado),
+        listando esses objetos, para que sejam removidos e recriados após a publicação.
+        """
+        print_log(f"PUBLICANDO AS TABELAS NO SCHEMA '{POSTGRES_SCHEMA}'...", level="task")
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            self._drop_previous_schema(cur)
+            cur.execute(f'CREATE SCHEMA "{POSTGRES_PREVIOUS_SCHEMA}";')
+            cur.execute(f'CREATE SCHEMA IF NOT EXISTS "{POSTGRES_SCHEMA}";')
+
+            # tabelas e, no perfil --compact, as views `v_<tabela>` (novas e as publicadas com o mesmo nome)
+            relations = {}
+            for kind, catalog, name_col in (("TABLE", "pg_tables", "tablename"), ("VIEW", "pg_views", "viewname")):
+                cur.execute(f"SELECT {name_col} FROM {catalog} WHERE schemaname = %s;", (self.schema_name,))
+                new_relations = [name for (name,) in cur.fetchall()]
+                cur.execute(f"SELECT {name_col} FROM {catalog} WHERE schemaname = %s AND {name_col} = ANY(%s);",
+                            (POSTGRES_SCHEMA, new_relations))
+                relations[kind] = (new_relations, [name for (name,) in cur.fetchall()])
+
+            dependents = self._external_dependents(cur, POSTGRES_SCHEMA,
+                                                   [name for _, old in relations.values() for name in old])
+            if dependents:
+                raise RuntimeError(f"PUBLICAÇÃO INTERROMPIDA: OBJETOS DEPENDEM DAS TABELAS PUBLICADAS E SERIAM "
+                                   f"REMOVIDOS COM ELAS (REMOVA-OS E RECRIE-OS APÓS A PUBLICAÇÃO): "
+                                   f"{'; '.join(dependents)}")
+
+            for kind, (new_relations, old_relations) in relations.items():
+                for name in old_relations:
+                    cur.execute(f'ALTER {kind} "{POSTGRES_SCHEMA}"."{name}" SET SCHEMA "{POSTGRES_PREVIOUS_SCHEMA}";')
+                for name in new_relations:
+                    cur.execute(f'ALTER {kind} "{self.schema_name}"."{name}" SET SCHEMA "{POSTGRES_SCHEMA}";')
+            conn.commit()
+
+            conn.autocommit = True
+            self._drop_previous_schema(cur)
+            cur.execute(f'DROP SCHEMA IF EXISTS "{self.schema_name}" CASCADE;')
+        except (psycopg2.Error, RuntimeError) as e:
+            conn.rollback()
+            print_log(f"ERRO AO PUBLICAR AS TABELAS: {e}", level="error")
+            raise
+        finally:
+            conn.close()
+
+        self.schema_name = POSTGRES_SCHEMA
+        self.config["options"] = f"-c search_path={self.schema_name}"
+        print_log("TABELAS PUBLICADAS", level="success")
+
+    def publish(self) -> None:
+        """
+        Torna as tabelas LOGGED, em paralelo (por nível de dependência das FKs) e, no modo "swap", troca as tabelas
+        publicadas pelas da carga.
+
+        O SET LOGGED reescreve cada tabela (e os seus índices) no WAL, exceto com `wal_level = minimal`.
+        """
+        if not self.publish_mode:
+            return
+        if self.conn is None: self.conn = self._connect()
+        self.conn.autocommit = True
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT current_setting('wal_level'), current_setting('max_wal_size');")
+            wal_level, max_wal_size = cur.fetchone()
+            print_log(f"TORNANDO AS TABELAS LOGGED (wal_level={wal_level}, max_wal_size={max_wal_size})...",
+                      level="task")
+            if wal_level != "minimal":
+                print_log("COM wal_level DIFERENTE DE minimal, AS TABELAS SÃO ESCRITAS NO WAL; AUMENTE max_wal_size "
+                          "PARA EVITAR CHECKPOINTS DURANTE A PUBLICAÇÃO", level="docs")
+
+            for level in self._logged_levels():
+                self._execute_parallel([sql for table_name in level for sql in self._set_logged_sql(table_name)])
+                for table_name in level:
+                    if self._partition_column(table_name):
+                        self._attach_partitioned_foreign_keys(cur, table_name)
+                print_log(f"  -> LOGGED: {', '.join(level)}", level="docs")
+            print_log("TABELAS LOGGED", level="success")
+        except psycopg2.Error as e:
+            print_log(f"ERRO AO TORNAR AS TABELAS LOGGED: {e}", level="error")
+            raise
+        finally:
+            self.conn.close()
+            self.conn = None
+
+        if self.publish_mode == "swap":
+            self._swap_schema()
+
     def initialize_schema(self) -> None:
         """Executa o fluxo completo de criação do schema."""
         try:
@@ -222,6 +676,8 @@ class PostgresBuilder:
             self.conn = self._connect()
             self.drop_tables()
             self.create_tables()
+            if is_compact():
+                self.create_views()
         finally:
             if self.conn:
                 self.conn.close()
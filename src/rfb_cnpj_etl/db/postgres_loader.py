@@ -1,30 +1,141 @@
 # db/postgres_loader.py
 
-import gc
+import time
 import psycopg2
+from collections import defaultdict
 from queue import Queue
 from threading import Thread, Lock
-from typing import Optional, Any, Dict
-from ..config import QUEUE_SIZE, WORKER_THREADS, DEBUG_LOG
+from typing import Callable, Optional, Any, Dict, List, Set
+from ..config import (
+    QUEUE_SIZE, WORKER_THREADS, DEBUG_LOG, POSTGRES_MAX_WORKERS_PER_TABLE, POSTGRES_ENCODINGS, DEFAULT_POSTGRES_ENCODING
+)
 from ..utils.logger import print_log
+from ..utils.memory import MemoryBudget
+from ..utils.metrics import LoadMetrics
+from ..utils.profiler import LoadProfiler, profiled
 from ..utils.progress import pbar, update_progress
-from ..utils.db_batch_producer import produce_batches
+from ..utils.db_batch_producer import produce_batches, BatchSizeController
 from ..utils.db_transformers import convert_rows_to_csv_buffer
+from ..utils.table_scheduler import TableScheduler, estimate_table_bytes
+from ..utils.task_graph import TableLoadTracker
+from ..db.schema import SCHEMA
+
+
+def staging_table_name(table: str, thread_id: int) -> str:
+    """Nome da tabela de staging do worker para a tabela."""
+    return f"{table}__stage_{thread_id}"
+
+
+def copy_sql(table: str, columns, freeze: bool = False) -> str:
+    """Comando COPY do lote (CSV gerado por `convert_rows_to_csv_buffer`)."""
+    options = "FORMAT csv, DELIMITER ';', NULL ''" + (", FREEZE" if freeze else "")
+    return f'COPY "{table}" ({",".join(columns)}) FROM STDIN WITH ({options})'
+
+
+class FreezeCopyError(Exception):
+    """A carga da tabela com COPY FREEZE foi desfeita: o lote não foi gravado."""
+
+
+class FreezeTransactions:
+    """
+    COPY ... WITH (FREEZE): uma conexão por tabela, com a transação aberta do TRUNCATE da tabela até o fim da sua
+    carga (o FREEZE exige que a tabela tenha sido criada ou esvaziada na mesma transação). As linhas são gravadas já
+    congeladas, sem a reescrita das páginas (hint bits e visibilidade) pela primeira consulta ou pelo autovacuum.
+
+    Os workers usam a conexão da tabela um de cada vez. Um erro em um lote desfaz a transação e, com ela, a carga da
+    tabela: os lotes seguintes são descartados com `FreezeCopyError` (sem contar como gravados) e a carga falha ao
+    final (`failed`).
+
+    :params:
+        postgres_config: configuração da conexão.
+        encoding: encoding do banco (`POSTGRES_ENCODINGS`).
+    """
+
+    def __init__(self, postgres_config: dict, encoding: str = DEFAULT_POSTGRES_ENCODING):
+        self.postgres_config = postgres_config
+        self.client_encoding = POSTGRES_ENCODINGS[encoding][1]
+        self._conns: Dict[str, Any] = {}
+        self._table_locks: Dict[str, Lock] = defaultdict(Lock)
+        self._failed: Set[str] = set()
+        self._lock = Lock()
+
+    def copy(self, table: str, columns, buffer) -> None:
+        """COPY FREEZE do lote na transação da tabela (aberta com o TRUNCATE no primeiro lote)."""
+        with self._lock:
+            table_lock = self._table_locks[table]
+        with table_lock:
+            if table in self._failed:
+                raise FreezeCopyError(f"CARGA DE '{table}' DESFEITA (--freeze): LOTE DESCARTADO")
+            conn = self._conns.get(table)
+            if conn is None:
+                conn = psycopg2.connect(**self.postgres_config)
+                conn.set_client_encoding(self.client_encoding)
+                conn.cursor().execute(f'TRUNCATE "{table}";')
+                self._conns[table] = conn
+            try:
+                conn.cursor().copy_expert(copy_sql(table, columns, freeze=True), buffer)
+            except psycopg2.Error:
+                conn.rollback()
+                conn.close()
+                del self._conns[table]
+                self._failed.add(table)
+                print_log(f"CARGA DE '{table}' DESFEITA (--freeze): OS LOTES SEGUINTES SERÃO DESCARTADOS",
+                          level="error")
+                raise
+
+    def commit(self, table: str) -> None:
+        """Confirma a transação da tabela (fim da sua carga)."""
+        with self._lock:
+            table_lock = self._table_locks[table]
+        with table_lock:
+            conn = self._conns.pop(table, None)
+            if conn is not None:
+                conn.commit()
+                conn.close()
+
+    def commit_all(self) -> None:
+        for table in list(self._conns):
+            self.commit(table)
+
+    @property
+    def failed(self) -> List[str]:
+        """Tabelas cuja carga foi desfeita."""
+        with self._lock:
+            return sorted(self._failed)
 
 
 def consume_batches(insertion_queue, postgres_config: dict, thread_id: int,
-                    progress_lock, shared_progress, low_memory: bool, total_records: int):
+                    progress_lock, shared_progress, total_records: int,
+                    metrics: Optional[LoadMetrics] = None,
+                    batch_controller: Optional[BatchSizeController] = None,
+                    staging_tables: Optional[Dict[str, Set[str]]] = None,
+                    load_tracker: Optional[TableLoadTracker] = None,
+                    freeze: Optional[FreezeTransactions] = None,
+                    encoding: str = DEFAULT_POSTGRES_ENCODING):
     """
     Função para consumir lotes de dados da fila de inserção e inserir no banco de dados PostgreSQL.
+
+    Com `staging_tables`, o COPY é feito em uma tabela de staging do próprio worker (criada sob demanda e registrada
+    no dicionário), unida à tabela final ao término da carga (ver `merge_staging_tables`).
+
+    Com `load_tracker`, cada lote processado (gravado ou com erro) é informado, para identificar o fim da carga de
+    cada tabela.
+
+    Com `freeze`, o COPY é feito com FREEZE na transação da tabela (confirmada ao fim da carga da tabela).
+
+    O CSV de cada lote é gerado no client_encoding de `encoding` (`POSTGRES_ENCODINGS`).
     """
     try:
+        _, client_encoding, csv_encoding = POSTGRES_ENCODINGS[encoding]
         conn = psycopg2.connect(**postgres_config)
-        conn.set_client_encoding("WIN1252")
+        conn.set_client_encoding(client_encoding)
         conn.autocommit = False
         cur = conn.cursor()
 
         while True:
+            wait_start = time.perf_counter()
             item = insertion_queue.get()
+            wait_secs = time.perf_counter() - wait_start
             if item is None:
                 insertion_queue.task_done()
                 break
@@ -32,6 +143,8 @@ def consume_batches(insertion_queue, postgres_config: dict, thread_id: int,
             rows = item["rows"]
 
             if not rows:
+                if load_tracker:
+                    load_tracker.batch_done(item["table"])
                 insertion_queue.task_done()
                 continue
 
@@ -40,10 +153,35 @@ def consume_batches(insertion_queue, postgres_config: dict, thread_id: int,
 
             buffer = None
             try:
-                buffer = convert_rows_to_csv_buffer(rows)
-                copy_sql = f'COPY "{table}" ({",".join(columns)}) FROM STDIN WITH (FORMAT csv, DELIMITER \';\', NULL \'\')'
-                cur.copy_expert(copy_sql, buffer)
-                conn.commit()
+                target = table
+                if staging_tables is not None:
+                    target = staging_table_name(table, thread_id)
+                    if target not in staging_tables.setdefault(table, set()):
+                        cur.execute(f'CREATE UNLOGGED TABLE IF NOT EXISTS "{target}" '
+                                    f'(LIKE "{table}" INCLUDING DEFAULTS);')
+                        conn.commit()
+                        staging_tables[table].add(target)
+
+                serialize_start = time.perf_counter()
+                buffer = convert_rows_to_csv_buffer(rows, csv_encoding)
+                write_start = time.perf_counter()
+                if freeze:
+                    freeze.copy(table, columns, buffer)
+                else:
+                    cur.copy_expert(copy_sql(target, columns), buffer)
+                    conn.commit()
+
+                write_secs = time.perf_counter() - write_start
+                if batch_controller:
+                    batch_controller.record(table, len(rows), write_secs)
+                if metrics:
+                    metrics.add("queue_get", table, item["filename"], wait_secs)
+                    metrics.add("transform", table, item["filename"], write_start - serialize_start)
+                    metrics.add("write", table, item["filename"], write_secs,
+                                rows=len(rows), nbytes=item.get("nbytes", 0))
+
+            except FreezeCopyError:
+                pass  # lote de uma tabela já desfeita (o erro foi informado no primeiro lote)
 
             except psycopg2.Error as db_error:
                 conn.rollback()
@@ -67,16 +205,16 @@ def consume_batches(insertion_queue, postgres_config: dict, thread_id: int,
                     rows_inserted=len(rows),
                     filename=item['filename'],
                     insertion_queue=insertion_queue,
-                    queue_size_max=QUEUE_SIZE,
+                    queue_size_max=insertion_queue.maxsize,
                     shared=shared_progress,
                     lock=progress_lock,
                     total=total_records,
                     debug=DEBUG_LOG
                 )
 
+            if load_tracker:
+                load_tracker.batch_done(table)
             insertion_queue.task_done()
-            if low_memory:
-                gc.collect()
 
         cur.close()
         conn.close()
@@ -85,13 +223,67 @@ def consume_batches(insertion_queue, postgres_config: dict, thread_id: int,
         print_log(f"[THREAD-{thread_id}] ERRO FATAL: {fatal}", level="error")
 
 
+def _merge_table(postgres_config: dict, table: str, stages: Set[str]):
+    """Une as tabelas de staging de uma tabela à tabela final, removendo-as em seguida."""
+    try:
+        conn = psycopg2.connect(**postgres_config)
+        conn.autocommit = True
+        cur = conn.cursor()
+        for stage in sorted(stages):
+            start = time.perf_counter()
+            cur.execute(f'INSERT INTO "{table}" SELECT * FROM "{stage}";')
+            cur.execute(f'DROP TABLE "{stage}";')
+            print_log(f"  -> {stage} → {table} ({time.perf_counter() - start:.1f}s)", level="debug")
+        conn.close()
+    except psycopg2.Error as e:
+        print_log(f"ERRO AO UNIR AS TABELAS DE STAGING DE '{table}': {e}", level="error")
+
+
+def merge_staging_tables(postgres_config: dict, staging_tables: Dict[str, Set[str]]):
+    """
+    Une as tabelas de staging às tabelas finais, com uma conexão por tabela (em paralelo entre as tabelas).
+    """
+    if not staging_tables:
+        return
+    print_log("UNINDO AS TABELAS DE STAGING ÀS TABELAS FINAIS...", level="task")
+    threads = [Thread(target=_merge_table, args=(postgres_config, table, stages), name=f"MERGE-{table.upper()}")
+               for table, stages in staging_tables.items()]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print_log("TABELAS DE STAGING UNIDAS", level="success")
+
+
 def run_postgres_loader(files_dir: str, postgres_config: dict, total_records: int, parallel: Optional[bool] = True,
-                        low_memory: Optional[bool] = False):
+                        memory_budget: Optional[MemoryBudget] = None, metrics: Optional[LoadMetrics] = None,
+                        profiler: Optional[LoadProfiler] = None,
+                        batch_controller: Optional[BatchSizeController] = None,
+                        skip_tables: Optional[Set[str]] = None,
+                        staging: bool = False,
+                        on_table_loaded: Optional[Callable[[str], None]] = None,
+                        freeze: bool = False,
+                        encoding: str = DEFAULT_POSTGRES_ENCODING):
     """
     Função para realizar a carga de dados no banco de dados PostgreSQL.
+
+    Com mais de um worker, a fila é um `TableScheduler` (uma fila por tabela, com afinidade entre worker e tabela),
+    limitado a `POSTGRES_MAX_WORKERS_PER_TABLE` conexões por tabela. Com `staging`, cada worker faz o COPY na sua
+    própria tabela de staging (sem disputa pela mesma tabela, e sem o limite); as tabelas de staging são unidas às
+    finais ao término da carga.
+
+    Com `on_table_loaded`, a função é chamada assim que o último lote de cada tabela é gravado (com `staging`,
+    após unir as tabelas de staging da tabela), enquanto as demais tabelas continuam sendo carregadas. Ela não
+    deve bloquear: é chamada na thread do worker (ou da união) que concluiu a tabela.
+
+    Com `freeze`, cada tabela é carregada com COPY FREEZE em uma única transação (ver `FreezeTransactions`), com um
+    worker por tabela. Não pode ser usado com `staging`.
+
+    Com `encoding` "utf8", os textos lidos em latin1 são enviados sem conversão (client_encoding LATIN1), e o servidor
+    os converte para o encoding do banco.
     """
     print_log("REALIZANDO CARGA NO BANCO DE DADOS POSTGRES...", level="task")
-    insertion_queue = Queue(maxsize=QUEUE_SIZE)
+    queue_size = memory_budget.queue_size if memory_budget else QUEUE_SIZE
 
     progress_lock = Lock()
     shared_progress: Dict[str, Any] = {
@@ -105,15 +297,57 @@ def run_postgres_loader(files_dir: str, postgres_config: dict, total_records: in
 
     workers = []
     num_threads = WORKER_THREADS if parallel else 1
+    if memory_budget:
+        num_threads = min(num_threads, memory_budget.consumer_threads)
+
+    staging_tables: Optional[Dict[str, Set[str]]] = {} if staging else None
+    freeze_transactions = FreezeTransactions(postgres_config, encoding) if freeze else None
+    load_tracker = None
+    merge_threads: List[Thread] = []
+    if on_table_loaded:
+        def table_loaded(table: str):
+            if freeze_transactions:
+                freeze_transactions.commit(table)
+                if table in freeze_transactions.failed:
+                    return  # carga desfeita: a tabela não é preparada (correções, PK e índices)
+            stages = staging_tables.pop(table, None) if staging_tables is not None else None
+            if not stages:
+                on_table_loaded(table)
+                return
+
+            # une as tabelas de staging em outra thread, para o worker seguir com as demais tabelas
+            def merge_and_notify():
+                _merge_table(postgres_config, table, stages)
+                on_table_loaded(table)
+
+            t = Thread(target=merge_and_notify, name=f"MERGE-{table.upper()}")
+            t.start()
+            merge_threads.append(t)
+
+        load_tracker = TableLoadTracker(files_dir, [t for t in SCHEMA if t not in (skip_tables or ())],
+                                        table_loaded)
+
+    if num_threads > 1:
+        max_workers_per_table = None if staging else POSTGRES_MAX_WORKERS_PER_TABLE
+        if freeze:
+            max_workers_per_table = 1  # a transação (conexão) da tabela é usada por um worker de cada vez
+        insertion_queue = TableScheduler(maxsize=queue_size, num_workers=num_threads,
+                                         table_bytes=estimate_table_bytes(files_dir),
+                                         max_workers_per_table=max_workers_per_table)
+    else:
+        insertion_queue = Queue(maxsize=queue_size)
 
     for i in range(num_threads):
         t = Thread(
-            target=consume_batches,
-            args=(insertion_queue, postgres_config, i + 1, progress_lock, shared_progress, low_memory, total_records)
+            target=profiled(consume_batches, profiler),
+            args=(insertion_queue, postgres_config, i + 1, progress_lock, shared_progress, total_records,
+                  metrics, batch_controller, staging_tables, load_tracker, freeze_transactions, encoding),
+            name=f"THREAD-{i + 1}"
         )
         t.start()
         workers.append(t)
 
+    completed = False  # se o produtor terminou sem erros (senão, as tabelas restantes não são concluídas)
     try:
         produce_batches(
             files_dir=files_dir,
@@ -121,8 +355,15 @@ def run_postgres_loader(files_dir: str, postgres_config: dict, total_records: in
             engine="postgres",
             num_workers=num_threads,
             parallel=parallel,
-            low_memory=low_memory
+            memory_budget=memory_budget,
+            metrics=metrics,
+            profiler=profiler,
+            batch_controller=batch_controller,
+            skip_tables=skip_tables,
+            load_tracker=load_tracker,
+            encoding=encoding
         )
+        completed = True
     finally:
         for _ in workers:
             insertion_queue.put(None)
@@ -133,4 +374,22 @@ def run_postgres_loader(files_dir: str, postgres_config: dict, total_records: in
         if "bar" in shared_progress:
             shared_progress["bar"].close()
 
-        print_log("CARGA DE DADOS CONCLUÍDA", level="success")
+        if load_tracker and completed:
+            load_tracker.finish()
+        for t in merge_threads:
+            t.join()
+        if freeze_transactions:
+            freeze_transactions.commit_all()
+
+        merge_staging_tables(postgres_config, staging_tables)
+
+        if batch_controller:
+            batch_controller.log_summary()
+
+        if not completed or (freeze_transactions and freeze_transactions.failed):
+            print_log("CARGA DE DADOS INTERROMPIDA", level="error")
+        else:
+            print_log("CARGA DE DADOS CONCLUÍDA", level="success")
+
+    if freeze_transactions and freeze_transactions.failed:
+        raise FreezeCopyError(f"CARGA DESFEITA (--freeze) NAS TABELAS: {', '.join(freeze_transactions.failed)}")
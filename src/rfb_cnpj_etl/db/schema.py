@@ -6,8 +6,26 @@ dos arquivos de origem para as tabelas de destino.
 
 Esta estrutura consolidada é a "Fonte da Verdade" e facilita a criação
 programática de tabelas, índices, constraints e a lógica de carga de dados.
+
+`partition_by` define a coluna das partições HASH da tabela no Postgres, usadas
+somente com `--partitioned`.
+
+Cada índice indica os perfis de índices (`--index-profile`) em que é criado (`profiles`) e pode
+ser parcial (`where`: coluna → valor) ou de cobertura (`include`: colunas guardadas no índice).
+
+Perfis opcionais (`--cnpj-key`, `--compact`, `--index-profile`) são aplicados por `configure_schema`,
+que altera `SCHEMA` no lugar, no início da execução.
 """
 
+import copy
+from typing import Optional
+
+# perfis de índices (--index-profile) que incluem cada índice
+LOOKUP_INDEX = ('lookup', 'analytics', 'tuned', 'full')  # consultas por CNPJ e junções pelo cnpj_basico
+ANALYTICS_INDEX = ('analytics', 'tuned', 'full')  # filtros por código, localidade e data
+FULL_INDEX = ('full',)  # busca pelo início dos nomes e pelo CPF/CNPJ do sócio
+TUNED_INDEX = ('tuned',)  # parciais e de cobertura, para as consultas de `docs/exemplos`
+
 SCHEMA = {
     'cnae': {
         'source_file_stem': 'Cnaes',
@@ -68,10 +86,10 @@ SCHEMA = {
             {'columns': ['cod_qualificacao_responsavel'], 'references': 'qualificacao_socio(cod_qualificacao)'}
         ],
         'indexes': [
-            {'name': 'idx_empresa_cnpj', 'columns': ['cnpj_basico']},
-            {'name': 'idx_empresa_razao_social', 'columns': ['razao_social']},
-            {'name': 'idx_empresa_natureza', 'columns': ['cod_natureza_juridica']},
-            {'name': 'idx_empresa_porte', 'columns': ['cod_porte']}
+            {'name': 'idx_empresa_cnpj', 'columns': ['cnpj_basico'], 'profiles': LOOKUP_INDEX},
+            {'name': 'idx_empresa_razao_social', 'columns': ['razao_social'], 'profiles': FULL_INDEX},
+            {'name': 'idx_empresa_natureza', 'columns': ['cod_natureza_juridica'], 'profiles': ANALYTICS_INDEX},
+            {'name': 'idx_empresa_porte', 'columns': ['cod_porte'], 'profiles': ANALYTICS_INDEX}
         ]
     },
     'estabelecimento': {
@@ -109,6 +127,7 @@ SCHEMA = {
             ('data_situacao_especial', 'DATE')
         ],
         'primary_key': ['cnpj_basico', 'cnpj_ordem', 'cnpj_dv'],
+        'partition_by': 'cnpj_basico',
         'foreign_keys': [
             {'columns': ['cnpj_basico'], 'references': 'empresa(cnpj_basico)'},
             {'columns': ['cod_cnae_principal'], 'references': 'cnae(cod_cnae)'},
@@ -117,14 +136,17 @@ SCHEMA = {
             {'columns': ['cod_motivo_situacao_cadastral'], 'references': 'motivo(cod_motivo)'}
         ],
         'indexes': [
-            {'name': 'idx_estab_empresa', 'columns': ['cnpj_basico']},
-            {'name': 'idx_estab_nome_fantasia', 'columns': ['nome_fantasia']},
-            {'name': 'idx_estab_cnae_principal', 'columns': ['cod_cnae_principal']},
-            {'name': 'idx_estab_data_inicio', 'columns': ['data_inicio_atividade']},
-            {'name': 'idx_estab_data_situacao', 'columns': ['data_situacao_cadastral']},
-            {'name': 'idx_estab_municipio', 'columns': ['cod_municipio']},
-            {'name': 'idx_estab_uf_municipio', 'columns': ['uf', 'cod_municipio']},
-            {'name': 'idx_estab_situacao', 'columns': ['cod_situacao_cadastral']}
+            {'name': 'idx_estab_empresa', 'columns': ['cnpj_basico'], 'profiles': LOOKUP_INDEX},
+            {'name': 'idx_estab_nome_fantasia', 'columns': ['nome_fantasia'], 'profiles': FULL_INDEX},
+            {'name': 'idx_estab_cnae_principal', 'columns': ['cod_cnae_principal'], 'profiles': ANALYTICS_INDEX},
+            {'name': 'idx_estab_data_inicio', 'columns': ['data_inicio_atividade'], 'profiles': ANALYTICS_INDEX},
+            {'name': 'idx_estab_data_situacao', 'columns': ['data_situacao_cadastral'], 'profiles': ANALYTICS_INDEX},
+            {'name': 'idx_estab_municipio', 'columns': ['cod_municipio'], 'profiles': ANALYTICS_INDEX},
+            {'name': 'idx_estab_uf_municipio', 'columns': ['uf', 'cod_municipio'], 'profiles': ANALYTICS_INDEX},
+            {'name': 'idx_estab_situacao', 'columns': ['cod_situacao_cadastral'], 'profiles': ANALYTICS_INDEX},
+            # estabelecimentos ativos por UF e data de abertura
+            {'name': 'idx_estab_ativos_uf_inicio', 'columns': ['uf', 'data_inicio_atividade'],
+             'where': {'cod_situacao_cadastral': '02'}, 'profiles': TUNED_INDEX}
         ]
     },
     'simples': {
@@ -142,7 +164,7 @@ SCHEMA = {
             {'columns': ['cnpj_basico'], 'references': 'empresa(cnpj_basico)'}
         ],
         'indexes': [
-            {'name': 'idx_simples_empresa', 'columns': ['cnpj_basico']}
+            {'name': 'idx_simples_empresa', 'columns': ['cnpj_basico'], 'profiles': LOOKUP_INDEX}
         ]
     },
     'socio': {
@@ -160,6 +182,7 @@ SCHEMA = {
             ('cod_qualificacao_representante_legal', 'VARCHAR(2)'),
             ('cod_faixa_etaria', 'VARCHAR(1) NOT NULL')
         ],
+        'partition_by': 'cnpj_basico',
         'foreign_keys': [
             {'columns': ['cnpj_basico'], 'references': 'empresa(cnpj_basico)'},
             {'columns': ['cod_pais'], 'references': 'pais(cod_pais)'},
@@ -167,9 +190,12 @@ SCHEMA = {
             {'columns': ['cod_qualificacao_representante_legal'], 'references': 'qualificacao_socio(cod_qualificacao)'}
         ],
         'indexes': [
-            {'name': 'idx_socio_empresa', 'columns': ['cnpj_basico']},
-            {'name': 'idx_socio_cpf_cnpj', 'columns': ['cnpj_cpf_socio']},
-            {'name': 'idx_socio_nome', 'columns': ['nome_socio']}
+            {'name': 'idx_socio_empresa', 'columns': ['cnpj_basico'], 'profiles': ('lookup', 'analytics', 'full')},
+            {'name': 'idx_socio_cpf_cnpj', 'columns': ['cnpj_cpf_socio'], 'profiles': FULL_INDEX},
+            {'name': 'idx_socio_nome', 'columns': ['nome_socio'], 'profiles': FULL_INDEX},
+            # nomes dos sócios da empresa sem leitura da tabela (no lugar de idx_socio_empresa)
+            {'name': 'idx_socio_empresa_nome', 'columns': ['cnpj_basico'], 'include': ['nome_socio'],
+             'profiles': TUNED_INDEX}
         ]
     },
 
@@ -187,7 +213,156 @@ SCHEMA = {
             {'columns': ['cod_cnae'], 'references': 'cnae(cod_cnae)'}
         ],
         'indexes': [
-            {'name': 'idx_estab_cnae_sec', 'columns': ['cnpj_basico', 'cnpj_ordem', 'cnpj_dv']}
+            {'name': 'idx_estab_cnae_sec', 'columns': ['cnpj_basico', 'cnpj_ordem', 'cnpj_dv'],
+             'profiles': LOOKUP_INDEX}
         ]
     }
 }
+
+BASE_SCHEMA = copy.deepcopy(SCHEMA)  # schema padrão, sem perfis
+
+# perfil --compact: tipo inteiro de cada código e a sua largura original (zeros à esquerda, refeitos nas views)
+COMPACT_CODES = {
+    'cnpj_basico': ('INTEGER', 8),
+    'cnpj_ordem': ('SMALLINT', 4),
+    'cnpj_dv': ('SMALLINT', 2),
+    'matriz_filial': ('SMALLINT', 1),
+    'cod_cnae': ('INTEGER', 7),
+    'cod_cnae_principal': ('INTEGER', 7),
+    'cod_motivo': ('SMALLINT', 2),
+    'cod_motivo_situacao_cadastral': ('SMALLINT', 2),
+    'cod_municipio': ('SMALLINT', 4),
+    'cod_natureza': ('SMALLINT', 4),
+    'cod_natureza_juridica': ('SMALLINT', 4),
+    'cod_pais': ('SMALLINT', 3),
+    'cod_qualificacao': ('SMALLINT', 2),
+    'cod_qualificacao_responsavel': ('SMALLINT', 2),
+    'cod_qualificacao_socio': ('SMALLINT', 2),
+    'cod_qualificacao_representante_legal': ('SMALLINT', 2),
+    'cod_situacao_cadastral': ('SMALLINT', 2),
+    'cod_porte': ('SMALLINT', 2),
+    'identificador_socio': ('SMALLINT', 1),
+    'cod_faixa_etaria': ('SMALLINT', 1),
+    'cep': ('INTEGER', 8),
+}
+
+# perfil --compact: UF pelo código do IBGE (EX = exterior)
+UF_CODES = {
+    'RO': 11, 'AC': 12, 'AM': 13, 'RR': 14, 'PA': 15, 'AP': 16, 'TO': 17,
+    'MA': 21, 'PI': 22, 'CE': 23, 'RN': 24, 'PB': 25, 'PE': 26, 'AL': 27, 'SE': 28, 'BA': 29,
+    'MG': 31, 'ES': 32, 'RJ': 33, 'SP': 35,
+    'PR': 41, 'SC': 42, 'RS': 43,
+    'MS': 50, 'MT': 51, 'GO': 52, 'DF': 53,
+    'EX': 99,
+}
+
+COMPACT_VIEW_PREFIX = 'v_'  # views com os valores no formato original (texto com zeros à esquerda)
+
+
+def cnpj_key_schema(schema: dict) -> dict:
+    """
+    Perfil `--cnpj-key`: o CNPJ completo (14 dígitos) como inteiro de 64 bits, calculado no produtor.
+
+    - estabelecimento: coluna `cnpj` (a última) como PK; no SQLite, INTEGER PRIMARY KEY (a própria tabela é o índice)
+    - estabelecimento_cnae_sec: `cnpj` no lugar de (cnpj_basico, cnpj_ordem, cnpj_dv)
+    """
+    schema = copy.deepcopy(schema)
+    estab = schema['estabelecimento']
+    estab['columns'].append(('cnpj', 'BIGINT NOT NULL'))
+    estab['primary_key'] = ['cnpj']
+    estab['integer_key'] = 'cnpj'
+    estab['partition_by'] = 'cnpj'  # no Postgres, a PK da tabela particionada deve conter a coluna de partição
+
+    cnae_sec = schema['estabelecimento_cnae_sec']
+    cnae_sec['columns'] = [('cnpj', 'BIGINT NOT NULL'), ('cod_cnae', 'VARCHAR(7) NOT NULL')]
+    cnae_sec['foreign_keys'] = [
+        {'columns': ['cnpj'], 'references': 'estabelecimento(cnpj)'},
+        {'columns': ['cod_cnae'], 'references': 'cnae(cod_cnae)'}
+    ]
+    cnae_sec['indexes'] = [{'name': 'idx_estab_cnae_sec', 'columns': ['cnpj'], 'profiles': LOOKUP_INDEX}]
+    return schema
+
+
+def compact_schema(schema: dict, date_as_integer: bool = False) -> dict:
+    """
+    Perfil `--compact`: códigos numéricos como inteiros, convertidos no produtor.
+
+    - colunas de COMPACT_CODES: INTEGER/SMALLINT (sem os zeros à esquerda)
+    - uf: SMALLINT, com o código do IBGE (UF_CODES)
+    - datas: inteiro YYYYMMDD, com `date_as_integer` (no Postgres, DATE já ocupa 4 bytes e é mantido)
+
+    As colunas convertidas de cada tabela ficam em `compact_columns` (coluna → largura, 'uf' ou 'date'), usadas pelo
+    produtor e pelas views `v_<tabela>`, que devolvem os valores no formato original.
+    """
+    schema = copy.deepcopy(schema)
+    for definition in schema.values():
+        compact_columns = {}
+        for i, (column, sql_type) in enumerate(definition['columns']):
+            base_type = sql_type.split()[0]
+            if column in COMPACT_CODES:
+                new_type, compact_columns[column] = COMPACT_CODES[column]
+            elif column == 'uf':
+                new_type, compact_columns[column] = 'SMALLINT', 'uf'
+            elif date_as_integer and base_type == 'DATE':
+                new_type, compact_columns[column] = 'INTEGER', 'date'
+            else:
+                continue
+            definition['columns'][i] = (column, new_type + sql_type[len(base_type):])
+        if compact_columns:
+            definition['compact_columns'] = compact_columns
+            for index in definition.get('indexes', []):
+                if 'where' in index:
+                    index['where'] = {col: _compact_value(value, compact_columns.get(col))
+                                      for col, value in index['where'].items()}
+    return schema
+
+
+def _compact_value(value: str, kind) -> object:
+    """Valor no formato do perfil --compact (`kind`: largura do código ou 'uf')."""
+    if kind == 'uf':
+        return UF_CODES[value]
+    return int(value) if isinstance(kind, int) else value
+
+
+def index_profile_schema(schema: dict, index_profile: str) -> dict:
+    """Perfil de índices (`--index-profile`): mantém somente os índices com `index_profile` em `profiles`."""
+    schema = copy.deepcopy(schema)
+    for definition in schema.values():
+        if 'indexes' in definition:
+            definition['indexes'] = [index for index in definition['indexes']
+                                     if index_profile in index.get('profiles', ())]
+    return schema
+
+
+def index_where(index: dict) -> str:
+    """Condição do índice parcial (`where`) em SQL, ou vazio se o índice não for parcial."""
+    terms = [f'"{col}" = {value}' if isinstance(value, int) else f""""{col}" = '{value}'"""
+             for col, value in index.get('where', {}).items()]
+    return " AND ".join(terms)
+
+
+def is_compact() -> bool:
+    """Se o perfil `--compact` está ativo em `SCHEMA`."""
+    return any(definition.get('compact_columns') for definition in SCHEMA.values())
+
+
+def configure_schema(cnpj_key: bool = False, compact: bool = False, engine: Optional[str] = None,
+                     index_profile: str = 'full') -> None:
+    """
+    Aplica os perfis da execução em `SCHEMA`. O dicionário é alterado no lugar, para que todos os módulos que o
+    importaram (builders, loaders e produtor) passem a usar o mesmo schema.
+
+    :params:
+        cnpj_key: se deve usar a chave `cnpj` (BIGINT) em estabelecimento e estabelecimento_cnae_sec.
+        compact: se deve gravar os códigos (e, no SQLite, as datas) como inteiros.
+        engine: engine do banco de dados (define a representação das datas no perfil compacto).
+        index_profile: perfil dos índices criados ("none", "lookup", "analytics", "tuned" ou "full").
+    """
+    schema = copy.deepcopy(BASE_SCHEMA)
+    if cnpj_key:
+        schema = cnpj_key_schema(schema)
+    if compact:
+        schema = compact_schema(schema, date_as_integer=engine == "sqlite")
+    schema = index_profile_schema(schema, index_profile)
+    SCHEMA.clear()
+    SCHEMA.update(schema)
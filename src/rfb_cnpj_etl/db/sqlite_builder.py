@@ -7,8 +7,11 @@ Módulo para construção do banco de dados SQLite.
 import os
 import sqlite3
 from typing import Dict, Any, Optional
-from ..config import SQLITE_DB_PATH
-from ..db.schema import SCHEMA
+from ..config import (
+    SQLITE_DB_PATH, SQLITE_BUILD_SUFFIX, SQLITE_BUILD_JOURNAL_MODE, SQLITE_PAGE_SIZE, SQLITE_AUTO_VACUUM,
+    SQLITE_ANALYSIS_LIMIT, SQLITE_MMAP_SIZE, SQLITE_FTS_TOKENIZE, FULLTEXT_COLUMNS
+)
+from ..db.schema import SCHEMA, UF_CODES, COMPACT_VIEW_PREFIX, is_compact, index_where
 from ..utils.db_patch import apply_static_fixes
 from ..utils.logger import print_log
 
@@ -17,14 +20,21 @@ class SQLiteBuilder:
     """
     Classe para construção do banco de dados SQLite.
 
+    Com `publish="swap"`, o banco é construído em um arquivo ao lado do publicado (`db_path` + SQLITE_BUILD_SUFFIX),
+    sem journal; o banco publicado continua disponível durante toda a carga. Em `publish()`, o novo arquivo é
+    verificado (`PRAGMA quick_check`) e renomeado sobre o publicado (`os.replace`, atômico). Conexões abertas no
+    arquivo anterior continuam lendo a versão anterior até serem reabertas.
+
     :params:
         db_path: caminho para o banco de dados SQLite.
-        tables: dicionário de tabelas e colunas.
-        conn: conexão com o banco de dados.
+        publish: modo de publicação ("swap" constrói em um arquivo separado). None constrói no próprio `db_path`.
     """
 
-    def __init__(self, db_path: Optional[str] = SQLITE_DB_PATH):
-        self.db_path = db_path
+    def __init__(self, db_path: Optional[str] = SQLITE_DB_PATH, publish: Optional[str] = None):
+        self.live_path = str(db_path or SQLITE_DB_PATH)
+        self.publish_mode = publish
+        self.db_path = f"{self.live_path}{SQLITE_BUILD_SUFFIX}" if publish == "swap" else self.live_path
+        self.journal_mode = SQLITE_BUILD_JOURNAL_MODE if publish == "swap" else "MEMORY"
         self.schema: Dict[str, Any] = SCHEMA
         self.conn = None
 
@@ -38,6 +48,7 @@ class SQLiteBuilder:
         try:
             conn = sqlite3.connect(self.db_path)
             conn.execute("PRAGMA foreign_keys = OFF;")
+            conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE};")
             return conn
         except sqlite3.Error as e:
             print_log(f"ERRO AO CONECTAR NO BANCO: {e}", level="error")
@@ -53,12 +64,13 @@ class SQLiteBuilder:
 
     def drop_database(self) -> None:
         """
-        Fecha conexão pendente e exclui o arquivo .db, se existir.
+        Fecha conexão pendente e exclui o arquivo .db em construção (e o seu journal), se existir.
         """
         try:
             self._close_connection()
-            if os.path.exists(self.db_path):
-                os.remove(self.db_path)
+            for path in (self.db_path, f"{self.db_path}-journal"):
+                if os.path.exists(path):
+                    os.remove(path)
 
         except Exception as e:
             print_log(f"ERRO AO RECRIAR O BANCO: {e}", level="error")
@@ -68,20 +80,26 @@ class SQLiteBuilder:
         """
         Cria todas as tabelas definidas em "tables", incluindo PKs e FKs.
 
-        As FKs permanecem desativadas até a chamada posterior de "enable_foreign_keys()".
+        As FKs permanecem desativadas até a chamada posterior de "enable_foreign_keys()". O tamanho da página e o
+        auto_vacuum só podem ser definidos antes da criação da primeira tabela.
         """
         if self.conn is None: self.conn = self._connect()
         try:
             print_log("CRIANDO TABELAS...", level="task")
             cur = self.conn.cursor()
+            cur.execute(f"PRAGMA page_size = {SQLITE_PAGE_SIZE};")
+            cur.execute(f"PRAGMA auto_vacuum = {SQLITE_AUTO_VACUUM};")
 
             # Tabelas grandes cuja PK será criada apenas no final
             tables_to_defer_pk = {'empresa', 'estabelecimento'}
 
             for table_name, spec in self.schema.items():
                 cur.execute(f'DROP TABLE IF EXISTS "{table_name}"')
-                columns_defs = [f'"{col[0]}" {col[1]}' for col in spec['columns']]
-                if 'primary_key' in spec:
+                # chave inteira (--cnpj-key): INTEGER PRIMARY KEY é o próprio rowid, sem índice separado
+                integer_key = spec.get('integer_key')
+                columns_defs = [f'"{col[0]}" INTEGER PRIMARY KEY' if col[0] == integer_key else f'"{col[0]}" {col[1]}'
+                                for col in spec['columns']]
+                if 'primary_key' in spec and not integer_key:
                     # Só cria a PK agora se a tabela NÃO estiver na lista de adiamento
                     if table_name not in tables_to_defer_pk:
                         pk_cols = ', '.join([f'"{col}"' for col in spec['primary_key']])
@@ -98,6 +116,80 @@ class SQLiteBuilder:
         finally:
             self._close_connection()
 
+    @staticmethod
+    def view_expression(column: str, kind, alias: Optional[str] = None) -> str:
+        """
+        Expressão da coluna do perfil --compact no formato original (`kind`: largura, 'uf' ou 'date'), como nas views
+        `v_<tabela>`. Com `alias`, a coluna é qualificada pelo alias da tabela na consulta.
+        """
+        ref = f'{alias}."{column}"' if alias else f'"{column}"'
+        if kind == 'uf':
+            cases = " ".join(f"WHEN {cod} THEN '{uf}'" for uf, cod in UF_CODES.items())
+            return f'CASE {ref} {cases} END'
+        if kind == 'date':
+            value = f"""printf('%04d-%02d-%02d', {ref} / 10000, {ref} / 100 % 100, {ref} % 100)"""
+        else:
+            value = f"""printf('%0{kind}d', {ref})"""
+        return f'CASE WHEN {ref} IS NOT NULL THEN {value} END'  # printf trata NULL como zero
+
+    def create_views(self) -> None:
+        """
+        Perfil --compact: cria as views `v_<tabela>`, com os códigos como texto com zeros à esquerda, a UF em sigla e
+        as datas em 'YYYY-MM-DD' (como no schema padrão).
+        """
+        if self.conn is None: self.conn = self._connect()
+        try:
+            print_log("CRIANDO VIEWS DO PERFIL COMPACTO...", level="task")
+            for table_name, spec in self.schema.items():
+                compact_columns = spec.get('compact_columns')
+                if not compact_columns:
+                    continue
+                select_cols = ", ".join(
+                    f'{self.view_expression(col, compact_columns[col])} AS "{col}"' if col in compact_columns
+                    else f'"{col}"'
+                    for col, _ in spec['columns']
+                )
+                view_name = f"{COMPACT_VIEW_PREFIX}{table_name}"
+                self.conn.execute(f'DROP VIEW IF EXISTS "{view_name}";')
+                self.conn.execute(f'CREATE VIEW "{view_name}" AS SELECT {select_cols} FROM "{table_name}";')
+            self.conn.commit()
+            print_log("VIEWS CRIADAS", level="success")
+        except sqlite3.Error as e:
+            print_log(f"ERRO AO CRIAR VIEWS: {e}", level="error")
+            raise
+        finally:
+            self._close_connection()
+
+    def build_cnae_sec(self) -> None:
+        """
+        Preenche `estabelecimento_cnae_sec` a partir da coluna `cod_cnae_secundario` de `estabelecimento`, em um único
+        INSERT ... SELECT (a lista "1111111,2222222" vira um array JSON percorrido com `json_each`).
+        """
+        if self.conn is None: self.conn = self._connect()
+        key_cols = [col[0] for col in self.schema['estabelecimento_cnae_sec']['columns']][:-1]
+        insert_cols = ", ".join(key_cols)
+        select_cols = ", ".join(f"e.{col}" for col in key_cols)
+        try:
+            print_log("GERANDO CNAES SECUNDÁRIOS...", level="task")
+            self.conn.execute(f"PRAGMA journal_mode={self.journal_mode};")
+            self.conn.execute("PRAGMA synchronous=OFF;")
+            self.conn.execute(f"""
+                INSERT INTO estabelecimento_cnae_sec ({insert_cols}, cod_cnae)
+                SELECT {select_cols}, trim(c.value)
+                FROM estabelecimento e,
+                     json_each('["' || replace(replace(replace(e.cod_cnae_secundario, '\\', '\\\\'), '"', '\\"'),
+                                               ',', '","') || '"]') c
+                WHERE e.cod_cnae_secundario IS NOT NULL AND e.cod_cnae_secundario <> ''
+                  AND trim(c.value) <> '';
+            """)
+            self.conn.commit()
+            print_log("CNAES SECUNDÁRIOS GERADOS", level="success")
+        except sqlite3.Error as e:
+            print_log(f"ERRO AO GERAR CNAES SECUNDÁRIOS: {e}", level="error")
+            raise
+        finally:
+            self._close_connection()
+
     def patch_data(self):
         """
         Normaliza os dados de algumas tabelas, permitindo a criação das chaves estrangeiras.
@@ -126,7 +218,9 @@ class SQLiteBuilder:
 
     def create_indexes(self) -> None:
         """
-        Cria índices recomendados para melhorar desempenho de consultas.
+        Cria índices recomendados para melhorar desempenho de consultas (os do perfil de `--index-profile`).
+
+        O SQLite não tem INCLUDE: as colunas de cobertura (`include`) entram no final da chave do índice.
         """
         if self.conn is None: self.conn = self._connect()
         try:
@@ -135,7 +229,7 @@ class SQLiteBuilder:
             cur = self.conn.cursor()
 
             # PRAGMAs para acelerar o trabalho
-            cur.execute("PRAGMA journal_mode=MEMORY;")
+            cur.execute(f"PRAGMA journal_mode={self.journal_mode};")
             cur.execute("PRAGMA synchronous=OFF;")
             cur.execute("PRAGMA foreign_keys = OFF;")
 
@@ -149,11 +243,16 @@ class SQLiteBuilder:
                         index_cols = ', '.join(index['columns'])
 
                         print_log(
-                            f" {indexes_done + 1} de {total_indexes} | CRIANDO ÍNDICE '{index_name}' NA TABELA '{table_name}' (Colunas: {index_cols})... ",
+                            f" {indexes_done + 1} de {total_indexes} | CRIANDO ÍNDICE '{index_name}' "
+                            f"NA TABELA '{table_name}' (Colunas: {index_cols})... ",
                             level="task")
 
-                        stmt = f"CREATE INDEX IF NOT EXISTS \"{index_name}\" ON \"{table_name}\" ({', '.join(f'\"{col}\"' for col in index['columns'])});"
-                        cur.execute(stmt)
+                        quoted_cols = ', '.join(f'"{col}"' for col in index['columns'] + index.get('include', []))
+                        stmt = f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{table_name}" ({quoted_cols})'
+                        where = index_where(index)
+                        if where:
+                            stmt += f' WHERE {where}'
+                        cur.execute(stmt + ';')
 
                         indexes_done += 1
 
@@ -167,11 +266,117 @@ class SQLiteBuilder:
         finally:
             self._close_connection()
 
+    def create_fulltext(self) -> None:
+        """
+        Cria as tabelas FTS5 (`<tabela>_fts`) das colunas de FULLTEXT_COLUMNS, com conteúdo externo: o índice aponta
+        para o rowid da tabela de origem, sem duplicar os nomes. O tokenizador (SQLITE_FTS_TOKENIZE) ignora acentos.
+
+        O VACUUM pode renumerar os rowids das tabelas sem INTEGER PRIMARY KEY, por isso as tabelas FTS são criadas
+        após a finalização (`finalize`).
+        """
+        if self.conn is None: self.conn = self._connect()
+        try:
+            print_log("CRIANDO ÍNDICES DE BUSCA TEXTUAL (FTS5)...", level="task")
+            self.conn.execute(f"PRAGMA journal_mode={self.journal_mode};")
+            self.conn.execute("PRAGMA synchronous=OFF;")
+            for table_name, column in FULLTEXT_COLUMNS.items():
+                fts = f"{table_name}_fts"
+                self.conn.execute(f'DROP TABLE IF EXISTS "{fts}";')
+                self.conn.execute(f'CREATE VIRTUAL TABLE "{fts}" USING fts5("{column}", content="{table_name}", '
+                                  f"content_rowid='rowid', tokenize='{SQLITE_FTS_TOKENIZE}');")
+                self.conn.execute(f"""INSERT INTO "{fts}"("{fts}") VALUES ('rebuild');""")
+                self.conn.execute(f"""INSERT INTO "{fts}"("{fts}") VALUES ('optimize');""")
+                self.conn.commit()
+                print_log(f"ÍNDICE CRIADO: {fts}", level="docs")
+            print_log("ÍNDICES DE BUSCA TEXTUAL CRIADOS", level="success")
+        except sqlite3.Error as e:
+            print_log(f"ERRO AO CRIAR ÍNDICES DE BUSCA TEXTUAL: {e}", level="error")
+            raise
+        finally:
+            self._close_connection()
+
+    def finalize(self, vacuum: bool = False) -> None:
+        """
+        Etapa final da carga, após índices e FKs:
+          1) ANALYZE (amostrado com `analysis_limit`), para o planejador de consultas usar os índices corretos
+          2) PRAGMA optimize
+          3) se `vacuum`, VACUUM INTO um novo arquivo, compactado e desfragmentado, que substitui o atual
+
+        O VACUUM INTO grava a cópia uma única vez (o VACUUM comum grava a cópia e depois a copia de volta) e elimina
+        as páginas livres deixadas pelas correções (DELETE/UPDATE) de `apply_static_fixes`.
+
+        :params:
+            vacuum: se deve compactar o banco com VACUUM INTO.
+        """
+        self._close_connection()
+        self.conn = self._connect()
+        vacuum_path = f"{self.db_path}.vacuum"
+        try:
+            print_log("FINALIZANDO O BANCO DE DADOS...", level="task")
+            print_log(f"  -> ANALYZE (analysis_limit = {SQLITE_ANALYSIS_LIMIT})...", level="docs")
+            self.conn.execute(f"PRAGMA analysis_limit = {SQLITE_ANALYSIS_LIMIT};")
+            self.conn.execute("ANALYZE;")
+            self.conn.execute("PRAGMA optimize;")
+            self.conn.commit()
+
+            if vacuum:
+                print_log("  -> VACUUM INTO...", level="docs")
+                if os.path.exists(vacuum_path):
+                    os.remove(vacuum_path)
+                self.conn.execute("VACUUM INTO ?;", (vacuum_path,))
+                self._close_connection()
+                os.replace(vacuum_path, self.db_path)
+            print_log("BANCO DE DADOS FINALIZADO", level="success")
+        except (sqlite3.Error, OSError) as e:
+            print_log(f"ERRO AO FINALIZAR O BANCO: {e}", level="error")
+            if os.path.exists(vacuum_path):
+                os.remove(vacuum_path)
+            raise
+        finally:
+            self._close_connection()
+
+    def publish(self) -> None:
+        """
+        Publica o banco construído em arquivo separado (`publish="swap"`):
+          1) PRAGMA quick_check (o banco publicado não é alterado se a verificação falhar)
+          2) os.replace do novo arquivo sobre o publicado
+
+        :raises sqlite3.DatabaseError: se a verificação do novo arquivo falhar
+        """
+        if self.publish_mode != "swap":
+            return
+        self._close_connection()
+        self.conn = self._connect()
+        try:
+            print_log("PUBLICANDO O BANCO DE DADOS...", level="task")
+            print_log("  -> PRAGMA quick_check...", level="docs")
+            problems = [row[0] for row in self.conn.execute("PRAGMA quick_check;").fetchall()]
+            if problems != ["ok"]:
+                raise sqlite3.DatabaseError(f"FALHA NA VERIFICAÇÃO DE {self.db_path}: {problems[:5]}")
+        except sqlite3.Error as e:
+            print_log(f"ERRO AO PUBLICAR O BANCO: {e}", level="error")
+            raise
+        finally:
+            self._close_connection()
+
+        try:
+            os.replace(self.db_path, self.live_path)
+        except OSError as e:
+            # no Windows, conexões abertas no banco publicado impedem a troca
+            print_log(f"ERRO AO SUBSTITUIR {self.live_path} (NOVO BANCO MANTIDO EM {self.db_path}): {e}",
+                      level="error")
+            raise
+        self.db_path = self.live_path
+        print_log(f"BANCO PUBLICADO EM: {self.live_path}", level="success")
+
     def initialize_schema(self) -> None:
         """
         Fluxo de inicialização do script_sql:
           1) drop_database
           2) create_tables
+          3) create_views (perfil --compact)
         """
         self.drop_database()
         self.create_tables()
+        if is_compact():
+            self.create_views()
@@ -4,18 +4,26 @@
 Módulo para carregamento de dados no banco de dados SQLite.
 """
 
-import gc
 import sqlite3
+import time
 from queue import Queue
-from ..config import QUEUE_SIZE, DEBUG_LOG
+from ..config import QUEUE_SIZE, DEBUG_LOG, SQLITE_CACHE_SIZE_KIB
 from threading import Thread
-from typing import Optional
+from typing import Dict, Optional, Set
 from ..utils.logger import print_log
+from ..utils.memory import MemoryBudget
+from ..utils.metrics import LoadMetrics
+from ..utils.profiler import LoadProfiler, profiled
 from ..utils.progress import pbar, update_progress
-from ..utils.db_batch_producer import produce_batches
+from ..utils.db_batch_producer import produce_batches, BatchSizeController
+from .schema import SCHEMA
 
 
-def consume_batches(insertion_queue, db_path: str, total_records: int, low_memory: bool):
+def consume_batches(insertion_queue, db_path: str, total_records: int,
+                    memory_budget: Optional[MemoryBudget] = None,
+                    metrics: Optional[LoadMetrics] = None,
+                    batch_controller: Optional[BatchSizeController] = None,
+                    journal_mode: str = "MEMORY"):
     """
     Consome lotes da fila e os insere no banco de dados SQLite dentro de uma única transação.
     """
@@ -26,20 +34,29 @@ def consume_batches(insertion_queue, db_path: str, total_records: int, low_memor
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
-    cursor.execute("PRAGMA journal_mode=MEMORY;")
+    cursor.execute(f"PRAGMA journal_mode={journal_mode};")
     cursor.execute("PRAGMA synchronous=OFF;")
     cursor.execute("PRAGMA foreign_keys=OFF;")
     cursor.execute("PRAGMA locking_mode=EXCLUSIVE;")
     cursor.execute("PRAGMA temp_store=MEMORY;")
-    cursor.execute("PRAGMA cache_size=-128000;")
+    cache_size_kib = memory_budget.sqlite_cache_kib if memory_budget else SQLITE_CACHE_SIZE_KIB
+    cursor.execute(f"PRAGMA cache_size=-{cache_size_kib};")
 
     inserted_total = 0
 
+    # tabelas em que as chaves repetidas são ignoradas (e contadas), em vez de invalidar o lote inteiro
+    ignore_duplicates = {"empresa"}
+    if SCHEMA["estabelecimento"].get("integer_key"):
+        ignore_duplicates.add("estabelecimento")
+    duplicates: Dict[str, int] = {}
+
     try:
         cursor.execute("BEGIN TRANSACTION")
 
         while True:
+            wait_start = time.perf_counter()
             item = insertion_queue.get()
+            wait_secs = time.perf_counter() - wait_start
             if item is None:
                 insertion_queue.task_done()
                 break
@@ -53,16 +70,27 @@ def consume_batches(insertion_queue, db_path: str, total_records: int, low_memor
             table = item["table"]
             columns = item["columns"]
 
-            verb = "INSERT OR IGNORE" if table == "empresa" else "INSERT"
+            verb = "INSERT OR IGNORE" if table in ignore_duplicates else "INSERT"
             placeholders = ",".join(["?"] * len(columns))
             col_names = ",".join(columns)
             sql = f"{verb} INTO {table} ({col_names}) VALUES ({placeholders})"
 
+            write_start = time.perf_counter()
             try:
                 cursor.executemany(sql, rows)
+                if table in ignore_duplicates and cursor.rowcount < len(rows):
+                    duplicates[table] = duplicates.get(table, 0) + len(rows) - cursor.rowcount
             except Exception as insert_err:
                 print_log(f"ERRO AO INSERIR NO SQLITE (tabela {table}): {insert_err}", level="error")
 
+            write_secs = time.perf_counter() - write_start
+            if batch_controller:
+                batch_controller.record(table, len(rows), write_secs)
+            if metrics:
+                metrics.add("queue_get", table, item["filename"], wait_secs)
+                metrics.add("write", table, item["filename"], write_secs,
+                            rows=len(rows), nbytes=item.get("nbytes", 0))
+
             if table != 'estabelecimento_cnae_sec':
                 inserted_total += len(rows)
 
@@ -71,18 +99,19 @@ def consume_batches(insertion_queue, db_path: str, total_records: int, low_memor
                     accumulated_total=inserted_total,
                     filename=item["filename"],
                     insertion_queue=insertion_queue,
-                    queue_size_max=QUEUE_SIZE,
+                    queue_size_max=insertion_queue.maxsize,
                     total=total_records,
                     debug=DEBUG_LOG,
                     bar=progress
                 )
 
             insertion_queue.task_done()
-            if low_memory:
-                gc.collect()
 
         conn.commit()
 
+        for table, count in duplicates.items():
+            print_log(f"{count} LINHA(S) DE {table.upper()} COM CHAVE REPETIDA IGNORADA(S)", level="warning")
+
     except Exception as e:
         print_log(f"ERRO FATAL NA CARGA SQLITE: {e}", level="error")
 
@@ -92,19 +121,35 @@ def consume_batches(insertion_queue, db_path: str, total_records: int, low_memor
         conn.close()
 
 
-def run_sqlite_loader(files_dir: str, db_path: str, total_records: int, low_memory: Optional[bool] = False):
+def run_sqlite_loader(files_dir: str, db_path: str, total_records: int,
+                      memory_budget: Optional[MemoryBudget] = None,
+                      metrics: Optional[LoadMetrics] = None, profiler: Optional[LoadProfiler] = None,
+                      batch_controller: Optional[BatchSizeController] = None,
+                      skip_tables: Optional[Set[str]] = None,
+                      journal_mode: str = "MEMORY"):
     """
     Inicia o processo de carga de dados para o SQLite.
     """
     print_log(f"REALIZANDO CARGA NO BANCO DE DADOS SQLITE...", level="task")
-    insertion_queue = Queue(maxsize=QUEUE_SIZE)
+    insertion_queue = Queue(maxsize=memory_budget.queue_size if memory_budget else QUEUE_SIZE)
 
-    writer = Thread(target=consume_batches, args=(insertion_queue, db_path, total_records, low_memory))
+    writer = Thread(target=profiled(consume_batches, profiler),
+                    args=(insertion_queue, db_path, total_records, memory_budget, metrics, batch_controller,
+                          journal_mode),
+                    name="WRITER")
     writer.start()
 
+    completed = False  # se o produtor terminou sem erros
     try:
-        produce_batches(files_dir, insertion_queue, engine="sqlite", low_memory=low_memory)
+        produce_batches(files_dir, insertion_queue, engine="sqlite", memory_budget=memory_budget, metrics=metrics,
+                        profiler=profiler, batch_controller=batch_controller, skip_tables=skip_tables)
+        completed = True
     finally:
         insertion_queue.put(None)
         writer.join()
-        print_log(f"CARGA DE DADOS CONCLUÍDA", level="success")
+        if batch_controller:
+            batch_controller.log_summary()
+        if completed:
+            print_log(f"CARGA DE DADOS CONCLUÍDA", level="success")
+        else:
+            print_log("CARGA DE DADOS INTERROMPIDA", level="error")
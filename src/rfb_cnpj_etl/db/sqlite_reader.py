@@ -0,0 +1,249 @@
+# db/sqlite_reader.py
+
+"""
+Módulo para consulta do banco de dados SQLite gerado pela carga (somente leitura).
+
+O banco é aberto com `mode=ro&immutable=1`: o SQLite não usa locks nem verifica alterações no arquivo a cada
+consulta, e as páginas são lidas mapeadas em memória (`mmap_size`), sem cópias pelo cache de páginas da conexão.
+Cada thread tem a sua conexão, e as consultas usam sempre o mesmo SQL, reaproveitando os statements já preparados
+(cache de statements do `sqlite3`).
+
+Nos bancos gerados com `--compact`, os códigos, a UF e as datas são retornados no formato original, com as mesmas
+expressões das views `v_<tabela>` (os filtros continuam nas colunas inteiras, que usam os índices), e a UF dos filtros
+é convertida para o código do IBGE.
+
+O banco não pode ser alterado enquanto estiver aberto. Com `db load --publish swap`, o arquivo novo substitui o
+anterior (outro inode): as conexões abertas continuam lendo a versão anterior e são reabertas na próxima consulta.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from ..config import SQLITE_DB_PATH, SQLITE_READ_MMAP_SIZE, SQLITE_READ_CACHED_STATEMENTS
+from ..db.schema import BASE_SCHEMA, UF_CODES, compact_schema
+from ..db.sqlite_builder import SQLiteBuilder
+
+# CNPJ de 14 dígitos, no schema padrão e no perfil --compact (partes inteiras)
+_CNPJ_SQL = "est.cnpj_basico || est.cnpj_ordem || est.cnpj_dv"
+_COMPACT_CNPJ_SQL = "printf('%08d%04d%02d', est.cnpj_basico, est.cnpj_ordem, est.cnpj_dv)"
+
+_LOOKUP_SQL = """
+        SELECT {cnpj} AS cnpj,
+               e.razao_social, est.nome_fantasia, est.matriz_filial,
+               est.cod_situacao_cadastral, est.data_situacao_cadastral,
+               est.cod_motivo_situacao_cadastral, mot.nome_motivo,
+               est.data_inicio_atividade,
+               e.cod_natureza_juridica, nat.nome_natureza, e.cod_porte, e.capital_social,
+               est.cod_cnae_principal, cn.nome_cnae, est.cod_cnae_secundario,
+               est.tipo_logradouro, est.logradouro, est.numero, est.complemento, est.bairro, est.cep,
+               est.uf, est.cod_municipio, mun.nome_municipio,
+               est.ddd_telefone_1, est.telefone_1, est.ddd_telefone_2, est.telefone_2, est.email,
+               sn.opcao_simples, sn.data_opcao_simples, sn.data_exclusao_simples,
+               sn.opcao_mei, sn.data_opcao_mei, sn.data_exclusao_mei
+        FROM estabelecimento est
+        JOIN empresa e ON est.cnpj_basico = e.cnpj_basico
+        LEFT JOIN simples sn ON e.cnpj_basico = sn.cnpj_basico
+        LEFT JOIN municipio mun ON est.cod_municipio = mun.cod_municipio
+        LEFT JOIN motivo mot ON est.cod_motivo_situacao_cadastral = mot.cod_motivo
+        LEFT JOIN natureza_juridica nat ON e.cod_natureza_juridica = nat.cod_natureza
+        LEFT JOIN cnae cn ON est.cod_cnae_principal = cn.cod_cnae
+        WHERE {cnpj_filter}
+    """
+
+_QUERY_TEMPLATES: Dict[str, str] = {
+    "lookup": _LOOKUP_SQL.format(cnpj="{cnpj}",
+                                 cnpj_filter="est.cnpj_basico = ? AND est.cnpj_ordem = ? AND est.cnpj_dv = ?"),
+    "lookup_key": _LOOKUP_SQL.format(cnpj="{cnpj}", cnpj_filter="est.cnpj = ?"),  # bancos gerados com --cnpj-key
+    "partners": """
+        SELECT s.identificador_socio, s.nome_socio, s.cnpj_cpf_socio,
+               s.cod_qualificacao_socio, q.nome_qualificacao, s.data_entrada_sociedade, s.cod_faixa_etaria,
+               s.cpf_representante_legal, s.nome_representante_legal
+        FROM socio s
+        LEFT JOIN qualificacao_socio q ON s.cod_qualificacao_socio = q.cod_qualificacao
+        WHERE s.cnpj_basico = ?
+        ORDER BY s.nome_socio
+    """,
+    "establishments_by_municipality": """
+        SELECT {cnpj} AS cnpj,
+               e.razao_social, est.nome_fantasia, est.cod_cnae_principal, est.data_inicio_atividade
+        FROM estabelecimento est
+        JOIN empresa e ON est.cnpj_basico = e.cnpj_basico
+        WHERE est.uf = ? AND est.cod_municipio = ? AND est.cod_situacao_cadastral = ?
+        LIMIT ? OFFSET ?
+    """,
+    # requerem as tabelas FTS5 (db load/index --fulltext)
+    "search_companies": """
+        SELECT e.cnpj_basico, e.razao_social, e.cod_natureza_juridica, e.cod_porte
+        FROM empresa_fts f
+        JOIN empresa e ON e.rowid = f.rowid
+        WHERE empresa_fts MATCH ?
+        LIMIT ?
+    """,
+    "search_partners": """
+        SELECT s.cnpj_basico, s.nome_socio, s.cnpj_cpf_socio, s.cod_qualificacao_socio
+        FROM socio_fts f
+        JOIN socio s ON s.rowid = f.rowid
+        WHERE socio_fts MATCH ?
+        LIMIT ?
+    """,
+}
+
+# colunas convertidas de cada tabela no perfil --compact do SQLite (datas como inteiro YYYYMMDD)
+_COMPACT_COLUMNS = {table: spec.get('compact_columns', {})
+                    for table, spec in compact_schema(BASE_SCHEMA, date_as_integer=True).items()}
+
+
+def _compact_query(sql: str) -> str:
+    """
+    Consulta do perfil --compact: as colunas convertidas do SELECT voltam ao formato original, com as expressões das
+    views `v_<tabela>` (ex.: 35 → 'SP', 1001000 → '01001000'); o FROM e os filtros não mudam.
+    """
+    select, from_keyword, rest = sql.partition("FROM")
+    aliases = {alias: table for table, alias in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)\s+(\w+)", from_keyword + rest)}
+
+    def original_format(match: re.Match) -> str:
+        alias, column = match.groups()
+        kind = _COMPACT_COLUMNS.get(aliases.get(alias), {}).get(column)
+        if kind is None:
+            return match.group(0)
+        return f"{SQLiteBuilder.view_expression(column, kind, alias)} AS {column}"
+
+    select = re.sub(r"\b(\w+)\.(\w+)\b", original_format, select)
+    return (select + from_keyword + rest).format(cnpj=_COMPACT_CNPJ_SQL)
+
+
+QUERIES: Dict[str, str] = {name: sql.format(cnpj=_CNPJ_SQL) for name, sql in _QUERY_TEMPLATES.items()}
+COMPACT_QUERIES: Dict[str, str] = {name: _compact_query(sql) for name, sql in _QUERY_TEMPLATES.items()}
+
+
+def split_cnpj(cnpj: str) -> Tuple[str, str, str]:
+    """
+    Separa o CNPJ (com ou sem pontuação) em (cnpj_basico, cnpj_ordem, cnpj_dv).
+
+    :raises ValueError: se o CNPJ não tiver dígitos ou tiver mais de 14
+    """
+    digits = re.sub(r"\D", "", str(cnpj))
+    if not digits or len(digits) > 14:
+        raise ValueError(f"CNPJ INVÁLIDO: {cnpj}")
+    digits = digits.zfill(14)
+    return digits[:8], digits[8:12], digits[12:]
+
+
+def fts_query(text: str) -> str:
+    """
+    Converte o nome buscado em uma consulta FTS5: todas as palavras, como prefixo ("JOAO SILV" → "JOAO"* "SILV"*).
+    """
+    words = [word.replace('"', '""') for word in str(text).split()]
+    if not words:
+        raise ValueError("BUSCA VAZIA")
+    return " ".join(f'"{word}"*' for word in words)
+
+
+class SQLiteReader:
+    """
+    Fábrica de conexões somente leitura do banco SQLite, com as consultas mais comuns de `docs/exemplos`.
+
+    Pode ser compartilhada entre threads: cada thread abre (e reaproveita) a sua própria conexão.
+
+    :params:
+        db_path: caminho para o banco de dados SQLite.
+        mmap_size: bytes do banco mapeados em memória (o suficiente para os índices mais usados).
+    """
+
+    def __init__(self, db_path: Optional[str] = SQLITE_DB_PATH, mmap_size: int = SQLITE_READ_MMAP_SIZE):
+        self.db_path = Path(db_path or SQLITE_DB_PATH)
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+
+    def _file_id(self) -> Tuple[int, int]:
+        stat = os.stat(self.db_path)
+        return stat.st_dev, stat.st_ino
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Abre uma nova conexão somente leitura (`mode=ro&immutable=1`) com o banco.
+
+        :returns: conexão SQLite (linhas como `sqlite3.Row`)
+        :raises sqlite3.Error: se o banco não existir ou não puder ser aberto
+        """
+        if not self.db_path.exists():
+            raise sqlite3.OperationalError(f"BANCO NÃO ENCONTRADO: {self.db_path}")
+        conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro&immutable=1", uri=True,
+                               cached_statements=SQLITE_READ_CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size};")
+        conn.execute("PRAGMA query_only = ON;")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Conexão da thread atual, reaberta se o arquivo do banco tiver sido substituído (`--publish swap`).
+        """
+        file_id = self._file_id()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.file_id != file_id:
+            conn.close()
+            conn = None
+        if conn is None:
+            conn = self._local.conn = self.connect()
+            self._local.file_id = file_id
+            columns = {row["name"]: row["type"] for row in conn.execute("PRAGMA table_info(estabelecimento);")}
+            self._local.cnpj_key = "cnpj" in columns
+            self._local.compact = columns.get("uf") == "SMALLINT"
+        return conn
+
+    def uses_cnpj_key(self) -> bool:
+        """Se o banco foi gerado com --cnpj-key (coluna `cnpj` em estabelecimento)."""
+        self.connection()
+        return self._local.cnpj_key
+
+    def uses_compact_profile(self) -> bool:
+        """Se o banco foi gerado com --compact (códigos e datas como inteiros)."""
+        self.connection()
+        return self._local.compact
+
+    def close(self) -> None:
+        """Fecha a conexão da thread atual."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def query(self, name: str, params: tuple = ()) -> List[sqlite3.Row]:
+        """Executa uma das consultas de `QUERIES` (ou de `COMPACT_QUERIES`, nos bancos gerados com --compact)."""
+        conn = self.connection()
+        queries = COMPACT_QUERIES if self._local.compact else QUERIES
+        return conn.execute(queries[name], params).fetchall()
+
+    def lookup(self, cnpj: str) -> Optional[sqlite3.Row]:
+        """Dados cadastrais do estabelecimento (empresa, situação, endereço, CNAE e Simples), ou None."""
+        parts = split_cnpj(cnpj)
+        if self.uses_cnpj_key():
+            rows = self.query("lookup_key", (int("".join(parts)),))
+        else:
+            rows = self.query("lookup", parts)
+        return rows[0] if rows else None
+
+    def partners(self, cnpj: str) -> List[sqlite3.Row]:
+        """Quadro societário da empresa do CNPJ (básico ou completo)."""
+        digits = re.sub(r"\D", "", str(cnpj))
+        cnpj_basico = digits.zfill(8) if len(digits) <= 8 else split_cnpj(digits)[0]
+        return self.query("partners", (cnpj_basico,))
+
+    def establishments_by_municipality(self, uf: str, cod_municipio: str, cod_situacao_cadastral: str = "02",
+                                       limit: int = 100, offset: int = 0) -> List[sqlite3.Row]:
+        """Estabelecimentos do município (código da RFB), por padrão somente os ativos."""
+        uf = UF_CODES.get(uf.upper()) if self.uses_compact_profile() else uf.upper()
+        return self.query("establishments_by_municipality",
+                          (uf, cod_municipio, cod_situacao_cadastral, limit, offset))
+
+    def search_companies(self, name: str, limit: int = 100) -> List[sqlite3.Row]:
+        """Empresas cuja razão social contém as palavras buscadas (sem diferenciar acentos). Requer --fulltext."""
+        return self.query("search_companies", (fts_query(name), limit))
+
+    def search_partners(self, name: str, limit: int = 100) -> List[sqlite3.Row]:
+        """Sócios cujo nome contém as palavras buscadas (sem diferenciar acentos). Requer --fulltext."""
+        return self.query("search_partners", (fts_query(name), limit))
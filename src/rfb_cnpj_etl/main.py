@@ -2,9 +2,17 @@
 
 import argparse
 from .orchestrator import run_orchestrator
-from .cnpj_data import CNPJDataScraper, CNPJDownloadManager
+from .cnpj_data import CNPJDataScraper, CNPJDownloadManager, MirrorServer
 from .utils.logger import print_log
-from .config import DEFAULT_PARALLEL, DEFAULT_LOW_MEMORY, DEFAULT_ENGINE, SQLITE_DB_PATH, POSTGRES, ENGINE_OPTIONS
+from .utils.profiler import PROFILE_MODES
+from .config import (
+    DEFAULT_PARALLEL, DEFAULT_LOW_MEMORY, LOW_MEMORY_LIMIT, DEFAULT_ENGINE, DEFAULT_ADAPTIVE_BATCH, DEFAULT_CNAE_SEC_SQL,
+    DEFAULT_STAGING_TABLES, DEFAULT_PARTITIONED, SQLITE_DB_PATH, PARQUET_DIR, DUCKDB_DB_PATH, POSTGRES, ENGINE_OPTIONS,
+    PUBLISH_OPTIONS, DEFAULT_SQLITE_VACUUM, DEFAULT_FULLTEXT, DEFAULT_CNPJ_KEY, DEFAULT_COMPACT,
+    INDEX_PROFILES, DEFAULT_INDEX_PROFILE, DEFAULT_TASK_GRAPH, DEFAULT_COPY_FREEZE,
+    POSTGRES_ENCODINGS, DEFAULT_POSTGRES_ENCODING, DEFAULT_DOWNLOAD_STORE, DOWNLOAD_DIR, MIRROR_HOST, MIRROR_PORT
+)
+from .utils.memory import parse_size
 
 
 def str2bool(value):
@@ -26,10 +34,13 @@ def main() -> None:
     sub = parser.add_subparsers(dest="command", required=True)
 
     # RFB
-    sub.add_parser("get-availables", help="Lista meses disponíveis")
-    sub.add_parser("get-latest", help="Mês mais recente disponível")
+    p_avail = sub.add_parser("get-availables", help="Lista meses disponíveis")
+    p_avail.add_argument("--base-url", type=str, help="URL base do site (ex.: mirror local)")
+    p_latest = sub.add_parser("get-latest", help="Mês mais recente disponível")
+    p_latest.add_argument("--base-url", type=str, help="URL base do site (ex.: mirror local)")
     p_urls = sub.add_parser("get-urls", help="Exibe URLs de um mês")
     p_urls.add_argument("--month", type=str, help="MM/AAAA")
+    p_urls.add_argument("--base-url", type=str, help="URL base do site (ex.: mirror local)")
 
     # DOWNLOAD
     p_dl = sub.add_parser("download", help="Baixa ZIPs de um ou mais meses")
@@ -37,6 +48,21 @@ def main() -> None:
     p_dl.add_argument("--clean", action="store_true", help="Remove arquivos antigos")
     p_dl.add_argument("--workers", type=int, help="Número de downloads simultâneos")
     p_dl.add_argument("--download-dir", type=str, help="Diretório para salvar os arquivos")
+    p_dl.add_argument("--store", action="store_true", default=DEFAULT_DOWNLOAD_STORE,
+                      help="Reaproveita (hardlink) os arquivos inalterados de meses anteriores")
+    p_dl.add_argument("--base-url", type=str, help="URL base do site (ex.: mirror local)")
+
+    # MIRROR
+    p_mirror = sub.add_parser("mirror", help="Servidor local que imita o site da RFB (testes de download)")
+    p_mirror.add_argument("--dir", type=str, default=str(DOWNLOAD_DIR), help="Diretório com as pastas AAAA-MM")
+    p_mirror.add_argument("--host", type=str, default=MIRROR_HOST)
+    p_mirror.add_argument("--port", type=int, default=MIRROR_PORT)
+    p_mirror.add_argument("--bandwidth", type=str, help="Banda máxima por conexão, por segundo (ex: 512K, 2M)")
+    p_mirror.add_argument("--stall-rate", type=float, default=0.0,
+                          help="Probabilidade de um download travar no meio do arquivo (0 a 1)")
+    p_mirror.add_argument("--fault-rate", type=float, default=0.0,
+                          help="Probabilidade de um download ser respondido com 503 (0 a 1)")
+    p_mirror.add_argument("--seed", type=int, help="Semente do sorteio das falhas (resultados reproduzíveis)")
 
     # DB
     db_cmd = sub.add_parser("db", help="Comandos relacionados ao banco de dados")
@@ -44,56 +70,148 @@ def main() -> None:
 
     # db-init
     p_init = db_sub.add_parser("init", help="Inicializa o banco de dados")
-    p_init.add_argument("--engine", choices=["sqlite", "postgres"], type=str, default=DEFAULT_ENGINE)
+    p_init.add_argument("--engine", choices=ENGINE_OPTIONS, type=str, default=DEFAULT_ENGINE)
     p_init.add_argument("--db-path", type=str, help="Caminho do SQLite (.db)", default=SQLITE_DB_PATH)
     p_init.add_argument("--db-name", type=str, help="Nome do banco Postgres", default=POSTGRES["database"])
+    p_init.add_argument("--parquet-dir", type=str, help="Diretório do dataset Parquet", default=PARQUET_DIR)
+    p_init.add_argument("--duckdb-path", type=str, help="Caminho do DuckDB (.duckdb)", default=DUCKDB_DB_PATH)
+    p_init.add_argument("--partitioned", action="store_true", default=DEFAULT_PARTITIONED,
+                        help="Particiona estabelecimento e socio (Postgres)")
+    p_init.add_argument("--cnpj-key", action="store_true", default=DEFAULT_CNPJ_KEY,
+                        help="Usa o CNPJ completo (BIGINT) como chave de estabelecimento (SQLite e Postgres)")
+    p_init.add_argument("--compact", action="store_true", default=DEFAULT_COMPACT,
+                        help="Grava códigos e datas como inteiros, com views no formato original (SQLite e Postgres)")
+    p_init.add_argument("--encoding", choices=list(POSTGRES_ENCODINGS), default=DEFAULT_POSTGRES_ENCODING,
+                        help="Encoding do banco Postgres (utf8: textos convertidos pelo servidor)")
 
     # db-load
     p_load = db_sub.add_parser("load", help="Carrega dados CSV para o banco")
-    p_load.add_argument("--engine", choices=["sqlite", "postgres"], type=str, default=DEFAULT_ENGINE)
+    p_load.add_argument("--engine", choices=ENGINE_OPTIONS, type=str, default=DEFAULT_ENGINE)
     p_load.add_argument("--db-path", type=str, help="Caminho do SQLite (.db)", default=SQLITE_DB_PATH)
     p_load.add_argument("--db-name", type=str, help="Nome do banco Postgres", default=POSTGRES["database"])
+    p_load.add_argument("--parquet-dir", type=str, help="Diretório do dataset Parquet", default=PARQUET_DIR)
+    p_load.add_argument("--duckdb-path", type=str, help="Caminho do DuckDB (.duckdb)", default=DUCKDB_DB_PATH)
+    p_load.add_argument("--partitioned", action="store_true", default=DEFAULT_PARTITIONED,
+                        help="Particiona estabelecimento e socio (Postgres)")
+    p_load.add_argument("--cnpj-key", action="store_true", default=DEFAULT_CNPJ_KEY,
+                        help="Usa o CNPJ completo (BIGINT) como chave de estabelecimento (SQLite e Postgres)")
+    p_load.add_argument("--compact", action="store_true", default=DEFAULT_COMPACT,
+                        help="Grava códigos e datas como inteiros, com views no formato original (SQLite e Postgres)")
+    p_load.add_argument("--encoding", choices=list(POSTGRES_ENCODINGS), default=DEFAULT_POSTGRES_ENCODING,
+                        help="Encoding do banco Postgres (utf8: textos convertidos pelo servidor)")
     p_load.add_argument("--month", type=str)
     p_load.add_argument("--download-dir", type=str)
+    p_load.add_argument("--base-url", type=str, help="URL base do site usada na validação (ex.: mirror local)")
     p_load.add_argument("--skip-index", action="store_true")
+    p_load.add_argument("--index-profile", choices=INDEX_PROFILES, default=DEFAULT_INDEX_PROFILE,
+                        help="Perfil dos índices criados (none, lookup, analytics, tuned ou full)")
     p_load.add_argument("--skip-validation", action="store_true")
-    p_load.add_argument("--low-memory", action="store_true")
+    p_load.add_argument("--low-memory", action="store_true",
+                        help=f"Limita a memória da carga (equivale a --memory-limit {LOW_MEMORY_LIMIT})")
+    p_load.add_argument("--memory-limit", type=str, help="Limite de memória da carga (ex: 2G, 512M)")
     p_load.add_argument("--parallel", type=str2bool, nargs="?", const=True,
                         default=DEFAULT_PARALLEL, help="Multithread para Postgres (True/False)")
+    p_load.add_argument("--metrics", action="store_true", help="Exporta métricas de cada etapa da carga")
+    p_load.add_argument("--profile", choices=PROFILE_MODES, nargs="?", const="sample",
+                        help="Profiling da carga (padrão: sample)")
+    p_load.add_argument("--adaptive-batch", action="store_true", default=DEFAULT_ADAPTIVE_BATCH,
+                        help="Ajusta o tamanho dos lotes pelo tempo de inserção e pela memória")
+    p_load.add_argument("--cnae-sec-sql", action="store_true", default=DEFAULT_CNAE_SEC_SQL,
+                        help="Gera os CNAEs secundários no banco, após a carga")
+    p_load.add_argument("--staging-tables", action="store_true", default=DEFAULT_STAGING_TABLES,
+                        help="COPY em tabelas de staging por worker (Postgres com carga paralela)")
+    p_load.add_argument("--task-graph", type=str2bool, nargs="?", const=True, default=DEFAULT_TASK_GRAPH,
+                        help="PK e índices de cada tabela assim que a sua carga termina (Postgres; True/False)")
+    p_load.add_argument("--freeze", action="store_true", default=DEFAULT_COPY_FREEZE,
+                        help="COPY FREEZE por tabela e VACUUM (ANALYZE) em paralelo ao final (Postgres)")
+    p_load.add_argument("--publish", choices=PUBLISH_OPTIONS,
+                        help="Publica após a carga: LOGGED/troca de schema (Postgres), troca do arquivo (SQLite)")
+    p_load.add_argument("--vacuum", action="store_true", default=DEFAULT_SQLITE_VACUUM,
+                        help="Compacta o banco com VACUUM INTO ao final da carga (SQLite)")
+    p_load.add_argument("--fulltext", action="store_true", default=DEFAULT_FULLTEXT,
+                        help="Cria índices de busca textual nos nomes (SQLite: FTS5, Postgres: pg_trgm)")
 
     # db-index
     p_index = db_sub.add_parser("index", help="Cria índices no banco")
     p_index.add_argument("--engine", choices=ENGINE_OPTIONS, type=str, default=DEFAULT_ENGINE)
     p_index.add_argument("--db-path", type=str, default=SQLITE_DB_PATH)
     p_index.add_argument("--db-name", type=str, default=POSTGRES["database"])
+    p_index.add_argument("--parquet-dir", type=str, help="Diretório do dataset Parquet", default=PARQUET_DIR)
+    p_index.add_argument("--duckdb-path", type=str, help="Caminho do DuckDB (.duckdb)", default=DUCKDB_DB_PATH)
+    p_index.add_argument("--partitioned", action="store_true", default=DEFAULT_PARTITIONED,
+                        help="Particiona estabelecimento e socio (Postgres)")
+    p_index.add_argument("--cnpj-key", action="store_true", default=DEFAULT_CNPJ_KEY,
+                        help="Usa o CNPJ completo (BIGINT) como chave de estabelecimento (SQLite e Postgres)")
+    p_index.add_argument("--compact", action="store_true", default=DEFAULT_COMPACT,
+                        help="Grava códigos e datas como inteiros, com views no formato original (SQLite e Postgres)")
+    p_index.add_argument("--index-profile", choices=INDEX_PROFILES, default=DEFAULT_INDEX_PROFILE,
+                        help="Perfil dos índices criados (none, lookup, analytics, tuned ou full)")
+    p_index.add_argument("--fulltext", action="store_true", default=DEFAULT_FULLTEXT,
+                        help="Cria índices de busca textual nos nomes (SQLite: FTS5, Postgres: pg_trgm)")
 
     # complete
     p_complete = sub.add_parser("complete", help="Baixa e carrega dados automaticamente")
     p_complete.add_argument("--month", type=str)
     p_complete.add_argument("--download-dir", type=str)
-    p_complete.add_argument("--engine", choices=["sqlite", "postgres"], type=str, default=DEFAULT_ENGINE)
+    p_complete.add_argument("--engine", choices=ENGINE_OPTIONS, type=str, default=DEFAULT_ENGINE)
     p_complete.add_argument("--db-path", type=str, default=SQLITE_DB_PATH)
     p_complete.add_argument("--db-name", type=str, default=POSTGRES["database"])
+    p_complete.add_argument("--parquet-dir", type=str, help="Diretório do dataset Parquet", default=PARQUET_DIR)
+    p_complete.add_argument("--duckdb-path", type=str, help="Caminho do DuckDB (.duckdb)", default=DUCKDB_DB_PATH)
+    p_complete.add_argument("--partitioned", action="store_true", default=DEFAULT_PARTITIONED,
+                        help="Particiona estabelecimento e socio (Postgres)")
+    p_complete.add_argument("--cnpj-key", action="store_true", default=DEFAULT_CNPJ_KEY,
+                        help="Usa o CNPJ completo (BIGINT) como chave de estabelecimento (SQLite e Postgres)")
+    p_complete.add_argument("--compact", action="store_true", default=DEFAULT_COMPACT,
+                        help="Grava códigos e datas como inteiros, com views no formato original (SQLite e Postgres)")
+    p_complete.add_argument("--encoding", choices=list(POSTGRES_ENCODINGS), default=DEFAULT_POSTGRES_ENCODING,
+                            help="Encoding do banco Postgres (utf8: textos convertidos pelo servidor)")
     p_complete.add_argument("--skip-index", action="store_true")
+    p_complete.add_argument("--index-profile", choices=INDEX_PROFILES, default=DEFAULT_INDEX_PROFILE,
+                        help="Perfil dos índices criados (none, lookup, analytics, tuned ou full)")
     p_complete.add_argument("--skip-validation", action="store_true")
-    p_complete.add_argument("--low-memory", action="store_true")
+    p_complete.add_argument("--low-memory", action="store_true",
+                        help=f"Limita a memória da carga (equivale a --memory-limit {LOW_MEMORY_LIMIT})")
+    p_complete.add_argument("--memory-limit", type=str, help="Limite de memória da carga (ex: 2G, 512M)")
     p_complete.add_argument("--parallel", action="store_true")
+    p_complete.add_argument("--metrics", action="store_true", help="Exporta métricas de cada etapa da carga")
+    p_complete.add_argument("--profile", choices=PROFILE_MODES, nargs="?", const="sample",
+                        help="Profiling da carga (padrão: sample)")
+    p_complete.add_argument("--adaptive-batch", action="store_true", default=DEFAULT_ADAPTIVE_BATCH,
+                        help="Ajusta o tamanho dos lotes pelo tempo de inserção e pela memória")
+    p_complete.add_argument("--cnae-sec-sql", action="store_true", default=DEFAULT_CNAE_SEC_SQL,
+                        help="Gera os CNAEs secundários no banco, após a carga")
+    p_complete.add_argument("--staging-tables", action="store_true", default=DEFAULT_STAGING_TABLES,
+                        help="COPY em tabelas de staging por worker (Postgres com carga paralela)")
+    p_complete.add_argument("--task-graph", type=str2bool, nargs="?", const=True, default=DEFAULT_TASK_GRAPH,
+                            help="PK e índices de cada tabela assim que a sua carga termina (Postgres; True/False)")
+    p_complete.add_argument("--freeze", action="store_true", default=DEFAULT_COPY_FREEZE,
+                            help="COPY FREEZE por tabela e VACUUM (ANALYZE) em paralelo ao final (Postgres)")
+    p_complete.add_argument("--publish", choices=PUBLISH_OPTIONS,
+                        help="Publica após a carga: LOGGED/troca de schema (Postgres), troca do arquivo (SQLite)")
+    p_complete.add_argument("--vacuum", action="store_true", default=DEFAULT_SQLITE_VACUUM,
+                        help="Compacta o banco com VACUUM INTO ao final da carga (SQLite)")
+    p_complete.add_argument("--fulltext", action="store_true", default=DEFAULT_FULLTEXT,
+                        help="Cria índices de busca textual nos nomes (SQLite: FTS5, Postgres: pg_trgm)")
     p_complete.add_argument("--clean", action="store_true")
     p_complete.add_argument("--workers", type=int)
+    p_complete.add_argument("--store", action="store_true", default=DEFAULT_DOWNLOAD_STORE,
+                            help="Reaproveita (hardlink) os arquivos inalterados de meses anteriores")
+    p_complete.add_argument("--base-url", type=str, help="URL base do site (ex.: mirror local)")
 
     args = parser.parse_args()
 
     try:
         if args.command == "get-availables":
-            data = CNPJDataScraper()
+            data = CNPJDataScraper(args.base_url)
             print_log(data.get_availabes(), level="docs", time=False)
 
         elif args.command == "get-latest":
-            data = CNPJDataScraper()
+            data = CNPJDataScraper(args.base_url)
             print_log(data.get_latest(), level="docs", time=False)
 
         elif args.command == "get-urls":
-            data = CNPJDataScraper()
+            data = CNPJDataScraper(args.base_url)
             urls = data.get_metadata(month_year=args.month)
             for info in urls.values():
                 print_log(info["file_url"], level="web", time=False)
@@ -105,21 +223,61 @@ def main() -> None:
                 concurrents=args.workers,
                 clean=args.clean,
                 download_dir=args.download_dir,
+                store=args.store,
+                base_url=args.base_url,
             )
             dm.start_download_queue()
 
+        elif args.command == "mirror":
+            server = MirrorServer(
+                root_dir=args.dir,
+                host=args.host,
+                port=args.port,
+                bandwidth=parse_size(args.bandwidth) if args.bandwidth else None,
+                stall_rate=args.stall_rate,
+                fault_rate=args.fault_rate,
+                seed=args.seed,
+            )
+            print_log(f"MIRROR LOCAL EM {server.url} ({server.root_dir}). CTRL+C PARA ENCERRAR", level="web")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                server.server_close()
+            print_log("MIRROR ENCERRADO", level="done")
+
         elif args.command == "db":
             run_orchestrator(
                 command=args.db_command,
                 engine=args.engine,
                 db_path=args.db_path,
                 db_name=args.db_name,
+                parquet_dir=args.parquet_dir,
+                duckdb_path=args.duckdb_path,
                 month_year=getattr(args, "month", None),
                 files_dir=getattr(args, "download_dir", None),
                 skip_indexes=getattr(args, "skip_index", False),
                 skip_validation=getattr(args, "skip_validation", False),
                 low_memory=getattr(args, "low_memory", DEFAULT_LOW_MEMORY),
-                parallel=args.parallel
+                memory_limit=getattr(args, "memory_limit", None),
+                parallel=getattr(args, "parallel", DEFAULT_PARALLEL),
+                metrics=getattr(args, "metrics", False),
+                profile=getattr(args, "profile", None),
+                adaptive_batch=getattr(args, "adaptive_batch", DEFAULT_ADAPTIVE_BATCH),
+                cnae_sec_sql=getattr(args, "cnae_sec_sql", DEFAULT_CNAE_SEC_SQL),
+                staging_tables=getattr(args, "staging_tables", DEFAULT_STAGING_TABLES),
+                partitioned=getattr(args, "partitioned", DEFAULT_PARTITIONED),
+                publish=getattr(args, "publish", None),
+                vacuum=getattr(args, "vacuum", DEFAULT_SQLITE_VACUUM),
+                fulltext=getattr(args, "fulltext", DEFAULT_FULLTEXT),
+                cnpj_key=getattr(args, "cnpj_key", DEFAULT_CNPJ_KEY),
+                compact=getattr(args, "compact", DEFAULT_COMPACT),
+                index_profile=getattr(args, "index_profile", DEFAULT_INDEX_PROFILE),
+                task_graph=getattr(args, "task_graph", DEFAULT_TASK_GRAPH),
+                freeze=getattr(args, "freeze", DEFAULT_COPY_FREEZE),
+                encoding=getattr(args, "encoding", DEFAULT_POSTGRES_ENCODING),
+                base_url=getattr(args, "base_url", None)
             )
 
         elif args.command == "complete":
@@ -128,6 +286,8 @@ def main() -> None:
                 concurrents=args.workers,
                 clean=args.clean,
                 download_dir=args.download_dir,
+                store=args.store,
+                base_url=args.base_url,
             )
             dm.start_download_queue()
 
@@ -136,12 +296,31 @@ def main() -> None:
                 engine=args.engine,
                 db_path=args.db_path,
                 db_name=args.db_name,
+                parquet_dir=args.parquet_dir,
+                duckdb_path=args.duckdb_path,
                 month_year=getattr(args, "month", None),
                 files_dir=getattr(args, "download_dir", None),
                 skip_indexes=getattr(args, "skip_indexes", False),
                 skip_validation=getattr(args, "skip_validation", False),
                 low_memory=getattr(args, "low_memory", DEFAULT_LOW_MEMORY),
-                parallel=args.parallel
+                memory_limit=getattr(args, "memory_limit", None),
+                parallel=getattr(args, "parallel", DEFAULT_PARALLEL),
+                metrics=getattr(args, "metrics", False),
+                profile=getattr(args, "profile", None),
+                adaptive_batch=getattr(args, "adaptive_batch", DEFAULT_ADAPTIVE_BATCH),
+                cnae_sec_sql=getattr(args, "cnae_sec_sql", DEFAULT_CNAE_SEC_SQL),
+                staging_tables=getattr(args, "staging_tables", DEFAULT_STAGING_TABLES),
+                partitioned=getattr(args, "partitioned", DEFAULT_PARTITIONED),
+                publish=getattr(args, "publish", None),
+                vacuum=getattr(args, "vacuum", DEFAULT_SQLITE_VACUUM),
+                fulltext=getattr(args, "fulltext", DEFAULT_FULLTEXT),
+                cnpj_key=getattr(args, "cnpj_key", DEFAULT_CNPJ_KEY),
+                compact=getattr(args, "compact", DEFAULT_COMPACT),
+                index_profile=getattr(args, "index_profile", DEFAULT_INDEX_PROFILE),
+                task_graph=getattr(args, "task_graph", DEFAULT_TASK_GRAPH),
+                freeze=getattr(args, "freeze", DEFAULT_COPY_FREEZE),
+                encoding=getattr(args, "encoding", DEFAULT_POSTGRES_ENCODING),
+                base_url=getattr(args, "base_url", None)
             )
 
     except ValueError as e:
@@ -5,32 +5,96 @@ Orquestração da carga de dados
 """
 
 import os
+from functools import partial
 from typing import Optional
 from .cnpj_data import CNPJDataScraper
-from .db import SQLiteBuilder, run_sqlite_loader, PostgresBuilder, run_postgres_loader
+from .db.schema import SCHEMA, configure_schema
+from .db import (
+    SQLiteBuilder, run_sqlite_loader, PostgresBuilder, run_postgres_loader, ParquetBuilder, run_parquet_loader,
+    DuckDBBuilder, run_duckdb_loader
+)
+from .utils.db_batch_producer import BatchSizeController
 from .utils.logger import print_log
+from .utils.memory import MemoryBudget, parse_size
+from .utils.metrics import LoadMetrics
+from .utils.profiler import LoadProfiler
+from .utils.task_graph import TaskGraph
 from .utils.zip_metadata import validate_zip_files, estimate_total_lines_from_size
 from .config import (
+    ADAPTIVE_BATCH_MIN_SIZE,
+    DEFAULT_ADAPTIVE_BATCH,
+    DEFAULT_CNAE_SEC_SQL,
+    DEFAULT_STAGING_TABLES,
+    DEFAULT_PARTITIONED,
+    DEFAULT_SQLITE_VACUUM,
+    DEFAULT_FULLTEXT,
+    DEFAULT_CNPJ_KEY,
+    DEFAULT_COMPACT,
+    DEFAULT_INDEX_PROFILE,
+    INDEX_PROFILES,
+    DEFAULT_TASK_GRAPH,
+    DEFAULT_COPY_FREEZE,
+    DEFAULT_POSTGRES_ENCODING,
+    POSTGRES_ENCODINGS,
+    POSTGRES_TABLE_TASK_THREADS,
     DEFAULT_ENGINE,
     DEFAULT_PARALLEL,
     DEFAULT_LOW_MEMORY,
+    LOW_MEMORY_LIMIT,
     DOWNLOAD_DIR,
     SQLITE_DB_PATH,
+    PARQUET_DIR,
+    DUCKDB_DB_PATH,
     POSTGRES
 )
 
 
+def _table_task_graph(builder: PostgresBuilder, cnae_sec_sql: bool, indexes: bool) -> TaskGraph:
+    """
+    Task graph da carga no Postgres: as correções, a PK e os índices de cada tabela (`prepare_table`) começam assim
+    que o último lote da tabela é gravado (evento `load:<tabela>`). Com --cnae-sec-sql, `estabelecimento_cnae_sec`
+    é gerada assim que a carga de `estabelecimento` termina.
+    """
+    print_log("TASK GRAPH: CORREÇÕES, PKs E ÍNDICES DE CADA TABELA ASSIM QUE A SUA CARGA TERMINAR", level="docs")
+    graph = TaskGraph(max_workers=POSTGRES_TABLE_TASK_THREADS)
+    for table_name in SCHEMA:
+        if cnae_sec_sql and table_name == "estabelecimento_cnae_sec":
+            graph.add(f"load:{table_name}", builder.build_cnae_sec, after=["load:estabelecimento"])
+        graph.add(f"prepare:{table_name}", partial(builder.prepare_table, table_name, indexes=indexes),
+                  after=[f"load:{table_name}"])
+    return graph
+
+
 def run_orchestrator(
         command: Optional[str] = "load",
         engine: Optional[str] = DEFAULT_ENGINE,
         db_path: Optional[str] = SQLITE_DB_PATH,
         db_name: Optional[str] = POSTGRES["database"],
+        parquet_dir: Optional[str] = PARQUET_DIR,
+        duckdb_path: Optional[str] = DUCKDB_DB_PATH,
         month_year: Optional[str] = None,
         files_dir: Optional[str] = None,
         skip_indexes: bool = False,
         skip_validation: bool = False,
         parallel: bool = DEFAULT_PARALLEL,
-        low_memory: bool = DEFAULT_LOW_MEMORY
+        low_memory: bool = DEFAULT_LOW_MEMORY,
+        memory_limit: Optional[str] = None,
+        metrics: bool = False,
+        profile: Optional[str] = None,
+        adaptive_batch: bool = DEFAULT_ADAPTIVE_BATCH,
+        cnae_sec_sql: bool = DEFAULT_CNAE_SEC_SQL,
+        staging_tables: bool = DEFAULT_STAGING_TABLES,
+        partitioned: bool = DEFAULT_PARTITIONED,
+        publish: Optional[str] = None,
+        vacuum: bool = DEFAULT_SQLITE_VACUUM,
+        fulltext: bool = DEFAULT_FULLTEXT,
+        cnpj_key: bool = DEFAULT_CNPJ_KEY,
+        compact: bool = DEFAULT_COMPACT,
+        index_profile: str = DEFAULT_INDEX_PROFILE,
+        task_graph: bool = DEFAULT_TASK_GRAPH,
+        freeze: bool = DEFAULT_COPY_FREEZE,
+        encoding: str = DEFAULT_POSTGRES_ENCODING,
+        base_url: Optional[str] = None
 ):
     """
     Orquestração da carga no banco de dados.
@@ -40,21 +104,57 @@ def run_orchestrator(
         engine: engine do banco de dados ("sqlite" ou "postgres").
         db_path: caminho para o banco de dados SQLite.
         db_name: nome do banco de dados Postgres.
+        parquet_dir: diretório do dataset Parquet.
+        duckdb_path: caminho para o banco de dados DuckDB.
         month_year: mês e ano a ser carregado ("MM/AAAA").
         files_dir: diretório com os arquivos CSV.
         skip_indexes: se deve pular a criação de índices.
         skip_validation: se deve pular a validação dos arquivos.
         parallel: se deve usar threads para processamento.
-        low_memory: se deve usar baixa memória para processamento.
+        low_memory: se deve usar baixa memória para processamento (equivale a memory_limit=LOW_MEMORY_LIMIT).
+        memory_limit: limite de memória da carga ("2G", "512M"...). None não limita.
+        metrics: se deve registrar e exportar as métricas de cada etapa da carga.
+        profile: modo de profiling da carga ("cprofile" ou "sample"). None desativa.
+        adaptive_batch: se deve ajustar o tamanho dos lotes em tempo de execução.
+        cnae_sec_sql: se deve gerar `estabelecimento_cnae_sec` no banco, após a carga (no DuckDB, sempre).
+        staging_tables: se deve fazer o COPY em tabelas de staging por worker (Postgres com carga paralela).
+        partitioned: se deve particionar as tabelas com `partition_by` no SCHEMA (Postgres).
+        publish: modo de publicação após a carga ("logged"/"swap" no Postgres, "swap" no SQLite). None não publica.
+        vacuum: se deve compactar o banco com VACUUM INTO ao final da carga (SQLite; sempre com --publish swap).
+        fulltext: se deve criar os índices de busca textual dos nomes (SQLite: FTS5, Postgres: pg_trgm).
+        cnpj_key: se deve usar o CNPJ de 14 dígitos (BIGINT) como chave de estabelecimento (SQLite e Postgres).
+        compact: se deve gravar os códigos (e, no SQLite, as datas) como inteiros, com views no formato original.
+        index_profile: perfil dos índices criados em load e index ("none", "lookup", "analytics", "tuned" ou "full").
+        task_graph: se deve preparar cada tabela (correções, PK e índices) assim que a sua carga termina (Postgres).
+        freeze: se deve carregar cada tabela com COPY FREEZE e executar o VACUUM (ANALYZE) ao final (Postgres).
+        encoding: encoding do banco Postgres ("win1252" ou "utf8", com os textos convertidos pelo servidor).
+        base_url: URL base do site usada na validação dos arquivos (ex.: mirror local). None usa CNPJ_DATA_URL.
     """
     print_log("INICIANDO TAREFAS DO BANCO DE DADOS...", level="start")
 
+    if cnpj_key and engine not in ("sqlite", "postgres"):
+        raise ValueError(f"CHAVE NUMÉRICA DO CNPJ (--cnpj-key) NÃO SUPORTADA NA ENGINE: {engine}")
+    if compact and engine not in ("sqlite", "postgres"):
+        raise ValueError(f"PERFIL COMPACTO (--compact) NÃO SUPORTADO NA ENGINE: {engine}")
+    if freeze and engine != "postgres":
+        raise ValueError(f"COPY FREEZE (--freeze) NÃO SUPORTADO NA ENGINE: {engine}")
+    if freeze and (partitioned or staging_tables):
+        raise ValueError("COPY FREEZE (--freeze) NÃO SUPORTADO COM --partitioned OU --staging-tables")
+    if encoding not in POSTGRES_ENCODINGS:
+        raise ValueError(f"ENCODING INVÁLIDO: {encoding} (OPÇÕES: {', '.join(POSTGRES_ENCODINGS)})")
+    if encoding != DEFAULT_POSTGRES_ENCODING and engine != "postgres":
+        raise ValueError(f"ENCODING (--encoding {encoding}) NÃO SUPORTADO NA ENGINE: {engine}")
+    if index_profile not in INDEX_PROFILES:
+        raise ValueError(f"PERFIL DE ÍNDICES INVÁLIDO: {index_profile} (OPÇÕES: {', '.join(INDEX_PROFILES)})")
+    configure_schema(cnpj_key=cnpj_key, compact=compact, engine=engine, index_profile=index_profile)
+
     estimated_lines = None
     postgres_config = None
+    graph = None
 
     # se for comando de carga, preparar diretórios e arquivos
     if command == "load":
-        data = CNPJDataScraper()
+        data = CNPJDataScraper(base_url)
 
         if month_year is None:
             month_year = data.get_latest()
@@ -65,7 +165,7 @@ def run_orchestrator(
             files_dir = os.path.join(DOWNLOAD_DIR, folder)
 
         # validar dos arquivos na pasta
-        if not skip_validation and not validate_zip_files(month_year, files_dir):
+        if not skip_validation and not validate_zip_files(month_year, files_dir, base_url):
             print_log("EXECUÇÃO INTERROMPIDA. VERIFIQUE OS ARQUIVOS NO DIRETÓRIO LOCAL.", level="error")
             raise
 
@@ -74,51 +174,161 @@ def run_orchestrator(
 
     # instanciar o builder adequado
     if engine == "sqlite":
-        builder = SQLiteBuilder(db_path=db_path)
+        builder = SQLiteBuilder(db_path=db_path, publish=publish if command == "load" else None)
+        db_path = builder.db_path
 
     elif engine == "postgres":
         postgres_config = POSTGRES.copy()
         if db_name and db_name != POSTGRES["database"]:
             postgres_config["database"] = db_name
-        builder = PostgresBuilder(config=postgres_config)
+        builder = PostgresBuilder(config=postgres_config, partitioned=partitioned,
+                                  publish=publish if command == "load" else None, encoding=encoding)
+        postgres_config = builder.config
+
+    elif engine == "parquet":
+        builder = ParquetBuilder(output_dir=parquet_dir)
+
+    elif engine == "duckdb":
+        builder = DuckDBBuilder(db_path=duckdb_path)
 
     else:
         raise ValueError(f"ENGINE NÃO SUPORTADA: {engine}")
 
+    if publish and not (engine == "postgres" or (engine == "sqlite" and publish == "swap")):
+        raise ValueError(f"PUBLICAÇÃO (--publish {publish}) NÃO SUPORTADA NA ENGINE: {engine}")
+
+    if fulltext and engine not in ("sqlite", "postgres"):
+        raise ValueError(f"BUSCA TEXTUAL (--fulltext) NÃO SUPORTADA NA ENGINE: {engine}")
+
     # inicializa o script_sql se for init ou load
     if command in ("init", "load"):
         builder.initialize_schema()
 
     # carrega os dados (somente no comando load)
     if command == "load":
-        if engine == "sqlite":
-            run_sqlite_loader(
-                files_dir=files_dir,
-                db_path=db_path,
-                total_records=estimated_lines,
-                low_memory=low_memory
-            )
-        elif engine == "postgres":
-
-            run_postgres_loader(
-                files_dir=files_dir,
-                postgres_config=postgres_config,
-                total_records=estimated_lines,
-                parallel=parallel,
-                low_memory=low_memory
-            )
-        else:
-            raise ValueError(f"ENGINE NÃO SUPORTADA: {engine}")
-
-    if command == 'load':
+        load_metrics = LoadMetrics() if metrics else None
+        if load_metrics:
+            load_metrics.start()
+
+        profiler = LoadProfiler(mode=profile) if profile else None
+        if profiler:
+            profiler.start()
+
+        if low_memory and not memory_limit:
+            memory_limit = LOW_MEMORY_LIMIT
+        memory_budget = MemoryBudget(parse_size(memory_limit), engine) if memory_limit else None
+        if memory_budget:
+            memory_budget.log_summary()
+
+        batch_controller = None
+        if adaptive_batch and memory_budget:
+            batch_controller = BatchSizeController(memory_limit=memory_budget.limit,
+                                                   min_size=min(memory_budget.batch_size, ADAPTIVE_BATCH_MIN_SIZE),
+                                                   max_size=memory_budget.batch_size)
+        elif adaptive_batch:
+            batch_controller = BatchSizeController()
+
+        # tabelas geradas no banco após a carga, em vez de no produtor
+        cnae_sec_sql = cnae_sec_sql or engine == "duckdb"
+        skip_tables = {"estabelecimento_cnae_sec"} if cnae_sec_sql else None
+
+        if engine == "postgres" and task_graph:
+            graph = _table_task_graph(builder, cnae_sec_sql=cnae_sec_sql, indexes=not skip_indexes)
+
+        loaded = False  # se a carga (e as tarefas do task graph) terminou sem erros
+        try:
+            if engine == "sqlite":
+                run_sqlite_loader(
+                    files_dir=files_dir,
+                    db_path=db_path,
+                    total_records=estimated_lines,
+                    memory_budget=memory_budget,
+                    metrics=load_metrics,
+                    profiler=profiler,
+                    batch_controller=batch_controller,
+                    skip_tables=skip_tables,
+                    journal_mode=builder.journal_mode
+                )
+            elif engine == "postgres":
+
+                run_postgres_loader(
+                    files_dir=files_dir,
+                    postgres_config=postgres_config,
+                    total_records=estimated_lines,
+                    parallel=parallel,
+                    memory_budget=memory_budget,
+                    metrics=load_metrics,
+                    profiler=profiler,
+                    batch_controller=batch_controller,
+                    skip_tables=skip_tables,
+                    staging=staging_tables,
+                    on_table_loaded=(lambda table_name: graph.complete(f"load:{table_name}")) if graph else None,
+                    freeze=freeze,
+                    encoding=encoding
+                )
+            elif engine == "parquet":
+                run_parquet_loader(
+                    files_dir=files_dir,
+                    builder=builder,
+                    total_records=estimated_lines,
+                    parallel=parallel,
+                    memory_budget=memory_budget,
+                    metrics=load_metrics,
+                    profiler=profiler,
+                    batch_controller=batch_controller,
+                    skip_tables=skip_tables
+                )
+            elif engine == "duckdb":
+                run_duckdb_loader(
+                    files_dir=files_dir,
+                    builder=builder,
+                    total_records=estimated_lines,
+                    memory_budget=memory_budget,
+                    metrics=load_metrics
+                )
+            else:
+                raise ValueError(f"ENGINE NÃO SUPORTADA: {engine}")
+
+            if graph:
+                graph.wait()
+            elif cnae_sec_sql:
+                builder.build_cnae_sec()
+            loaded = True
+        finally:
+            # carga interrompida: as tabelas restantes não são preparadas (correções, PK e índices)
+            if graph and not loaded:
+                graph.cancel()
+            if profiler:
+                profiler.stop()
+            if load_metrics:
+                load_metrics.stop()
+
+    # com o task graph, as correções, PKs e índices já foram feitos tabela a tabela, durante a carga
+    if command == 'load' and graph is None:
         builder.patch_data()
 
     # cria os índices (em load ou index, exceto se skip=true)
-    if command == "index" or (command == "load" and not skip_indexes):
+    if command == "index" or (command == "load" and not skip_indexes and graph is None):
         builder.create_indexes()
 
     # ativa FKs apenas se for carga
     if command == "load":
         builder.enable_foreign_keys()
 
+    # estatísticas e compactação do SQLite (somente no comando load)
+    if command == "load" and engine == "sqlite":
+        builder.finalize(vacuum=vacuum or publish == "swap")
+
+    # índices de busca textual (em load ou index, com --fulltext; no SQLite, após o VACUUM da finalização)
+    if fulltext and (command == "index" or (command == "load" and not skip_indexes)):
+        builder.create_fulltext()
+
+    # publica as tabelas (somente no comando load)
+    if command == "load" and publish:
+        builder.publish()
+
+    # VACUUM (ANALYZE) após o COPY FREEZE; com a publicação, congela de novo as linhas reescritas pelo SET LOGGED
+    if command == "load" and freeze:
+        builder.vacuum_analyze(freeze=publish is not None)
+
     print_log(f"EXECUÇÃO FINALIZADA | {engine.upper()} | {month_year}", level="done")
@@ -0,0 +1,40 @@
+# utils/cnpj_key.py
+
+"""
+Chave numérica do CNPJ (`--cnpj-key`): os 14 dígitos como inteiro de 64 bits, com validação dos dígitos verificadores.
+"""
+
+from typing import Optional, Tuple
+
+DV_WEIGHTS_1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+DV_WEIGHTS_2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+
+class AlphanumericCnpjError(ValueError):
+    """CNPJ não numérico (alfanumérico) na carga com `--cnpj-key`: a chave não cabe em um inteiro de 64 bits."""
+
+
+def _check_digit(digits: str, weights: Tuple[int, ...]) -> int:
+    rest = sum(int(d) * w for d, w in zip(digits, weights)) % 11
+    return 0 if rest < 2 else 11 - rest
+
+
+def check_digits(base: str) -> str:
+    """Dígitos verificadores dos 12 primeiros dígitos do CNPJ (básico + ordem)."""
+    dv1 = _check_digit(base, DV_WEIGHTS_1)
+    dv2 = _check_digit(f"{base}{dv1}", DV_WEIGHTS_2)
+    return f"{dv1}{dv2}"
+
+
+def cnpj_key(cnpj_basico: str, cnpj_ordem: str, cnpj_dv: str) -> Tuple[Optional[int], bool]:
+    """
+    Calcula a chave numérica do CNPJ.
+
+    :returns: (chave, dígitos verificadores válidos). A chave é None se o CNPJ não for numérico (ex.: CNPJ
+        alfanumérico), pois não cabe em um inteiro de 64 bits.
+    """
+    base = f"{cnpj_basico.strip():0>8}{cnpj_ordem.strip():0>4}"
+    dv = f"{cnpj_dv.strip():0>2}"
+    if len(base) != 12 or len(dv) != 2 or not (base + dv).isascii() or not (base + dv).isdigit():
+        return None, False
+    return int(base + dv), check_digits(base) == dv
@@ -0,0 +1,219 @@
+# utils/compact_batch.py
+
+"""
+Representação compacta dos lotes de dados.
+
+Cada linha do lote termina como uma tupla, montada em uma única passada (sanitização + conversões), e os valores de
+colunas de baixa cardinalidade (UF, códigos, datas) são compartilhados entre as linhas por meio de pools: em vez de
+milhões de objetos `str` iguais ("SP", "0001", "02"...), o lote guarda referências para a mesma instância.
+
+No perfil `--compact`, as colunas de `compact_columns` do SCHEMA são convertidas para inteiros na mesma passada; um
+valor que não cabe no tipo inteiro (ex.: CNPJ alfanumérico) interrompe a carga com `CompactValueError`.
+"""
+
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from ..config import COMPACT_POOL_MAX_SIZE
+from ..db.schema import SCHEMA, UF_CODES
+
+# colunas de baixa cardinalidade, cujos valores são compartilhados entre as linhas
+POOLED_COLUMNS = {
+    "matriz_filial", "cnpj_ordem", "cod_situacao_cadastral", "cod_motivo_situacao_cadastral", "cod_pais",
+    "cod_cnae_principal", "cod_cnae", "tipo_logradouro", "uf", "cod_municipio", "ddd_telefone_1", "ddd_telefone_2",
+    "ddd_fax", "situacao_especial", "cod_natureza_juridica", "cod_qualificacao_responsavel", "cod_porte",
+    "opcao_simples", "opcao_mei", "identificador_socio", "cod_qualificacao_socio",
+    "cod_qualificacao_representante_legal", "cod_faixa_etaria",
+}
+
+# colunas convertidas em cada tabela
+DATE_COLUMNS = {
+    "estabelecimento": ["data_situacao_cadastral", "data_inicio_atividade", "data_situacao_especial"],
+    "simples": ["data_opcao_simples", "data_exclusao_simples", "data_opcao_mei", "data_exclusao_mei"],
+    "socio": ["data_entrada_sociedade"],
+}
+NUMERIC_BR_COLUMNS = {
+    "empresa": ["capital_social"],
+}
+
+
+def parse_date_value(val: Any) -> Any:
+    """Converte uma data no formato 'YYYYMMDD' para `date` (datas vazias ou inválidas viram None)."""
+    if isinstance(val, str):
+        val = val.strip()
+        if val in ("00000000", "", " ", "0"):
+            return None
+        if len(val) == 8 and val.isdigit():
+            try:
+                return datetime.strptime(val, "%Y%m%d").date()
+            except ValueError:
+                return None
+    return val
+
+
+def parse_date_int_value(val: Any) -> Optional[int]:
+    """Converte uma data no formato 'YYYYMMDD' para o inteiro YYYYMMDD (datas vazias ou inválidas viram None)."""
+    val = parse_date_value(val)
+    return val.year * 10000 + val.month * 100 + val.day if isinstance(val, date) else None
+
+
+INVALID = object()  # valor que não cabe no tipo inteiro do perfil compacto
+
+
+class CompactValueError(ValueError):
+    """Valor não numérico em uma coluna convertida para inteiro no perfil `--compact` (ex.: CNPJ alfanumérico)."""
+
+
+def parse_int_value(val: Any) -> Any:
+    """Converte um código numérico para inteiro ('0001' → 1). Vazio vira None; valores não numéricos, INVALID."""
+    if isinstance(val, str):
+        val = val.strip()
+        if not val:
+            return None
+        return int(val) if val.isascii() and val.isdigit() else INVALID
+    return val
+
+
+def parse_uf_value(val: Any) -> Any:
+    """Converte a UF para o código do IBGE (UF_CODES). Vazio vira None; UFs desconhecidas, INVALID."""
+    if isinstance(val, str):
+        val = val.strip().upper()
+        return UF_CODES.get(val, INVALID) if val else None
+    return val
+
+
+def parse_numeric_br_value(val: Any) -> Any:
+    """Normaliza um valor numérico do formato brasileiro (1.234,56 → 1234.56)."""
+    if isinstance(val, str) and "," in val and val.replace(",", "").replace(".", "").isdigit():
+        return val.replace(".", "").replace(",", ".")
+    return val
+
+
+class ValuePool:
+    """
+    Mantém uma única instância de cada valor, opcionalmente convertido por `converter`.
+
+    Ao atingir `max_size` valores distintos, o pool deixa de crescer e os novos valores passam a ser apenas
+    convertidos, sem compartilhamento (a coluna não era de baixa cardinalidade).
+
+    :params:
+        converter: função aplicada ao valor antes de guardá-lo (ex.: conversão de datas).
+        max_size: quantidade máxima de valores distintos no pool.
+    """
+
+    def __init__(self, converter: Optional[Callable[[Any], Any]] = None, max_size: int = COMPACT_POOL_MAX_SIZE):
+        self.converter = converter
+        self.max_size = max_size
+        self._values: Dict[Any, Any] = {}
+
+    def get(self, value: Any) -> Any:
+        try:
+            return self._values[value]
+        except KeyError:
+            shared = self.converter(value) if self.converter else value
+            if len(self._values) < self.max_size:
+                self._values[value] = shared
+            return shared
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+# pools compartilhados entre todos os produtores (o acesso ao dict é atômico sob o GIL)
+CODE_POOL = ValuePool()
+DATE_POOL = ValuePool(converter=parse_date_value)
+INT_POOL = ValuePool(converter=parse_int_value)
+UF_POOL = ValuePool(converter=parse_uf_value)
+DATE_INT_POOL = ValuePool(converter=parse_date_int_value)
+
+
+class RowCompactor:
+    """
+    Transforma as linhas de um lote de uma tabela em tuplas compactas, em uma única passada por linha.
+
+    :params:
+        table: nome da tabela.
+        columns: colunas da tabela, na ordem das linhas.
+        row_sanitizer: função que recebe a linha lida do CSV e retorna uma lista com os valores sanitizados.
+    """
+
+    def __init__(self, table: str, columns: List[str], row_sanitizer: Callable[[List[Any]], List[Any]]):
+        self.table = table
+        self.columns = columns
+        self.row_sanitizer = row_sanitizer
+        date_columns = DATE_COLUMNS.get(table, [])
+        numeric_columns = NUMERIC_BR_COLUMNS.get(table, [])
+
+        # perfil --compact: (índice, conversor) das colunas convertidas para inteiro
+        compact_columns = SCHEMA.get(table, {}).get('compact_columns', {})
+        self.int_converters: List[Tuple[int, Callable[[Any], Any]]] = []
+        for i, col in enumerate(columns):
+            kind = compact_columns.get(col)
+            if kind == 'uf':
+                self.int_converters.append((i, UF_POOL.get))
+            elif kind == 'date':
+                self.int_converters.append((i, DATE_INT_POOL.get))
+            elif kind is not None:
+                self.int_converters.append((i, INT_POOL.get if col in POOLED_COLUMNS else parse_int_value))
+        converted = {i for i, _ in self.int_converters}
+
+        self.pooled_idx = [i for i, col in enumerate(columns) if col in POOLED_COLUMNS and i not in converted]
+        self.date_idx = [i for i, col in enumerate(columns) if col in date_columns and i not in converted]
+        self.numeric_idx = [i for i, col in enumerate(columns) if col in numeric_columns]
+
+    def compact(self, rows: List[Any]) -> List[tuple]:
+        """Substitui cada linha do lote pela sua tupla compacta e retorna o próprio lote."""
+        if self.int_converters:
+            return self._compact_int(rows)
+
+        sanitize = self.row_sanitizer
+        code_pool = CODE_POOL.get
+        date_pool = DATE_POOL.get
+        pooled_idx, date_idx, numeric_idx = self.pooled_idx, self.date_idx, self.numeric_idx
+
+        for idx, row in enumerate(rows):
+            values = sanitize(row)
+            for i in pooled_idx:
+                values[i] = code_pool(values[i])
+            for i in date_idx:
+                values[i] = date_pool(values[i])
+            for i in numeric_idx:
+                values[i] = parse_numeric_br_value(values[i])
+            rows[idx] = tuple(values)
+        return rows
+
+    def _compact_int(self, rows: List[Any]) -> List[tuple]:
+        """`compact` com as conversões do perfil --compact; um valor INVALID levanta `CompactValueError`."""
+        sanitize = self.row_sanitizer
+        code_pool = CODE_POOL.get
+        date_pool = DATE_POOL.get
+        pooled_idx, date_idx, numeric_idx = self.pooled_idx, self.date_idx, self.numeric_idx
+        int_converters = self.int_converters
+
+        for idx, row in enumerate(rows):
+            values = sanitize(row)
+            for i, convert in int_converters:
+                value = convert(values[i])
+                if value is INVALID:
+                    raise CompactValueError(f"VALOR NÃO NUMÉRICO EM {self.table.upper()}.{self.columns[i]} "
+                                            f"({values[i]!r}) NÃO SUPORTADO COM --compact")
+                values[i] = value
+            for i in pooled_idx:
+                values[i] = code_pool(values[i])
+            for i in date_idx:
+                values[i] = date_pool(values[i])
+            for i in numeric_idx:
+                values[i] = parse_numeric_br_value(values[i])
+            rows[idx] = tuple(values)
+        return rows
+
+
+_compactors: Dict[Tuple[str, Callable, tuple], RowCompactor] = {}
+
+
+def get_row_compactor(table: str, columns: List[str], row_sanitizer: Callable) -> RowCompactor:
+    """Retorna o RowCompactor da tabela (criado uma única vez por tabela, sanitizador e perfil do SCHEMA)."""
+    key = (table, row_sanitizer, tuple(SCHEMA.get(table, {}).get('columns', ())))
+    compactor = _compactors.get(key)
+    if compactor is None:
+        compactor = _compactors.setdefault(key, RowCompactor(table, columns, row_sanitizer))
+    return compactor
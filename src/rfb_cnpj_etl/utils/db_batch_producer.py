@@ -1,18 +1,108 @@
 # utils/db_batch_producer.py
 
-import gc
 from queue import Queue
 from pathlib import Path
 import zipfile
 import csv
 import time
 from io import TextIOWrapper
-from typing import Optional, List, Dict, Callable
-from threading import Thread
+from typing import Optional, List, Dict, Callable, Set
+from threading import Thread, Lock, Semaphore
 from .logger import print_log
+from .memory import get_rss_bytes, get_total_memory_bytes, MemoryBudget
+from .metrics import LoadMetrics, TimedReader
+from .profiler import LoadProfiler, profiled
 from ..db.schema import SCHEMA
-from ..config import BATCH_SIZE, BATCH_RATIO
-from ..utils.db_transformers import transform_batch, sanitize_for_sqlite, sanitize_for_postgres
+from ..config import (
+    BATCH_SIZE, BATCH_RATIO,
+    ADAPTIVE_BATCH_TARGET_SECONDS, ADAPTIVE_BATCH_MIN_SIZE, ADAPTIVE_BATCH_MAX_SIZE, ADAPTIVE_BATCH_MEMORY_FRACTION,
+    DEFAULT_POSTGRES_ENCODING
+)
+from ..utils.db_transformers import (
+    transform_batch, sanitize_row_for_sqlite, sanitize_row_for_postgres, sanitize_row_for_postgres_utf8
+)
+from ..utils.cnpj_key import AlphanumericCnpjError, cnpj_key
+from ..utils.compact_batch import CompactValueError
+
+# valores que não cabem no perfil da carga (--cnpj-key, --compact): interrompem a carga em vez de descartar linhas
+LOAD_ABORT_ERRORS = (AlphanumericCnpjError, CompactValueError)
+
+
+class BatchSizeController:
+    """
+    Ajusta o tamanho dos lotes de cada tabela em tempo de execução.
+
+    O consumidor informa quanto tempo levou cada inserção (`record`) e o tamanho do próximo lote
+    é recalculado para que cada insert/COPY leve cerca de `target_seconds`. Se o RSS do processo
+    se aproximar de `memory_limit`, os lotes deixam de crescer e, acima do limite, são reduzidos.
+
+    :params:
+        target_seconds: tempo alvo (em segundos) de cada inserção no banco.
+        memory_limit: limite de memória do processo (em bytes). Se None, usa uma fração da memória total.
+        min_size: tamanho mínimo do lote.
+        max_size: tamanho máximo do lote.
+    """
+
+    SMOOTHING = 0.3  # peso da última medição na média móvel do tempo por linha
+    MAX_STEP = 2.0  # variação máxima (para mais ou para menos) a cada ajuste
+
+    def __init__(self, target_seconds: float = ADAPTIVE_BATCH_TARGET_SECONDS, memory_limit: Optional[int] = None,
+                 min_size: int = ADAPTIVE_BATCH_MIN_SIZE, max_size: int = ADAPTIVE_BATCH_MAX_SIZE):
+        if memory_limit is None:
+            total_memory = get_total_memory_bytes()
+            memory_limit = int(total_memory * ADAPTIVE_BATCH_MEMORY_FRACTION) if total_memory else None
+        self.target_seconds = target_seconds
+        self.memory_limit = memory_limit
+        self.min_size = min_size
+        self.max_size = max_size
+        self._sizes: Dict[str, int] = {}
+        self._secs_per_row: Dict[str, float] = {}
+        self._lock = Lock()
+
+    def batch_size(self, table: str) -> int:
+        """Tamanho atual do lote da tabela (inicia em BATCH_SIZE * BATCH_RATIO)."""
+        size = self._sizes.get(table)
+        if size is None:
+            size = int(BATCH_SIZE * BATCH_RATIO.get(table, 1.0))
+            size = min(max(size, self.min_size), self.max_size)
+        return size
+
+    def record(self, table: str, rows: int, seconds: float) -> None:
+        """Registra o tempo de inserção de um lote e recalcula o tamanho do próximo."""
+        if rows <= 0 or seconds <= 0:
+            return
+
+        with self._lock:
+            current = self.batch_size(table)
+
+            # lotes muito menores que o atual (final de arquivo) distorcem o tempo por linha
+            if rows < current * 0.25:
+                return
+
+            secs_per_row = seconds / rows
+            previous = self._secs_per_row.get(table)
+            if previous is not None:
+                secs_per_row = self.SMOOTHING * secs_per_row + (1 - self.SMOOTHING) * previous
+            self._secs_per_row[table] = secs_per_row
+
+            ideal = self.target_seconds / secs_per_row
+            new_size = min(max(ideal, current / self.MAX_STEP), current * self.MAX_STEP)
+
+            rss = get_rss_bytes() if self.memory_limit else None
+            if rss is not None:
+                if rss > self.memory_limit:
+                    new_size = min(new_size, current / self.MAX_STEP)  # acima do limite: reduz
+                elif rss > self.memory_limit * 0.8:
+                    new_size = min(new_size, current)  # perto do limite: não cresce
+
+            self._sizes[table] = int(min(max(new_size, self.min_size), self.max_size))
+
+    def log_summary(self) -> None:
+        """Imprime o tamanho final do lote de cada tabela."""
+        for table, size in sorted(self._sizes.items()):
+            secs_per_row = self._secs_per_row.get(table, 0.0)
+            print_log(f"LOTE ADAPTATIVO | {table:<25} | {size:>9,} REGISTROS".replace(",", ".") +
+                      f" | {secs_per_row * size:5.2f}s POR INSERÇÃO", level="docs")
 
 
 def get_targets_from_zip_name(zip_name: str) -> List[Dict]:
@@ -29,18 +119,37 @@ def get_targets_from_zip_name(zip_name: str) -> List[Dict]:
 
 
 def _process_zip_file(zip_file: Path, insertion_queue: Queue,
-                      sanitizer_func: Callable, low_memory: bool = False, ):
+                      sanitizer_func: Callable, memory_budget: Optional[MemoryBudget] = None,
+                      metrics: Optional[LoadMetrics] = None,
+                      batch_controller: Optional[BatchSizeController] = None,
+                      producer_slots: Optional[Semaphore] = None,
+                      skip_tables: Optional[Set[str]] = None,
+                      load_tracker=None):
+    if producer_slots:
+        producer_slots.acquire()
     try:
-        targets = get_targets_from_zip_name(zip_file.name)
+        targets = [t for t in get_targets_from_zip_name(zip_file.name) if t['name'] not in (skip_tables or ())]
         if not targets:
             return
 
         batches = {t['name']: [] for t in targets}
         columns_map = {t['name']: t['columns'] for t in targets}
+        main_table = targets[0]['name']  # tabela usada para registrar as métricas de leitura do arquivo
+
+        def get_batch_size(table_name: str) -> int:
+            if batch_controller:
+                return batch_controller.batch_size(table_name)
+            base_size = memory_budget.batch_size if memory_budget else BATCH_SIZE
+            return int(base_size * BATCH_RATIO.get(table_name, 1.0))
+
+        batch_sizes = {t['name']: get_batch_size(t['name']) for t in targets}
+
+        # perfil --cnpj-key: chave numérica do CNPJ calculada (e validada) na leitura dos estabelecimentos
+        use_cnpj_key = main_table == 'estabelecimento' and bool(SCHEMA['estabelecimento'].get('integer_key'))
+        invalid_dv = 0
 
         estab_cols_map = {}
-        is_estab_file = any(t['name'] in ['estabelecimento', 'estabelecimento_cnae_sec'] for t in targets)
-        if is_estab_file:
+        if use_cnpj_key or any(t['name'] == 'estabelecimento_cnae_sec' for t in targets):
             estab_source_cols = [c[0] for c in SCHEMA['estabelecimento']['columns']]
             estab_cols_map = {
                 'cnpj_basico': estab_source_cols.index('cnpj_basico'),
@@ -51,10 +160,64 @@ def _process_zip_file(zip_file: Path, insertion_queue: Queue,
 
         with zipfile.ZipFile(zip_file, 'r') as zip_ref:
             for file_info in zip_ref.infolist():
+                # tempos acumulados no arquivo, para separar o tempo de parse do restante
+                timings = {"transform": 0.0, "queue_put": 0.0}
+                last_nbytes = 0
+
+                def emit_batch(table_name: str, batch_list: list, wait_full: bool = True):
+                    nonlocal last_nbytes
+                    item = {
+                        "table": table_name,
+                        "columns": columns_map[table_name],
+                        "rows": batch_list,
+                        "filename": str(zip_file)
+                    }
+                    if metrics:
+                        item["nbytes"] = reader.nbytes - last_nbytes
+                        last_nbytes = reader.nbytes
+
+                    start = time.perf_counter()
+                    transformed_rows = transform_batch(item, sanitizer_func)
+                    item["rows"] = transformed_rows
+                    transform_secs = time.perf_counter() - start
+                    timings["transform"] += transform_secs
+
+                    if transformed_rows:
+                        start = time.perf_counter()
+                        if memory_budget:
+                            memory_budget.wait_for_memory(insertion_queue)
+                        if wait_full:
+                            while insertion_queue.full(): time.sleep(0.05)
+                        if load_tracker:
+                            load_tracker.batch_queued(table_name)
+                        insertion_queue.put(item)
+                        put_secs = time.perf_counter() - start
+                        timings["queue_put"] += put_secs
+
+                        if metrics:
+                            metrics.add("transform", table_name, item["filename"], transform_secs)
+                            metrics.add("queue_put", table_name, item["filename"], put_secs)
+
                 try:
+                    member_start = time.perf_counter()
                     with zip_ref.open(file_info.filename) as raw_file:
-                        reader = csv.reader(TextIOWrapper(raw_file, encoding="latin1"), delimiter=';')
-                        for row in reader:
+                        reader = TimedReader(raw_file) if metrics else raw_file
+                        rows_read = 0
+                        csv_reader = csv.reader(TextIOWrapper(reader, encoding="latin1"), delimiter=';')
+                        for row in csv_reader:
+                            rows_read += 1
+                            if use_cnpj_key:
+                                key, valid_dv = cnpj_key(row[estab_cols_map['cnpj_basico']],
+                                                         row[estab_cols_map['cnpj_ordem']],
+                                                         row[estab_cols_map['cnpj_dv']])
+                                if key is None:
+                                    raise AlphanumericCnpjError(
+                                        f"{zip_file.name}: CNPJ NÃO NUMÉRICO ({row[estab_cols_map['cnpj_basico']]}"
+                                        f"/{row[estab_cols_map['cnpj_ordem']]}-{row[estab_cols_map['cnpj_dv']]}) "
+                                        f"NÃO SUPORTADO COM --cnpj-key: CARGA INTERROMPIDA (CARREGUE SEM A OPÇÃO)")
+                                if not valid_dv:
+                                    invalid_dv += 1
+
                             for target in targets:
                                 table_name = target['name']
 
@@ -62,7 +225,9 @@ def _process_zip_file(zip_file: Path, insertion_queue: Queue,
                                     cnaes_secundarios = row[estab_cols_map['cnae_sec']].split(',')
                                     for cnae in cnaes_secundarios:
                                         cnae_limpo = cnae.strip()
-                                        if cnae_limpo:
+                                        if cnae_limpo and use_cnpj_key:
+                                            batches[table_name].append([key, cnae_limpo])
+                                        elif cnae_limpo:
                                             new_row = [
                                                 row[estab_cols_map['cnpj_basico']],
                                                 row[estab_cols_map['cnpj_ordem']],
@@ -70,79 +235,112 @@ def _process_zip_file(zip_file: Path, insertion_queue: Queue,
                                                 cnae_limpo,
                                             ]
                                             batches[table_name].append(new_row)
+                                elif use_cnpj_key:
+                                    batches[table_name].append(row + [key])
                                 else:
                                     batches[table_name].append(row)
 
                             for table_name, batch_list in batches.items():
-                                ratio = BATCH_RATIO.get(table_name, 1.0)
-                                batch_size = int(BATCH_SIZE * ratio)
-                                if len(batch_list) >= batch_size:
-                                    item = {
-                                        "table": table_name,
-                                        "columns": columns_map[table_name],
-                                        "rows": batch_list,
-                                        "filename": str(zip_file)
-                                    }
-                                    transformed_rows = transform_batch(item, sanitizer_func)
-                                    item["rows"] = transformed_rows
-
-                                    if transformed_rows:
-                                        while insertion_queue.full(): time.sleep(0.05)
-                                        insertion_queue.put(item)
-
+                                if len(batch_list) >= batch_sizes[table_name]:
+                                    emit_batch(table_name, batch_list)
                                     batches[table_name] = []
+                                    batch_sizes[table_name] = get_batch_size(table_name)
 
                         for table_name, batch_list in batches.items():
                             if batch_list:
-                                item = {
-                                    "table": table_name,
-                                    "columns": columns_map[table_name],
-                                    "rows": batch_list,
-                                    "filename": str(zip_file)
-                                }
-                                # CHAMADA CORRIGIDA para usar a variável 'sanitizer'
-                                transformed_rows = transform_batch(item, sanitizer_func)
-                                item["rows"] = transformed_rows
-
-                                if transformed_rows:
-                                    insertion_queue.put(item)
+                                emit_batch(table_name, batch_list, wait_full=False)
+                                batches[table_name] = []
+
+                    if metrics:
+                        member_secs = time.perf_counter() - member_start
+                        parse_secs = member_secs - reader.seconds - timings["transform"] - timings["queue_put"]
+                        metrics.add("unzip", main_table, str(zip_file), reader.seconds)
+                        metrics.add("parse", main_table, str(zip_file), max(0.0, parse_secs),
+                                    rows=rows_read, nbytes=reader.nbytes)
+                except LOAD_ABORT_ERRORS:
+                    raise
                 except Exception as e:
                     print_log(f"Erro ao ler {file_info.filename} em {zip_file.name}: {e}", level="error")
 
+        if invalid_dv:
+            print_log(f"{zip_file.name}: {invalid_dv} CNPJ(S) COM DÍGITOS VERIFICADORES INVÁLIDOS", level="warning")
+
+    except LOAD_ABORT_ERRORS:
+        raise
     except Exception as e:
         print_log(f"Erro ao abrir {zip_file.name}: {e}", level="error")
 
     finally:
-        if low_memory:
-            gc.collect()
+        if producer_slots:
+            producer_slots.release()
+
+    # o arquivo interrompido (carga abortada) não conclui a tabela
+    if load_tracker:
+        load_tracker.file_done(zip_file.name)
 
 
 def produce_batches(files_dir: str, insertion_queue: Queue, engine: str, num_workers: Optional[int] = None,
-                    parallel: bool = False, low_memory: bool = False,
-                    ):
+                    parallel: bool = False, memory_budget: Optional[MemoryBudget] = None,
+                    metrics: Optional[LoadMetrics] = None, profiler: Optional[LoadProfiler] = None,
+                    batch_controller: Optional[BatchSizeController] = None,
+                    skip_tables: Optional[Set[str]] = None, load_tracker=None,
+                    encoding: str = DEFAULT_POSTGRES_ENCODING):
+    """
+    Lê os arquivos ZIP e coloca os lotes de cada tabela na fila de inserção.
+
+    :params:
+        skip_tables: tabelas que não são geradas pelo produtor (ex.: `estabelecimento_cnae_sec`, quando gerada no
+            banco após a carga).
+        load_tracker: `TableLoadTracker` informado de cada lote enfileirado e de cada ZIP concluído.
+        encoding: encoding do banco Postgres (`POSTGRES_ENCODINGS`); com "utf8", os textos não são convertidos.
+
+    Um valor que não cabe no perfil da carga (CNPJ não numérico com `--cnpj-key`, código não numérico com
+    `--compact`) interrompe a leitura com o erro correspondente (após os demais arquivos, na leitura paralela), em vez
+    de descartar a linha.
+    """
     zip_files = sorted(Path(files_dir).glob("*.zip"))
 
-    if engine == "sqlite":
-        sanitizer = sanitize_for_sqlite
+    if engine in ("sqlite", "parquet"):
+        sanitizer = sanitize_row_for_sqlite
+    elif engine == "postgres" and encoding == "utf8":
+        sanitizer = sanitize_row_for_postgres_utf8
     elif engine == "postgres":
-        sanitizer = sanitize_for_postgres
+        sanitizer = sanitize_row_for_postgres
     else:
         raise ValueError(f"Engine '{engine}' não é suportado.")
 
-    if parallel and engine == "postgres":
+    process_zip_file = profiled(_process_zip_file, profiler)
+
+    if parallel and engine in ("postgres", "parquet"):
+        # com orçamento de memória, somente `producer_threads` arquivos são lidos ao mesmo tempo
+        producer_slots = Semaphore(memory_budget.producer_threads) if memory_budget else None
+        errors: List[ValueError] = []
+
+        def process_or_record(*args):
+            try:
+                process_zip_file(*args)
+            except LOAD_ABORT_ERRORS as e:
+                errors.append(e)
+
         threads = []
         for zip_file in zip_files:
-            t = Thread(target=_process_zip_file, args=(zip_file, insertion_queue, sanitizer, low_memory))
+            t = Thread(target=process_or_record,
+                       args=(zip_file, insertion_queue, sanitizer, memory_budget, metrics, batch_controller,
+                             producer_slots, skip_tables, load_tracker),
+                       name=f"PRODUCER-{zip_file.stem.upper()}")
             t.start()
             threads.append(t)
 
         for t in threads:
             t.join()
+        if errors:
+            raise errors[0]
     else:
         for zip_file in zip_files:
-            _process_zip_file(zip_file, insertion_queue, sanitizer, low_memory)
+            process_zip_file(zip_file, insertion_queue, sanitizer, memory_budget, metrics, batch_controller,
+                             skip_tables=skip_tables, load_tracker=load_tracker)
 
-    if engine == "sqlite":
+    if engine in ("sqlite", "parquet"):
         insertion_queue.put(None)
     elif engine == "postgres":
         for _ in range(num_workers or 1):
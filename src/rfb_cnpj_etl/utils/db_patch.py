@@ -4,9 +4,154 @@
 Aplica correções estáticas na base de dados.
 """
 
+from typing import List
 from ..config import DEFAULT_ENGINE
+from ..db.schema import is_compact
 from ..utils.logger import print_log
 
+# códigos usados nos dados, mas ausentes nas tabelas de domínio publicadas pela RFB
+DOMAIN_COLUMNS = {
+    "qualificacao_socio": ("cod_qualificacao", "nome_qualificacao"),
+    "motivo": ("cod_motivo", "nome_motivo"),
+    "pais": ("cod_pais", "nome_pais"),
+}
+MISSING_DOMAIN_ROWS = {
+    "qualificacao_socio": [
+        ("36", "Gerente-Delegado"),
+    ],
+    "motivo": [
+        ("32", "DECURSO DE PRAZO DE INTERRUPCAO TEMPORARIA"),
+        ("81", "SOLICITACAO DA ADMINISTRACAO TRIBUTARIA MUNICIPAL/ESTADUAL - SC"),
+        ("93", "CNPJ - TITULAR BAIXADO"),
+    ],
+    "pais": [
+        ("008", "ABU DHABI"),
+        ("009", "DIRCE"),
+        ("015", "ALAND, ILHAS"),
+        ("150", "JERSEY"),
+        ("151", "CANARIAS, ILHAS"),
+        ("200", "CURACAO"),
+        ("321", "GUERNSEY"),
+        ("359", "MAN, ILHA DE"),
+        ("367", "INGLATERRA"),
+        ("393", "JERSEY"),
+        ("449", "MACEDONIA (ANTIGA REP. IUGOSLAVA)"),
+        ("452", "MADEIRA, ILHA DA"),
+        ("498", "MOLDAVIA"),
+        ("678", "SAO TOME E PRINCIPE"),
+        ("699", "SAO MARTINHO, ILHA DE (PARTE HOLANDESA)"),
+        ("737", "SERVIA"),
+        ("994", "AZERBAIJAO"),
+    ],
+}
+
+# empresas do simples sem correspondência na tabela empresa
+INVALID_SIMPLES_CNPJ = (
+    "24417449", "24539162", "30721933", "30728066", "30760363", "30847991", "30857441", "30886793", "30972017",
+)
+
+# tabelas com correções (ver `table_fixes`)
+FIXED_TABLES = (*MISSING_DOMAIN_ROWS, "empresa", "estabelecimento", "simples")
+
+
+def table_fixes(table_name: str, engine: str = DEFAULT_ENGINE) -> List[str]:
+    """
+    Comandos de correção de uma tabela (cada correção altera somente a própria tabela).
+
+    :params:
+        table_name: nome da tabela.
+        engine: engine do banco de dados.
+    :returns: comandos SQL, na ordem de execução (vazio se a tabela não tiver correções)
+    """
+    statements = []
+
+    if table_name in MISSING_DOMAIN_ROWS:
+        key_col, name_col = DOMAIN_COLUMNS[table_name]
+        values = ",\n".join(f"('{cod}', '{nome}')" for cod, nome in MISSING_DOMAIN_ROWS[table_name])
+        statements.append(f"""
+                    INSERT INTO {table_name} ({key_col}, {name_col})
+                    VALUES {values}
+                    ON CONFLICT ({key_col}) DO NOTHING;
+                    """)
+
+    elif table_name == "empresa":
+        if engine == "postgres":
+            statements.append("""
+                                  DELETE \
+                                  FROM empresa
+                                  WHERE ctid IN (SELECT ctid \
+                                                 FROM (SELECT ctid, \
+                                                              ROW_NUMBER() OVER (PARTITION BY cnpj_basico ORDER BY CASE \
+                                                                                                                       WHEN razao_social IS NOT NULL AND TRIM(razao_social) <> '' \
+                                                                                                                           THEN 0 \
+                                                                                                                       ELSE 1 END, ctid) as rn \
+                                                       FROM empresa) t \
+                                                 WHERE t.rn > 1); \
+                                  """)
+        else:  # sqlite e duckdb
+            statements.append("""
+                                  DELETE \
+                                  FROM empresa
+                                  WHERE rowid IN (SELECT rowid \
+                                                  FROM (SELECT rowid, \
+                                                               ROW_NUMBER() OVER (PARTITION BY cnpj_basico ORDER BY CASE \
+                                                                                                                        WHEN razao_social IS NOT NULL AND TRIM(razao_social) <> '' \
+                                                                                                                            THEN 0 \
+                                                                                                                        ELSE 1 END, rowid) as rn \
+                                                        FROM empresa) t \
+                                                  WHERE t.rn > 1); \
+                                  """)
+
+        if is_compact():
+            # perfil --compact: os códigos já são inteiros (porte vazio virou NULL)
+            statements.append("UPDATE empresa SET cod_porte = 0 WHERE cod_porte IS NULL;")
+        else:
+            # o porte vazio é '' no SQLite e NULL no Postgres (COPY com NULL '') e no DuckDB (read_csv)
+            statements.append("UPDATE empresa SET cod_porte = '00' WHERE cod_porte IS NULL OR cod_porte = '';")
+
+    elif table_name == "estabelecimento":
+        statements.append("UPDATE estabelecimento SET cod_pais = NULL WHERE cod_pais = '0';")
+
+        if not is_compact():  # perfil --compact: o cod_pais já é inteiro (sem zeros à esquerda)
+            if engine == "postgres":
+                statements.append("""
+                            UPDATE estabelecimento
+                            SET cod_pais = LPAD(cod_pais, 3, '0')
+                            WHERE cod_pais IS NOT NULL
+                              AND LENGTH(TRIM(cod_pais)) = 2;
+                            """)
+            else:  # sqlite e duckdb
+                statements.append("""
+                            UPDATE estabelecimento
+                            SET cod_pais = substr('000' || cod_pais, -3)
+                            WHERE cod_pais IS NOT NULL
+                              AND LENGTH(TRIM(cod_pais)) = 2;
+                            """)
+
+    elif table_name == "simples":
+        invalid_cnpjs = ", ".join(f"'{cnpj}'" for cnpj in INVALID_SIMPLES_CNPJ)
+        statements.append(f"DELETE FROM simples WHERE cnpj_basico IN ({invalid_cnpjs});")
+
+    return statements
+
+
+def apply_table_fixes(conn, table_name: str, engine: str = DEFAULT_ENGINE):
+    """
+    Aplica as correções de uma tabela, em uma transação (usado pelo task graph, assim que a tabela é carregada).
+
+    :params:
+        conn: conexão com o banco de dados.
+        table_name: nome da tabela.
+        engine: engine do banco de dados.
+    """
+    statements = table_fixes(table_name, engine)
+    if not statements:
+        return
+    cur = conn.cursor()
+    for sql in statements:
+        cur.execute(sql)
+    conn.commit()
+
 
 def apply_static_fixes(conn, engine: str = DEFAULT_ENGINE):
     """
@@ -20,99 +165,9 @@ def apply_static_fixes(conn, engine: str = DEFAULT_ENGINE):
         print_log("APLICANDO CORREÇÕES NA BASE DE DADOS...", level="task")
         cur = conn.cursor()
 
-        cur.execute("""
-                    INSERT INTO qualificacao_socio (cod_qualificacao, nome_qualificacao)
-                    VALUES ('36', 'Gerente-Delegado')
-                    ON CONFLICT (cod_qualificacao) DO NOTHING;
-                    """)
-
-        cur.execute("""
-                    INSERT INTO motivo (cod_motivo, nome_motivo)
-                    VALUES ('32', 'DECURSO DE PRAZO DE INTERRUPCAO TEMPORARIA'),
-                           ('81', 'SOLICITACAO DA ADMINISTRACAO TRIBUTARIA MUNICIPAL/ESTADUAL - SC'),
-                           ('93', 'CNPJ - TITULAR BAIXADO')
-                    ON CONFLICT (cod_motivo) DO NOTHING;
-                    """)
-
-        cur.execute("""
-                    INSERT INTO pais (cod_pais, nome_pais)
-                    VALUES ('008', 'ABU DHABI'),
-                           ('009', 'DIRCE'),
-                           ('015', 'ALAND, ILHAS'),
-                           ('150', 'JERSEY'),
-                           ('151', 'CANARIAS, ILHAS'),
-                           ('200', 'CURACAO'),
-                           ('321', 'GUERNSEY'),
-                           ('359', 'MAN, ILHA DE'),
-                           ('367', 'INGLATERRA'),
-                           ('393', 'JERSEY'),
-                           ('449', 'MACEDONIA (ANTIGA REP. IUGOSLAVA)'),
-                           ('452', 'MADEIRA, ILHA DA'),
-                           ('498', 'MOLDAVIA'),
-                           ('678', 'SAO TOME E PRINCIPE'),
-                           ('699', 'SAO MARTINHO, ILHA DE (PARTE HOLANDESA)'),
-                           ('737', 'SERVIA'),
-                           ('994', 'AZERBAIJAO')
-                    ON CONFLICT (cod_pais) DO NOTHING;
-                    """)
-
-        if engine == "postgres":
-            query_delete_duplicatas = """
-                                      DELETE \
-                                      FROM empresa
-                                      WHERE ctid IN (SELECT ctid \
-                                                     FROM (SELECT ctid, \
-                                                                  ROW_NUMBER() OVER (PARTITION BY cnpj_basico ORDER BY CASE \
-                                                                                                                           WHEN razao_social IS NOT NULL AND TRIM(razao_social) <> '' \
-                                                                                                                               THEN 0 \
-                                                                                                                           ELSE 1 END, ctid) as rn \
-                                                           FROM empresa) t \
-                                                     WHERE t.rn > 1); \
-                                      """
-            cur.execute(query_delete_duplicatas)
-
-        else:  # sqlite
-            query_delete_duplicatas_sqlite = """
-                                             DELETE \
-                                             FROM empresa
-                                             WHERE rowid IN (SELECT rowid \
-                                                             FROM (SELECT rowid, \
-                                                                          ROW_NUMBER() OVER (PARTITION BY cnpj_basico ORDER BY CASE \
-                                                                                                                                   WHEN razao_social IS NOT NULL AND TRIM(razao_social) <> '' \
-                                                                                                                                       THEN 0 \
-                                                                                                                                   ELSE 1 END, rowid) as rn \
-                                                                   FROM empresa) t \
-                                                             WHERE t.rn > 1); \
-                                             """
-            cur.execute(query_delete_duplicatas_sqlite)
-
-        cur.execute("UPDATE estabelecimento SET cod_pais = NULL WHERE cod_pais = '0';")
-
-        cur.execute("UPDATE empresa SET cod_porte = '00' WHERE cod_porte = '';")
-
-        if engine == "postgres":
-            cur.execute("""
-                        UPDATE estabelecimento
-                        SET cod_pais = LPAD(cod_pais, 3, '0')
-                        WHERE cod_pais IS NOT NULL
-                          AND LENGTH(TRIM(cod_pais)) = 2;
-                        """)
-        else:  # sqlite
-            cur.execute("""
-                        UPDATE estabelecimento
-                        SET cod_pais = substr('000' || cod_pais, -3)
-                        WHERE cod_pais IS NOT NULL
-                          AND LENGTH(TRIM(cod_pais)) = 2;
-                        """)
-
-        cur.execute("""
-                    DELETE
-                    FROM simples
-                    WHERE cnpj_basico IN (
-                                          '24417449', '24539162', '30721933', '30728066',
-                                          '30760363', '30847991', '30857441', '30886793', '30972017'
-                        );
-                    """)
+        for table_name in FIXED_TABLES:
+            for sql in table_fixes(table_name, engine):
+                cur.execute(sql)
 
         conn.commit()
         print_log("CORREÇÕES APLICADAS", level="success")
@@ -0,0 +1,199 @@
+# utils/memory.py
+
+"""
+Leitura do uso de memória do processo, da memória disponível (sem dependências externas)
+e orçamento de memória da carga.
+"""
+
+import os
+import sys
+import time
+from typing import Optional
+from .logger import print_log
+from ..config import (
+    BATCH_SIZE, QUEUE_SIZE, WORKER_THREADS, SQLITE_CACHE_SIZE_KIB,
+    MEMORY_RESERVED_FRACTION, MEMORY_BYTES_PER_ROW, MEMORY_PER_PRODUCER_BYTES, MEMORY_PER_CONSUMER_BYTES,
+    MEMORY_MIN_BATCH_SIZE
+)
+
+
+def get_rss_bytes() -> Optional[int]:
+    """
+    Retorna a memória residente (RSS) atual do processo, em bytes, ou None se não for possível medir.
+
+    Somente no Linux e no Windows. Nos demais sistemas (ex.: macOS), retorna None, e o controle pelo RSS fica
+    desativado: o `ru_maxrss` disponível é o pico, que não diminui quando a fila esvazia.
+    """
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/statm", "r") as f:
+                resident_pages = int(f.read().split()[1])
+            return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+            get_process_memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+            get_process_memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS),
+                                                wintypes.DWORD]
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if get_process_memory_info(handle, ctypes.byref(counters), counters.cb):
+                return int(counters.WorkingSetSize)
+            return None
+
+        return None
+
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _get_cgroup_limit_bytes() -> Optional[int]:
+    """Limite de memória do container (cgroup v2 ou v1), se houver."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path, "r") as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:  # "max" ou valor gigante = sem limite
+            return int(value)
+    return None
+
+
+def get_total_memory_bytes() -> Optional[int]:
+    """
+    Retorna a memória total disponível para o processo (física ou limite do container), em bytes.
+    """
+    total = None
+    try:
+        if sys.platform == "win32":
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [
+                    ("dwLength", ctypes.c_ulong),
+                    ("dwMemoryLoad", ctypes.c_ulong),
+                    ("ullTotalPhys", ctypes.c_ulonglong),
+                    ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong),
+                    ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong),
+                    ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("sullAvailExtendedVirtual", ctypes.c_ulonglong),
+                ]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                total = int(status.ullTotalPhys)
+        else:
+            total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (OSError, ValueError, AttributeError):
+        total = None
+
+    cgroup_limit = _get_cgroup_limit_bytes()
+    if cgroup_limit and (total is None or cgroup_limit < total):
+        total = cgroup_limit
+    return total
+
+
+def parse_size(value: str) -> int:
+    """
+    Converte um tamanho legível ("2G", "512M", "1.5GB", "4096") em bytes.
+    """
+    units = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    text = str(value).strip().upper().rstrip("B").strip()
+    number, unit = (text[:-1], text[-1]) if text and text[-1] in units else (text, "")
+    try:
+        size = int(float(number) * units[unit])
+    except ValueError:
+        raise ValueError(f"TAMANHO DE MEMÓRIA INVÁLIDO: {value} (ex.: 2G, 512M)")
+    if size <= 0:
+        raise ValueError(f"TAMANHO DE MEMÓRIA INVÁLIDO: {value} (ex.: 2G, 512M)")
+    return size
+
+
+class MemoryBudget:
+    """
+    Deriva os parâmetros da carga a partir de um limite de memória e controla os produtores pelo RSS.
+
+    Uma parte do limite (`MEMORY_RESERVED_FRACTION`) fica reservada para o interpretador e as conexões; no SQLite, o
+    cache de páginas também sai do orçamento. O restante é dividido entre os lotes que podem estar em memória ao mesmo
+    tempo: os da fila, os que cada produtor está montando/transformando e os que cada consumidor está inserindo.
+
+    :params:
+        limit: limite de memória do processo, em bytes.
+        engine: engine do banco de dados.
+    """
+
+    THROTTLE_RATIO = 0.9  # fração do limite a partir da qual os produtores aguardam
+
+    def __init__(self, limit: int, engine: str):
+        self.limit = limit
+        self.engine = engine
+        usable = int(limit * (1 - MEMORY_RESERVED_FRACTION))
+
+        # cache de páginas do SQLite (até SQLITE_CACHE_SIZE_KIB)
+        self.sqlite_cache_kib = 0
+        if engine == "sqlite":
+            self.sqlite_cache_kib = min(SQLITE_CACHE_SIZE_KIB, max(2_048, usable // 4 // 1024))
+            usable -= self.sqlite_cache_kib * 1024
+
+        # threads: cada produtor/consumidor adicional precisa de memória para os seus lotes
+        self.producer_threads = min(WORKER_THREADS, max(1, usable // MEMORY_PER_PRODUCER_BYTES))
+        self.consumer_threads = 1 if engine == "sqlite" else min(WORKER_THREADS,
+                                                                 max(1, usable // MEMORY_PER_CONSUMER_BYTES))
+        self.queue_size = min(max(2, QUEUE_SIZE), max(2, self.producer_threads + self.consumer_threads))
+
+        # lotes simultâneos: fila + (montando e transformando) em cada produtor + um em cada consumidor
+        in_flight = self.queue_size + 2 * self.producer_threads + self.consumer_threads
+        self.batch_size = min(BATCH_SIZE, max(MEMORY_MIN_BATCH_SIZE, usable // (in_flight * MEMORY_BYTES_PER_ROW)))
+
+        # com o lote no tamanho máximo, a memória que sobra vira profundidade de fila (até QUEUE_SIZE)
+        if self.batch_size == BATCH_SIZE:
+            spare_batches = usable // (BATCH_SIZE * MEMORY_BYTES_PER_ROW) - 2 * self.producer_threads \
+                            - self.consumer_threads
+            self.queue_size = max(self.queue_size, min(max(2, QUEUE_SIZE), spare_batches))
+
+        self._throttle_logged = False
+
+    def log_summary(self) -> None:
+        print_log(f"LIMITE DE MEMÓRIA: {self.limit / 1024 ** 3:.1f} GB | LOTE: {self.batch_size:,}".replace(",", ".") +
+                  f" | FILA: {self.queue_size} | PRODUTORES: {self.producer_threads}"
+                  f" | CONSUMIDORES: {self.consumer_threads}" +
+                  (f" | CACHE SQLITE: {self.sqlite_cache_kib // 1024} MB" if self.engine == "sqlite" else ""),
+                  level="docs")
+        if get_rss_bytes() is None:
+            print_log("RSS NÃO DISPONÍVEL NESTE SISTEMA: OS PRODUTORES NÃO SERÃO CONTROLADOS PELA MEMÓRIA",
+                      level="warning")
+
+    def wait_for_memory(self, insertion_queue) -> None:
+        """
+        Segura o produtor enquanto o RSS estiver acima do limite e ainda houver lotes na fila para liberar memória.
+        """
+        while True:
+            rss = get_rss_bytes()
+            if rss is None or rss < self.limit * self.THROTTLE_RATIO or insertion_queue.empty():
+                return
+            if not self._throttle_logged:
+                self._throttle_logged = True
+                print_log(f"MEMÓRIA EM {rss / 1024 ** 3:.1f} GB: PRODUTORES AGUARDANDO A FILA ESVAZIAR",
+                          level="warning")
+            time.sleep(0.1)
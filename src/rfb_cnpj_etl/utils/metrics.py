@@ -0,0 +1,222 @@
+# utils/metrics.py
+
+"""
+Instrumentação da carga de dados (tempo por etapa, vazão e exportação das métricas).
+"""
+
+import io
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from os.path import basename
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from .logger import print_log
+from ..config import METRICS_DIR, METRICS_INTERVAL
+
+# etapas medidas no pipeline de carga
+# unzip: descompressão | parse: leitura do csv | transform: sanitização e conversões
+# queue_put: produtor aguardando espaço na fila | queue_get: consumidor aguardando lote | write: inserção no banco
+STAGES = ("unzip", "parse", "transform", "queue_put", "queue_get", "write")
+
+
+class TimedReader(io.BufferedIOBase):
+    """
+    Envolve o arquivo aberto do ZIP, acumulando o tempo gasto na descompressão e os bytes lidos.
+    """
+
+    def __init__(self, raw):
+        super().__init__()
+        self._raw = raw
+        self.seconds = 0.0
+        self.nbytes = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        start = time.perf_counter()
+        data = self._raw.read(size)
+        self.seconds += time.perf_counter() - start
+        self.nbytes += len(data)
+        return data
+
+    def read1(self, size: int = -1) -> bytes:
+        start = time.perf_counter()
+        data = self._raw.read1(size)
+        self.seconds += time.perf_counter() - start
+        self.nbytes += len(data)
+        return data
+
+
+# caracteres escapados nos valores dos rótulos do Prometheus (ex.: barras invertidas dos caminhos no Windows)
+LABEL_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n"})
+
+
+def prometheus_labels(**labels: str) -> str:
+    """Rótulos no formato de exposição do Prometheus (`nome="valor",...`), com os valores escapados."""
+    return ",".join(f'{name}="{str(value).translate(LABEL_ESCAPES)}"' for name, value in labels.items())
+
+
+class LoadMetrics:
+    """
+    Coleta as métricas da carga por tabela, arquivo ZIP e worker (thread), de forma thread-safe.
+
+    :params:
+        output_dir: diretório onde os arquivos de métricas serão gravados.
+        interval: intervalo (em segundos) entre as exportações periódicas.
+    """
+
+    def __init__(self, output_dir: Optional[str] = None, interval: int = METRICS_INTERVAL):
+        self.output_dir = Path(output_dir or METRICS_DIR)
+        self.interval = interval
+        run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.jsonl_path = self.output_dir / f"load_{run_id}.jsonl"  # snapshots periódicos (JSON lines)
+        self.prom_path = self.output_dir / "load_metrics.prom"  # formato texto do Prometheus
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str, str], dict] = {}
+        self._started = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _entry(self, table: str, filename: str, worker: str) -> dict:
+        key = (table, basename(filename), worker)
+        entry = self._stats.get(key)
+        if entry is None:
+            entry = {"stages": defaultdict(float), "rows": 0, "bytes": 0}
+            self._stats[key] = entry
+        return entry
+
+    def add(self, stage: str, table: str, filename: str, seconds: float,
+            rows: int = 0, nbytes: int = 0, worker: Optional[str] = None) -> None:
+        """
+        Registra o tempo gasto em uma etapa e, opcionalmente, as linhas e bytes processados.
+        """
+        worker = worker or threading.current_thread().name
+        with self._lock:
+            entry = self._entry(table, filename, worker)
+            entry["stages"][stage] += seconds
+            entry["rows"] += rows
+            entry["bytes"] += nbytes
+
+    def start(self) -> None:
+        """Inicia a exportação periódica das métricas em uma thread separada."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._export_loop, name="METRICS", daemon=True)
+        self._thread.start()
+        print_log(f"MÉTRICAS DA CARGA EM: {self.output_dir}", level="docs")
+
+    def stop(self) -> None:
+        """Interrompe a exportação periódica, grava as métricas finais e imprime o resumo."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.export()
+        self.print_summary()
+
+    def _export_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def _snapshot(self) -> Dict[Tuple[str, str, str], dict]:
+        with self._lock:
+            return {
+                key: {"stages": dict(entry["stages"]), "rows": entry["rows"], "bytes": entry["bytes"]}
+                for key, entry in self._stats.items()
+            }
+
+    def export(self) -> None:
+        """Grava um snapshot em JSON lines e reescreve o arquivo no formato do Prometheus."""
+        try:
+            snapshot = self._snapshot()
+            self._write_jsonl(snapshot)
+            self._write_prometheus(snapshot)
+        except OSError as e:
+            print_log(f"ERRO AO EXPORTAR MÉTRICAS: {e}", level="error")
+
+    def _write_jsonl(self, snapshot: Dict[Tuple[str, str, str], dict]) -> None:
+        now = datetime.now().isoformat(timespec="seconds")
+        elapsed = round(time.perf_counter() - self._started, 3)
+        with open(self.jsonl_path, "a", encoding="utf-8") as f:
+            for (table, filename, worker), entry in sorted(snapshot.items()):
+                busy = sum(entry["stages"].values())
+                record = {
+                    "ts": now,
+                    "elapsed": elapsed,
+                    "table": table,
+                    "file": filename,
+                    "worker": worker,
+                    "stages": {stage: round(secs, 3) for stage, secs in entry["stages"].items()},
+                    "rows": entry["rows"],
+                    "bytes": entry["bytes"],
+                    "rows_per_sec": round(entry["rows"] / busy, 1) if busy else 0.0,
+                    "bytes_per_sec": round(entry["bytes"] / busy, 1) if busy else 0.0,
+                }
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _write_prometheus(self, snapshot: Dict[Tuple[str, str, str], dict]) -> None:
+        lines = [
+            "# HELP cnpj_load_stage_seconds_total Tempo acumulado por etapa da carga.",
+            "# TYPE cnpj_load_stage_seconds_total counter",
+        ]
+        for (table, filename, worker), entry in sorted(snapshot.items()):
+            for stage, secs in sorted(entry["stages"].items()):
+                labels = prometheus_labels(stage=stage, table=table, file=filename, worker=worker)
+                lines.append(f"cnpj_load_stage_seconds_total{{{labels}}} {secs:.6f}")
+
+        for metric, field, help_text in (
+                ("cnpj_load_rows_total", "rows", "Linhas processadas."),
+                ("cnpj_load_bytes_total", "bytes", "Bytes descompactados processados."),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for (table, filename, worker), entry in sorted(snapshot.items()):
+                labels = prometheus_labels(table=table, file=filename, worker=worker)
+                lines.append(f"{metric}{{{labels}}} {entry[field]}")
+
+        lines.append("# HELP cnpj_load_elapsed_seconds Tempo decorrido desde o início da carga.")
+        lines.append("# TYPE cnpj_load_elapsed_seconds gauge")
+        lines.append(f"cnpj_load_elapsed_seconds {time.perf_counter() - self._started:.3f}")
+
+        # grava em arquivo temporário e substitui, para o coletor nunca ler um arquivo pela metade
+        tmp_path = self.prom_path.with_suffix(".prom.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prom_path)
+
+    def print_summary(self) -> None:
+        """Imprime a tabela de resumo da carga, agregada por tabela."""
+        snapshot = self._snapshot()
+        if not snapshot:
+            return
+
+        # linhas e bytes vêm do consumidor (gravados no banco); tempos somam produtor e consumidor
+        tables: Dict[str, dict] = {}
+        for (table, _, _), entry in snapshot.items():
+            summary = tables.setdefault(table, {"stages": defaultdict(float), "rows": 0, "bytes": 0})
+            for stage, secs in entry["stages"].items():
+                summary["stages"][stage] += secs
+            if "write" in entry["stages"]:
+                summary["rows"] += entry["rows"]
+                summary["bytes"] += entry["bytes"]
+
+        elapsed = time.perf_counter() - self._started
+        header = (f"{'TABELA':<26}{'LINHAS':>13}{'MB':>9}"
+                  + "".join(f"{stage.upper():>11}" for stage in STAGES)
+                  + f"{'LINHAS/s':>11}{'MB/s':>8}")
+
+        print_log(f"RESUMO DA CARGA (TEMPOS EM SEGUNDOS, SOMADOS ENTRE THREADS) | {elapsed:.0f}s", level="docs")
+        print_log(header, level="docs", time=False)
+        print_log("-" * len(header), level="docs", time=False)
+        for table, summary in sorted(tables.items()):
+            mb = summary["bytes"] / 1024 ** 2
+            write_secs = summary["stages"].get("write", 0.0)
+            rows_per_sec = summary["rows"] / write_secs if write_secs else 0.0
+            mb_per_sec = mb / write_secs if write_secs else 0.0
+            print_log(f"{table:<26}{summary['rows']:>13,}{mb:>9.1f}".replace(",", ".")
+                      + "".join(f"{summary['stages'].get(stage, 0.0):>11.1f}" for stage in STAGES)
+                      + f"{rows_per_sec:>11,.0f}".replace(",", ".") + f"{mb_per_sec:>8.1f}", level="docs", time=False)
@@ -0,0 +1,142 @@
+# utils/profiler.py
+
+"""
+Profiling da carga de dados (cProfile por thread ou amostragem de pilhas).
+"""
+
+import cProfile
+import functools
+import pstats
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+from .logger import print_log
+from ..config import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL
+
+PROFILE_MODES = ["cprofile", "sample"]
+PROCESS_WIDE_CPROFILE = sys.version_info >= (3, 12)
+
+
+class LoadProfiler:
+    """
+    Profiler da carga, com um arquivo de saída por execução.
+
+    - "cprofile": executa as funções envolvidas por `wrap` sob um cProfile próprio em cada thread,
+      e ao final junta todos em um único arquivo `.pstats`. A partir do Python 3.12 o cProfile é global
+      (sys.monitoring) e não permite um profiler por thread; nesse caso um único cProfile mede o processo todo.
+    - "sample": amostra as pilhas de todas as threads a cada `interval` segundos e grava um arquivo
+      `.collapsed` (uma pilha por linha), compatível com flamegraph.pl e speedscope.
+
+    :params:
+        mode: "cprofile" ou "sample".
+        output_dir: diretório onde o arquivo será gravado.
+        interval: intervalo (em segundos) entre as amostras (modo "sample").
+    """
+
+    def __init__(self, mode: str = "sample", output_dir: Optional[str] = None,
+                 interval: float = PROFILE_SAMPLE_INTERVAL):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"MODO DE PROFILE NÃO SUPORTADO: {mode}")
+        self.mode = mode
+        self.output_dir = Path(output_dir or PROFILE_DIR)
+        self.interval = interval
+        run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = "pstats" if mode == "cprofile" else "collapsed"
+        self.output_path = self.output_dir / f"load_{run_id}.{suffix}"
+        self._lock = threading.Lock()
+        self._profiles: List[cProfile.Profile] = []
+        self._global_profile = None  # cProfile único do processo (Python 3.12+)
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def wrap(self, func: Callable) -> Callable:
+        """
+        Envolve uma função de produtor ou consumidor para que seja medida no modo "cprofile".
+        No modo "sample" todas as threads já são amostradas, e a função é retornada sem alteração.
+        """
+        if self.mode != "cprofile" or PROCESS_WIDE_CPROFILE:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+                with self._lock:
+                    self._profiles.append(profile)
+
+        return wrapper
+
+    def start(self) -> None:
+        """Inicia o profiling (no modo "sample", a thread de amostragem)."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.mode == "sample":
+            self._thread = threading.Thread(target=self._sample_loop, name="PROFILER", daemon=True)
+            self._thread.start()
+        elif PROCESS_WIDE_CPROFILE:
+            self._global_profile = cProfile.Profile()
+            self._global_profile.enable()
+        print_log(f"PROFILE ({self.mode.upper()}) ATIVO", level="docs")
+
+    def stop(self) -> None:
+        """Encerra o profiling e grava o arquivo da execução."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self._global_profile:
+            self._global_profile.disable()
+            self._profiles.append(self._global_profile)
+
+        try:
+            if self.mode == "cprofile":
+                self._dump_pstats()
+            else:
+                self._dump_collapsed()
+            print_log(f"PROFILE GRAVADO EM: {self.output_path}", level="success")
+        except (OSError, TypeError) as e:
+            print_log(f"ERRO AO GRAVAR O PROFILE: {e}", level="error")
+
+    def _dump_pstats(self) -> None:
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            raise TypeError("nenhuma função foi medida")
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(str(self.output_path))
+
+    def _sample_loop(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                    frame = frame.f_back
+                # agrupa as threads de mesma função (THREAD-1, THREAD-2... -> THREAD)
+                thread_name = re.sub(r"[-_ ]?\d+$", "", names.get(thread_id, "THREAD"))
+                stack.append(thread_name)
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def _dump_collapsed(self) -> None:
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def profiled(func: Callable, profiler: Optional[LoadProfiler] = None) -> Callable:
+    """Retorna a função envolvida pelo profiler, se houver."""
+    return profiler.wrap(func) if profiler else func
@@ -0,0 +1,160 @@
+# utils/table_scheduler.py
+
+"""
+Fila de inserção com uma fila por tabela e afinidade entre worker e tabela.
+
+Com uma única fila compartilhada, todos os workers recebem lotes de qualquer tabela e, no Postgres, várias conexões
+fazem COPY na mesma tabela ao mesmo tempo, disputando o lock de extensão da relação. Aqui cada worker fica "preso" a
+uma tabela enquanto ela tiver lotes e a sua parcela de workers for justa; as conexões são distribuídas entre as
+tabelas proporcionalmente aos bytes que ainda faltam carregar em cada uma.
+"""
+
+import math
+import os
+import threading
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Deque, Dict, Optional
+from ..config import AVG_COMPRESSED_LINE_SIZE_BYTES
+from ..utils.db_batch_producer import get_targets_from_zip_name
+
+
+def estimate_table_bytes(files_dir: str) -> Dict[str, int]:
+    """
+    Estima os bytes (compactados) a carregar em cada tabela, pelo tamanho dos arquivos ZIP.
+    """
+    table_bytes: Dict[str, int] = defaultdict(int)
+    for zip_file in Path(files_dir).glob("*.zip"):
+        try:
+            table_bytes[get_targets_from_zip_name(zip_file.name)[0]['name']] += os.path.getsize(zip_file)
+        except (ValueError, OSError):
+            continue
+    return dict(table_bytes)
+
+
+class TableScheduler:
+    """
+    Substitui a `Queue` de inserção (mesma interface usada pelo produtor e pelos consumidores), mantendo uma fila por
+    tabela.
+
+    Em `get`, o worker continua na tabela atual enquanto ela tiver lotes e não exceder a sua parcela de workers;
+    caso contrário, passa para a tabela com lotes que estiver mais longe da sua parcela. A parcela de cada tabela é
+    proporcional aos bytes restantes estimados (ZIPs ainda não lidos + lotes na fila).
+
+    :params:
+        maxsize: quantidade máxima de lotes na fila (somando todas as tabelas).
+        num_workers: quantidade de workers consumindo a fila.
+        table_bytes: bytes estimados de cada tabela (ver `estimate_table_bytes`).
+        max_workers_per_table: quantidade máxima de workers na mesma tabela (None não limita).
+    """
+
+    def __init__(self, maxsize: int, num_workers: int, table_bytes: Optional[Dict[str, int]] = None,
+                 max_workers_per_table: Optional[int] = None):
+        self.maxsize = maxsize
+        self.num_workers = num_workers
+        self.max_workers_per_table = max_workers_per_table or num_workers
+        self._remaining: Dict[str, float] = defaultdict(float, table_bytes or {})
+        self._queues: Dict[str, Deque[dict]] = defaultdict(deque)
+        self._queued_rows: Dict[str, int] = defaultdict(int)
+        self._active: Dict[str, int] = defaultdict(int)
+        self._assignment: Dict[int, str] = {}
+        self._size = 0
+        self._closed = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    # --- interface de Queue -------------------------------------------------------------------------------------
+
+    def put(self, item: Optional[dict]) -> None:
+        """Coloca um lote na fila da sua tabela (bloqueia se a fila estiver cheia). None encerra um worker."""
+        with self._lock:
+            if item is None:
+                self._closed += 1
+                self._not_empty.notify_all()
+                return
+            while self._size >= self.maxsize:
+                self._not_full.wait()
+            table = item["table"]
+            self._queues[table].append(item)
+            self._queued_rows[table] += len(item["rows"])
+            self._size += 1
+            self._not_empty.notify_all()
+
+    def get(self) -> Optional[dict]:
+        """
+        Retorna o próximo lote para o worker da thread atual, ou None quando a fila foi encerrada e está vazia.
+        """
+        worker = threading.get_ident()
+        with self._lock:
+            while True:
+                table = self._choose_table(worker)
+                if table is not None:
+                    break
+                if self._closed and not self._size:
+                    self._release(worker)
+                    self._closed -= 1
+                    return None
+                self._release(worker)
+                self._not_empty.wait()
+
+            item = self._queues[table].popleft()
+            rows = len(item["rows"])
+            self._queued_rows[table] -= rows
+            self._remaining[table] = max(0.0, self._remaining[table] - rows * AVG_COMPRESSED_LINE_SIZE_BYTES)
+            self._size -= 1
+            self._not_full.notify()
+            if self._closed and not self._size:
+                self._not_empty.notify_all()
+            return item
+
+    def task_done(self) -> None:
+        pass
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def full(self) -> bool:
+        return self._size >= self.maxsize
+
+    # --- escalonamento ------------------------------------------------------------------------------------------
+
+    def _weight(self, table: str) -> float:
+        """Bytes restantes estimados da tabela (ZIPs ainda não lidos + lotes na fila)."""
+        return self._remaining[table] + self._queued_rows[table] * AVG_COMPRESSED_LINE_SIZE_BYTES
+
+    def _share(self, table: str) -> int:
+        """Parcela de workers da tabela, proporcional aos bytes restantes (ao menos um, se houver lotes)."""
+        total = sum(self._weight(t) for t in self._remaining.keys() | self._queues.keys())
+        if total <= 0:
+            return self.max_workers_per_table
+        share = max(1, math.ceil(self.num_workers * self._weight(table) / total))
+        return min(share, self.max_workers_per_table)
+
+    def _release(self, worker: int) -> None:
+        table = self._assignment.pop(worker, None)
+        if table is not None:
+            self._active[table] -= 1
+            self._not_empty.notify_all()  # a tabela pode ter ficado disponível para os workers limitados
+
+    def _choose_table(self, worker: int) -> Optional[str]:
+        """Tabela do próximo lote do worker (None se não houver lote disponível para ele)."""
+        current = self._assignment.get(worker)
+        if current is not None and self._queues[current] and self._active[current] <= self._share(current):
+            return current
+
+        candidates = [t for t, q in self._queues.items()
+                      if q and (t == current or self._active[t] < self.max_workers_per_table)]
+        if not candidates:
+            return None
+
+        best = max(candidates, key=lambda t: self._share(t) - self._active[t] + (t == current))
+        if best != current:
+            self._release(worker)
+            self._assignment[worker] = best
+            self._active[best] += 1
+        return best
+
@@ -0,0 +1,194 @@
+# utils/task_graph.py
+
+"""
+Grafo de tarefas da carga, por tabela.
+
+Na carga em fases, as correções, PKs e índices de todas as tabelas esperam o último lote da maior tabela. Aqui cada
+tarefa começa assim que as suas dependências terminam: quando o último lote de uma tabela é gravado (evento
+`load:<tabela>`), as correções, a PK e os índices dessa tabela são executados em outras conexões, enquanto as demais
+tabelas continuam sendo carregadas.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from ..utils.db_batch_producer import get_targets_from_zip_name
+from ..utils.logger import print_log
+
+
+class TaskGraph:
+    """
+    Executa as tarefas em um pool de threads, cada uma assim que as suas dependências terminam.
+
+    As dependências sem tarefa registrada são eventos externos (ex.: `load:empresa`), concluídos com `complete`.
+    Se uma tarefa falhar, as que dependem dela não são executadas, e `wait` relança o primeiro erro. Se a carga for
+    interrompida, `cancel` descarta as tarefas ainda não iniciadas.
+
+    :params:
+        max_workers: quantidade de tarefas executadas ao mesmo tempo.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._tasks: Dict[str, Callable[[], None]] = {}
+        self._pending: Dict[str, Set[str]] = {}
+        self._done: Set[str] = set()
+        self._errors: List[BaseException] = []
+        self._running = 0
+        self._cancelled = False
+        self._futures: List[Future] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def add(self, name: str, func: Callable[[], None], after: Iterable[str] = ()) -> None:
+        """Registra a tarefa `name`, executada após as tarefas (ou eventos) de `after`."""
+        with self._lock:
+            self._tasks[name] = func
+            self._pending[name] = set(after) - self._done
+            self._schedule_ready()
+
+    def complete(self, name: str) -> None:
+        """Conclui um evento externo (ex.: `load:empresa`), liberando as tarefas que dependem dele."""
+        with self._lock:
+            self._finish(name)
+
+    def wait(self) -> None:
+        """
+        Aguarda as tarefas em execução e as liberadas por elas.
+
+        :raises: o primeiro erro das tarefas, ou RuntimeError se restarem tarefas com dependências não concluídas
+        """
+        with self._lock:
+            while self._running:
+                self._idle.wait()
+            blocked = sorted(self._pending)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._errors:
+            raise self._errors[0]
+        if blocked:
+            raise RuntimeError(f"TAREFAS NÃO EXECUTADAS (DEPENDÊNCIAS NÃO CONCLUÍDAS): {', '.join(blocked)}")
+
+    def cancel(self) -> None:
+        """
+        Cancela as tarefas ainda não iniciadas (ex.: a carga foi interrompida), sem aguardar as que estão em execução.
+        Nenhuma tarefa é liberada depois disso.
+        """
+        with self._lock:
+            self._cancelled = True
+            self._pending.clear()
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._running -= sum(future.cancelled() for future in self._futures)  # tarefas que não vão executar
+            self._futures.clear()
+            self._idle.notify_all()
+
+    def _finish(self, name: str) -> None:
+        self._done.add(name)
+        for deps in self._pending.values():
+            deps.discard(name)
+        self._schedule_ready()
+
+    def _schedule_ready(self) -> None:
+        if self._errors or self._cancelled:
+            return
+        ready = [name for name, deps in self._pending.items() if not deps]
+        for name in ready:
+            del self._pending[name]
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="TASK")
+            self._running += 1
+            self._futures.append(self._executor.submit(self._run, name))
+
+    def _run(self, name: str) -> None:
+        error = None
+        try:
+            self._tasks[name]()
+        except BaseException as e:
+            error = e
+            print_log(f"ERRO NA TAREFA '{name}': {e}", level="error")
+        with self._lock:
+            self._running -= 1
+            if error is None:
+                self._finish(name)
+            else:
+                self._errors.append(error)
+            self._idle.notify_all()
+
+
+class TableLoadTracker:
+    """
+    Identifica quando a carga de cada tabela termina: todos os ZIPs da tabela lidos pelo produtor e todos os lotes
+    gravados pelos consumidores.
+
+    O produtor chama `batch_queued` antes de colocar cada lote na fila e `file_done` ao terminar cada ZIP; o
+    consumidor chama `batch_done` após gravar (ou descartar, com erro) cada lote. `on_table_loaded` é chamada uma
+    única vez por tabela, na thread que concluiu a tabela.
+
+    :params:
+        files_dir: diretório com os arquivos ZIP.
+        tables: tabelas carregadas a partir dos ZIPs.
+        on_table_loaded: função chamada com o nome da tabela quando a sua carga termina.
+    """
+
+    def __init__(self, files_dir: str, tables: Iterable[str], on_table_loaded: Callable[[str], None]):
+        self.on_table_loaded = on_table_loaded
+        self._files: Dict[str, Set[str]] = {table: set() for table in tables}
+        self._batches: Dict[str, int] = {table: 0 for table in self._files}
+        self._loaded: Set[str] = set()
+        self._lock = threading.Lock()
+        for zip_file in Path(files_dir).glob("*.zip"):
+            try:
+                targets = get_targets_from_zip_name(zip_file.name)
+            except ValueError:
+                continue
+            for target in targets:
+                if target['name'] in self._files:
+                    self._files[target['name']].add(zip_file.name)
+
+    def batch_queued(self, table: str) -> None:
+        with self._lock:
+            if table in self._batches:
+                self._batches[table] += 1
+
+    def batch_done(self, table: str) -> None:
+        with self._lock:
+            if table not in self._batches:
+                return
+            self._batches[table] -= 1
+            loaded = self._check(table)
+        if loaded:
+            self.on_table_loaded(table)
+
+    def file_done(self, zip_file: str) -> None:
+        name = Path(zip_file).name
+        loaded = []
+        with self._lock:
+            for table, files in self._files.items():
+                if name in files:
+                    files.discard(name)
+                    if self._check(table):
+                        loaded.append(table)
+        for table in loaded:
+            self.on_table_loaded(table)
+
+    def finish(self) -> None:
+        """Conclui as tabelas restantes (sem ZIPs no diretório ou com a carga interrompida)."""
+        with self._lock:
+            remaining = [table for table in self._files if table not in self._loaded]
+            self._loaded.update(remaining)
+        for table in remaining:
+            self.on_table_loaded(table)
+
+    def _check(self, table: str) -> bool:
+        """Se a tabela acabou de ser concluída (chamada com o lock)."""
+        if table in self._loaded or self._files[table] or self._batches[table] > 0:
+            return False
+        self._loaded.add(table)
+        return True
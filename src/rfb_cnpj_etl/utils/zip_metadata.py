@@ -8,14 +8,15 @@ import io
 import os
 import zipfile
 from collections import defaultdict
+from typing import Optional
 from ..cnpj_data.cnpj_public_data import CNPJDataScraper
 from ..config import AVG_COMPRESSED_LINE_SIZE_BYTES
 from .logger import print_log
 
 
-def validate_zip_files(month_year: str, files_dir: str):
+def validate_zip_files(month_year: str, files_dir: str, base_url: Optional[str] = None):
     """
-    Valida os arquivos baixados.
+    Valida os arquivos baixados (nomes e tamanhos iguais aos do site em `base_url`; se None, CNPJ_DATA_URL).
     """
     print_log(f"VALIDAÇÃO DOS ARQUIVOS ZIP...", level="task")
     print_log(f"PERÍODO: {month_year}", level="docs")
@@ -31,7 +32,7 @@ def validate_zip_files(month_year: str, files_dir: str):
     }
     print_log(f"{len(local_files)} ARQUIVOS NA PASTA LOCAL", level="folder")
 
-    data = CNPJDataScraper()
+    data = CNPJDataScraper(base_url)
     remote_metadata = data.get_metadata(month_year)
     remote_files = {
         info["filename"]: info["file_size"]
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# os testes importam o pacote como o `cnpj.py` (a partir da raiz do repositório)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import src.rfb_cnpj_etl.orchestrator  # noqa: E402,F401  (carrega os módulos na ordem das importações da CLI)
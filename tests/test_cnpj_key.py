@@ -0,0 +1,30 @@
+import pytest
+
+from src.rfb_cnpj_etl.utils.cnpj_key import check_digits, cnpj_key
+
+
+@pytest.mark.parametrize("base, dv", [
+    ("000000000001", "91"),  # 00.000.000/0001-91
+    ("336831110001", "07"),  # 33.683.111/0001-07: resto < 2 no primeiro dígito
+    ("330001670001", "01"),  # 33.000.167/0001-01
+    ("112223330001", "81"),  # 11.222.333/0001-81
+])
+def test_check_digits(base, dv):
+    assert check_digits(base) == dv
+
+
+def test_cnpj_key_valid():
+    assert cnpj_key("00000000", "0001", "91") == (191, True)
+
+
+def test_cnpj_key_pads_and_strips():
+    assert cnpj_key(" 0 ", "1", "91") == (191, True)
+
+
+def test_cnpj_key_invalid_dv_is_kept():
+    assert cnpj_key("00000000", "0001", "92") == (192, False)
+
+
+@pytest.mark.parametrize("basico", ["12ABC345", "1234567８", "123456789"])
+def test_cnpj_key_non_numeric(basico):
+    assert cnpj_key(basico, "0001", "00") == (None, False)
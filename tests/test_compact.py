@@ -0,0 +1,88 @@
+import copy
+import sqlite3
+
+import pytest
+
+from src.rfb_cnpj_etl.db.schema import (
+    BASE_SCHEMA, SCHEMA, UF_CODES, configure_schema, index_profile_schema, is_compact
+)
+from src.rfb_cnpj_etl.db.sqlite_builder import SQLiteBuilder
+from src.rfb_cnpj_etl.utils.compact_batch import CompactValueError, RowCompactor, ValuePool
+from src.rfb_cnpj_etl.utils.db_transformers import sanitize_row_for_sqlite
+
+# estabelecimento como lido do CSV (códigos com zeros à esquerda, datas YYYYMMDD)
+ESTABELECIMENTO = {
+    'cnpj_basico': '00000000', 'cnpj_ordem': '0001', 'cnpj_dv': '91', 'matriz_filial': '1',
+    'nome_fantasia': 'DIRECAO GERAL', 'cod_situacao_cadastral': '02', 'data_situacao_cadastral': '20050103',
+    'cod_motivo_situacao_cadastral': '00', 'cod_pais': '', 'data_inicio_atividade': '19660801',
+    'cod_cnae_principal': '0111301', 'cep': '01310100', 'uf': 'DF', 'cod_municipio': '0097',
+    'data_situacao_especial': '00000000',
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_schema():
+    yield
+    configure_schema()
+
+
+def estabelecimento_row(**values):
+    columns = [col for col, _ in SCHEMA['estabelecimento']['columns']]
+    row = {**ESTABELECIMENTO, **values}
+    return columns, [row.get(col, '') for col in columns]
+
+
+def compact_row(**values):
+    columns, row = estabelecimento_row(**values)
+    compactor = RowCompactor('estabelecimento', columns, sanitize_row_for_sqlite)
+    return columns, compactor.compact([row])[0]
+
+
+def test_compact_values_match_the_standard_schema_through_the_views():
+    columns, standard = compact_row()
+    standard = [str(value) if value is not None else None for value in standard]  # datas gravadas como 'YYYY-MM-DD'
+
+    configure_schema(compact=True, engine='sqlite')
+    _, compact = compact_row()
+    compact_columns = SCHEMA['estabelecimento']['compact_columns']
+    assert compact[columns.index('uf')] == UF_CODES['DF']
+    assert compact[columns.index('cnpj_ordem')] == 1
+    assert compact[columns.index('data_inicio_atividade')] == 19660801
+
+    conn = sqlite3.connect(":memory:")
+    source = ", ".join(f'? AS "{col}"' for col in columns)
+    view = ", ".join(SQLiteBuilder.view_expression(col, compact_columns[col]) if col in compact_columns
+                     else f'"{col}"' for col in columns)
+    # nas views, os códigos vazios aparecem como NULL
+    expected = [None if col in compact_columns and value == '' else value for col, value in zip(columns, standard)]
+    assert list(conn.execute(f"SELECT {view} FROM (SELECT {source})", compact).fetchone()) == expected
+
+
+@pytest.mark.parametrize("column, value", [("cnpj_basico", "12ABC345"), ("uf", "XX"), ("cod_municipio", "97A")])
+def test_non_numeric_value_stops_the_load(column, value):
+    configure_schema(compact=True, engine='sqlite')
+    with pytest.raises(CompactValueError, match=column):
+        compact_row(**{column: value})
+
+
+def test_value_pool_stops_growing_at_max_size():
+    pool = ValuePool(converter=int, max_size=2)
+    assert [pool.get(value) for value in ("01", "02", "03", "01")] == [1, 2, 3, 1]
+    assert len(pool) == 2
+
+
+def test_configure_schema_resets_from_base_schema():
+    base = copy.deepcopy(BASE_SCHEMA)
+
+    configure_schema(cnpj_key=True, compact=True, engine='sqlite', index_profile='lookup')
+    assert is_compact()
+    assert SCHEMA['estabelecimento']['compact_columns']['data_inicio_atividade'] == 'date'
+
+    configure_schema(compact=True, engine='postgres')
+    assert 'cnpj' not in dict(SCHEMA['estabelecimento']['columns'])
+    assert 'data_inicio_atividade' not in SCHEMA['estabelecimento']['compact_columns']  # DATE mantido no Postgres
+
+    configure_schema()
+    assert not is_compact()
+    assert SCHEMA == index_profile_schema(BASE_SCHEMA, 'full')
+    assert BASE_SCHEMA == base
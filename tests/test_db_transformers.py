@@ -0,0 +1,28 @@
+import pytest
+
+from src.rfb_cnpj_etl.config import POSTGRES_ENCODINGS
+from src.rfb_cnpj_etl.utils.db_transformers import (
+    convert_rows_to_csv_buffer, sanitize_row_for_postgres, sanitize_row_for_postgres_utf8
+)
+
+# linha lida em latin1 como no produtor: 0x96 (travessão no windows-1252) vira o controle C1 U+0096
+ROW = [b"PADARIA S\xc3O JO\xc3O \x96 ME  ".decode("latin1"), "\x93A\x94\x00", "123", None]
+
+
+def stored_text(row, encoding):
+    """Textos gravados pelo COPY: o buffer no codec do CSV, decodificado como o servidor."""
+    codec = POSTGRES_ENCODINGS[encoding][2]
+    return convert_rows_to_csv_buffer([row], codec).getvalue().decode(codec)
+
+
+def test_encodings_store_the_same_text():
+    win1252 = sanitize_row_for_postgres(list(ROW))
+    utf8 = sanitize_row_for_postgres_utf8(list(ROW))
+
+    assert utf8 == win1252 == ["PADARIA SÃO JOÃO  ME", "A", "123", None]
+    assert stored_text(utf8, "utf8") == stored_text(win1252, "win1252")
+
+
+@pytest.mark.parametrize("sanitizer", [sanitize_row_for_postgres, sanitize_row_for_postgres_utf8])
+def test_latin1_letters_are_kept(sanitizer):
+    assert sanitizer(["AÇÚCAR ÑANDÚ ª º"]) == ["AÇÚCAR ÑANDÚ ª º"]
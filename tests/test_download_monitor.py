@@ -0,0 +1,114 @@
+import hashlib
+import os
+import threading
+import time
+
+import requests
+
+from src.rfb_cnpj_etl.cnpj_data import download_monitor
+from src.rfb_cnpj_etl.cnpj_data.cnpj_downloader import CNPJDownloadManager, CNPJDownloadTask
+from src.rfb_cnpj_etl.cnpj_data.download_monitor import DownloadHealthMonitor
+from src.rfb_cnpj_etl.cnpj_data.mirror_server import MirrorServer
+
+
+class FakeClock:
+    """Substitui o módulo `time` do monitor, para controlar o relógio."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def stream(monitor, conn_id, clock, rate, seconds):
+    """Simula a conexão recebendo `rate` bytes/s durante `seconds`, em passos de 0,5 s."""
+    for _ in range(int(seconds * 2)):
+        clock.now += 0.5
+        monitor.update(conn_id, int(rate / 2))
+
+
+def test_lone_connection_stalled_against_its_own_rate(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(download_monitor, "time", clock)
+    monitor = DownloadHealthMonitor(4)
+
+    monitor.start(1)
+    stream(monitor, 1, clock, 1024 ** 2, 10)
+    assert not monitor.is_stalled(1)
+    stream(monitor, 1, clock, 2048, download_monitor.DOWNLOAD_STALL_WINDOW + 1)  # acima de DOWNLOAD_STALL_MIN_RATE
+    assert monitor.is_stalled(1)
+
+
+def test_steady_connection_is_not_stalled(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(download_monitor, "time", clock)
+    monitor = DownloadHealthMonitor(4)
+
+    monitor.start(1)
+    stream(monitor, 1, clock, 100 * 1024, download_monitor.DOWNLOAD_STALL_WINDOW + 5)
+    assert not monitor.is_stalled(1)
+
+
+def test_short_downloads_are_used_as_reference(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(download_monitor, "time", clock)
+    monitor = DownloadHealthMonitor(4)
+
+    for conn_id in (1, 2):  # arquivos pequenos, baixados em menos de 1 s a 1 MB/s
+        monitor.start(conn_id)
+        clock.now += 0.2
+        monitor.update(conn_id, 200 * 1024)
+        monitor.stop(conn_id)
+
+    monitor.start(3)
+    stream(monitor, 3, clock, 100 * 1024, download_monitor.DOWNLOAD_STALL_WINDOW + 1)
+    assert monitor.is_stalled(3)
+
+
+def test_limit_recovers_without_completed_downloads(monkeypatch):
+    monkeypatch.setattr(download_monitor, "DOWNLOAD_STALL_WINDOW", 0.2)
+    monitor = DownloadHealthMonitor(2)
+    monitor.acquire()
+    monitor.throttled()
+    assert monitor.limit == 1
+
+    waiter = threading.Thread(target=monitor.acquire)
+    waiter.start()
+    waiter.join(timeout=5)
+    assert not waiter.is_alive()
+    assert monitor.limit == 2
+
+
+def test_download_from_faulty_mirror(tmp_path, monkeypatch):
+    monkeypatch.setattr(download_monitor, "DOWNLOAD_STALL_WINDOW", 2)
+    site = tmp_path / "site" / "2025-07"
+    site.mkdir(parents=True)
+    for i, name in enumerate(["Empresas0.zip", "Estabelecimentos0.zip", "Socios0.zip", "Simples.zip"]):
+        (site / name).write_bytes(os.urandom((i + 1) * 512 * 1024))
+
+    server = MirrorServer(str(tmp_path / "site"), port=0, bandwidth=4 * 1024 ** 2,
+                          stall_rate=0.3, fault_rate=0.3, seed=7).start()
+    try:
+        start = time.monotonic()
+        manager = CNPJDownloadManager(month_year="07/2025", download_dir=str(tmp_path / "downloads"),
+                                      concurrents=2, base_url=server.url)
+        manager.start_download_queue()
+        elapsed = time.monotonic() - start
+    finally:
+        server.stop()
+
+    for source in site.iterdir():
+        downloaded = tmp_path / "downloads" / "2025-07" / source.name
+        assert hashlib.sha256(downloaded.read_bytes()).digest() == hashlib.sha256(source.read_bytes()).digest()
+    assert elapsed < 60  # sem a detecção das conexões travadas, o restante dos arquivos seguiria a 2 kB/s
+
+
+def test_remaining_bytes_skip_existing_files(tmp_path):
+    existing = tmp_path / "Empresas0.zip"
+    existing.write_bytes(b"x" * 100)
+    session = requests.Session()
+
+    assert CNPJDownloadTask("", str(existing), session, {}, file_size=100).remaining_bytes == 0
+    assert CNPJDownloadTask("", str(existing), session, {}, file_size=100, clean=True).remaining_bytes == 100
+    assert CNPJDownloadTask("", str(tmp_path / "Socios0.zip"), session, {}, file_size=100).remaining_bytes == 100
@@ -0,0 +1,35 @@
+import sys
+
+import pytest
+
+from src.rfb_cnpj_etl.utils import memory
+from src.rfb_cnpj_etl.utils.memory import get_rss_bytes, parse_size
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("4096", 4096),
+    ("512K", 512 * 1024),
+    ("512M", 512 * 1024 ** 2),
+    ("2G", 2 * 1024 ** 3),
+    ("2g", 2 * 1024 ** 3),
+    ("1.5GB", int(1.5 * 1024 ** 3)),
+    (" 1 TB ", 1024 ** 4),
+])
+def test_parse_size(value, expected):
+    assert parse_size(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "G", "abc", "2X", "0", "-1G"])
+def test_parse_size_invalid(value):
+    with pytest.raises(ValueError):
+        parse_size(value)
+
+
+def test_rss_is_not_measured_without_current_source(monkeypatch):
+    monkeypatch.setattr(memory.sys, "platform", "darwin")
+    assert get_rss_bytes() is None
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="RSS lido de /proc")
+def test_rss_on_linux():
+    assert get_rss_bytes() > 0
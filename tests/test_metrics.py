@@ -0,0 +1,22 @@
+import re
+
+from src.rfb_cnpj_etl.utils.metrics import LoadMetrics, prometheus_labels
+
+# linha de amostra do formato de exposição do Prometheus: métrica{rótulo="valor",...} número
+SAMPLE = re.compile(r'^[a-z_]+\{(?:[a-z_]+="(?:[^"\\\n]|\\[\\"n])*",?)+\} [0-9.]+$')
+
+
+def test_label_values_are_escaped():
+    assert prometheus_labels(file='C:\\dados\\Empresas0.zip', worker='a"b\nc') == \
+        'file="C:\\\\dados\\\\Empresas0.zip",worker="a\\"b\\nc"'
+
+
+def test_prometheus_file_is_valid_with_windows_paths(tmp_path):
+    metrics = LoadMetrics(output_dir=str(tmp_path))
+    metrics.add("write", "empresa", 'C:\\dados\\2025-05\\Empresas0.zip', 1.5, rows=10, nbytes=100, worker="THREAD-1")
+    metrics.export()
+
+    lines = metrics.prom_path.read_text(encoding="utf-8").splitlines()
+    samples = [line for line in lines if not line.startswith("#") and "{" in line]
+    assert len(samples) == 3
+    assert all(SAMPLE.match(line) for line in samples)
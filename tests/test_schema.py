@@ -0,0 +1,25 @@
+from src.rfb_cnpj_etl.db.schema import BASE_SCHEMA, index_profile_schema
+
+# índices das versões anteriores (sem perfis)
+BASELINE_INDEXES = {
+    'idx_empresa_cnpj', 'idx_empresa_razao_social', 'idx_empresa_natureza', 'idx_empresa_porte',
+    'idx_estab_empresa', 'idx_estab_nome_fantasia', 'idx_estab_cnae_principal', 'idx_estab_data_inicio',
+    'idx_estab_data_situacao', 'idx_estab_municipio', 'idx_estab_uf_municipio', 'idx_estab_situacao',
+    'idx_simples_empresa', 'idx_socio_empresa', 'idx_socio_cpf_cnpj', 'idx_socio_nome', 'idx_estab_cnae_sec',
+}
+
+
+def index_names(index_profile: str) -> set:
+    schema = index_profile_schema(BASE_SCHEMA, index_profile)
+    return {index['name'] for definition in schema.values() for index in definition.get('indexes', [])}
+
+
+def test_full_profile_is_the_baseline():
+    assert index_names('full') == BASELINE_INDEXES
+
+
+def test_profiles_are_nested():
+    assert index_names('none') == set()
+    assert index_names('lookup') < index_names('analytics') < index_names('full')
+    assert index_names('analytics') - {'idx_socio_empresa'} < index_names('tuned')
+    assert index_names('tuned') - index_names('analytics') == {'idx_estab_ativos_uf_inicio', 'idx_socio_empresa_nome'}
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import Counter
+
+from src.rfb_cnpj_etl.utils.table_scheduler import TableScheduler
+
+
+def batch(table: str) -> dict:
+    return {"table": table, "rows": [("1",)]}
+
+
+def wait_until(condition, timeout: float = 5.0) -> bool:
+    """Aguarda a condição (verificada a cada 10 ms) até o tempo limite."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+class HoldingWorkers:
+    """Workers que pegam um lote cada e ficam com ele (simulando a gravação) até `release`."""
+
+    def __init__(self, scheduler: TableScheduler, count: int):
+        self.scheduler = scheduler
+        self.first: list = []
+        self._hold = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(count)]
+        for thread in self._threads:
+            thread.start()
+
+    def _run(self) -> None:
+        first = True
+        while (item := self.scheduler.get()) is not None:
+            if first:
+                with self._lock:
+                    self.first.append(item["table"])
+                first = False
+            self._hold.wait()
+
+    def release(self) -> None:
+        self._hold.set()
+        for _ in self._threads:
+            self.scheduler.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+            assert not thread.is_alive()
+
+
+def test_workers_per_table_cap():
+    scheduler = TableScheduler(maxsize=100, num_workers=4, max_workers_per_table=2)
+    for _ in range(10):
+        scheduler.put(batch("estabelecimento"))
+
+    workers = HoldingWorkers(scheduler, 4)
+    assert wait_until(lambda: len(workers.first) == 2)
+    time.sleep(0.2)
+    assert len(workers.first) == 2  # os outros dois aguardam lotes de outra tabela
+
+    for _ in range(10):
+        scheduler.put(batch("socio"))
+    assert wait_until(lambda: len(workers.first) == 4)
+    assert Counter(workers.first) == {"estabelecimento": 2, "socio": 2}
+
+    workers.release()
+    assert scheduler.empty()
+
+
+def test_workers_split_by_remaining_bytes():
+    scheduler = TableScheduler(maxsize=100, num_workers=4,
+                               table_bytes={"estabelecimento": 3 * 1024 ** 3, "simples": 1024 ** 3})
+    for _ in range(10):
+        scheduler.put(batch("estabelecimento"))
+        scheduler.put(batch("simples"))
+
+    workers = HoldingWorkers(scheduler, 4)
+    assert wait_until(lambda: len(workers.first) == 4)
+    assert Counter(workers.first) == {"estabelecimento": 3, "simples": 1}
+    workers.release()
+
+
+def test_worker_keeps_its_table():
+    scheduler = TableScheduler(maxsize=100, num_workers=1)
+    for _ in range(5):
+        scheduler.put(batch("empresa"))
+        scheduler.put(batch("socio"))
+    scheduler.put(None)
+
+    tables = []
+    while (item := scheduler.get()) is not None:
+        tables.append(item["table"])
+
+    assert Counter(tables) == {"empresa": 5, "socio": 5}
+    assert sum(a != b for a, b in zip(tables, tables[1:])) == 1  # troca de tabela só quando a atual esvazia
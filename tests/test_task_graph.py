@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+
+from src.rfb_cnpj_etl.utils.task_graph import TableLoadTracker, TaskGraph
+
+
+def test_tasks_run_after_their_dependencies():
+    graph = TaskGraph(max_workers=2)
+    order = []
+    lock = threading.Lock()
+
+    def task(name):
+        def run():
+            with lock:
+                order.append(name)
+        return run
+
+    graph.add("pk:empresa", task("pk:empresa"), after=["load:empresa"])
+    graph.add("index:empresa", task("index:empresa"), after=["pk:empresa"])
+    graph.add("fix:estabelecimento", task("fix:estabelecimento"), after=["load:estabelecimento"])
+    assert order == []  # nenhum evento de carga concluído
+
+    graph.complete("load:empresa")
+    graph.complete("load:estabelecimento")
+    graph.wait()
+
+    assert sorted(order) == ["fix:estabelecimento", "index:empresa", "pk:empresa"]
+    assert order.index("pk:empresa") < order.index("index:empresa")
+
+
+def test_task_added_after_its_dependency_runs():
+    graph = TaskGraph(max_workers=1)
+    ran = []
+    graph.complete("load:socio")
+    graph.add("index:socio", lambda: ran.append("index:socio"), after=["load:socio"])
+    graph.wait()
+    assert ran == ["index:socio"]
+
+
+def test_failure_skips_dependents():
+    graph = TaskGraph(max_workers=2)
+    ran = []
+
+    def fail():
+        raise ValueError("PK DUPLICADA")
+
+    graph.add("pk:empresa", fail)
+    graph.add("index:empresa", lambda: ran.append("index:empresa"), after=["pk:empresa"])
+
+    with pytest.raises(ValueError, match="PK DUPLICADA"):
+        graph.wait()
+    assert ran == []
+
+
+def test_blocked_tasks_are_reported():
+    graph = TaskGraph(max_workers=1)
+    graph.add("index:socio", lambda: None, after=["load:socio"])
+
+    with pytest.raises(RuntimeError, match="index:socio"):
+        graph.wait()
+
+
+def test_table_loaded_after_files_and_batches(tmp_path):
+    for name in ("Empresas0.zip", "Empresas1.zip", "Socios0.zip"):
+        (tmp_path / name).write_bytes(b"")
+    loaded = []
+    tracker = TableLoadTracker(str(tmp_path), ["empresa", "socio"], loaded.append)
+
+    tracker.batch_queued("empresa")
+    tracker.file_done(str(tmp_path / "Empresas0.zip"))
+    tracker.file_done(str(tmp_path / "Empresas1.zip"))
+    assert loaded == []  # um lote ainda não gravado
+
+    tracker.batch_done("empresa")
+    assert loaded == ["empresa"]
+
+    tracker.finish()  # conclui as tabelas restantes uma única vez
+    tracker.finish()
+    assert loaded == ["empresa", "socio"]
+
+
+def test_cancel_discards_pending_tasks():
+    graph = TaskGraph(max_workers=1)
+    running, release = threading.Event(), threading.Event()
+    ran = []
+
+    def slow():
+        running.set()
+        release.wait(timeout=5)
+
+    graph.add("pk:empresa", slow, after=["load:empresa"])
+    graph.add("index:empresa", lambda: ran.append("index:empresa"), after=["pk:empresa"])
+    graph.add("pk:socio", lambda: ran.append("pk:socio"), after=["load:socio"])
+    graph.complete("load:empresa")
+    assert running.wait(timeout=5)
+    graph.add("pk:simples", lambda: ran.append("pk:simples"))  # na fila do executor, atrás de pk:empresa
+
+    graph.cancel()  # a carga foi interrompida
+    graph.complete("load:socio")
+    release.set()
+    graph.wait()
+
+    assert ran == []